@@ -1,41 +1,29 @@
+import time
+from pathlib import Path
 import streamlit as st
-import requests
-import pandas as pd
 import streamlit.components.v1 as components
+import metrics
+from diagnostics import show_diagnostics
+import prewarm
+import rating_history
+from ratings import fetch_player_ratings, parse_players
+from rating_table import (build_table, show_results, show_saved_results, stream_import_table,
+                          stream_ratings_table, swr_ratings_table)
 
-# Функции для работы с рейтингами (оставляем без изменений)
-def get_lichess_ratings(username):
-    url = f"https://lichess.org/api/user/{username}"
-    try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            perfs = data.get('perfs', {})
-            bullet = perfs.get('bullet', {}).get('rating', 'N/A')
-            blitz = perfs.get('blitz', {}).get('rating', 'N/A')
-            return {'bullet': bullet, 'blitz': blitz}
-        else:
-            return {'error': 'Игрок не найден'}
-    except Exception as e:
-        return {'error': str(e)}
-
-def get_chesscom_ratings(username):
-    username = username.lower()
-    url = f"https://api.chess.com/pub/player/{username}/stats"
-    try:
-        response = requests.get(url, headers={'User-Agent': 'my-app'})
-        if response.status_code == 200:
-            data = response.json()
-            bullet = data.get('chess_bullet', {}).get('last', {}).get('rating', 'N/A')
-            blitz = data.get('chess_blitz', {}).get('last', {}).get('rating', 'N/A')
-            return {'bullet': bullet, 'blitz': blitz}
-        else:
-            return {'error': 'Игрок не найден'}
-    except Exception as e:
-        return {'error': str(e)}
+# Замер длительности всего перезапуска скрипта (для панели отладки).
+rerun_started = time.perf_counter()
+
+# Фоновое обновление сохранённых списков в общем кэше (один поток на процесс сервера).
+prewarm.start()
+
+# Стили лежат в static/style.css. Вне фрагментов код выполняется только при полном
+# перезапуске (открытие страницы, очистка полей), поэтому CSS и скрипты cookies
+# не отправляются в браузер заново при каждом вводе или нажатии кнопки.
+STYLE_PATH = Path(__file__).parent / 'static' / 'style.css'
 
 # Основная часть приложения
 st.title("v1.5 Рейтинги на Lichess и Chess.com")
+st.html(STYLE_PATH)
 
 # Инициализация session_state для хранения реальных значений
 if 'real_lichess' not in st.session_state:
@@ -112,18 +100,25 @@ def handle_js_messages():
 
 handle_js_messages()
 
-# Поля ввода, которые синхронизируются с реальными значениями
-lichess_nicks = st.text_input(
-    "Никнеймы на Lichess (через запятую, если несколько)",
-    value=st.session_state.real_lichess,
-    key="lichess_input"
-)
-
-chesscom_nicks = st.text_input(
-    "Никнеймы на Chess.com (через запятую, если несколько)",
-    value=st.session_state.real_chesscom,
-    key="chesscom_input"
-)
+# Поля ввода, которые синхронизируются с реальными значениями.
+# Фрагмент: ввод перезапускает только его, таблица и отладка остаются как есть.
+@st.fragment
+def input_area():
+    with metrics.timer('fragment'):
+        st.text_input(
+            "Никнеймы на Lichess (через запятую, если несколько)",
+            value=st.session_state.real_lichess,
+            key="lichess_input",
+            help="Ники без пары тоже выводятся. Пару можно задать явно: ник_Lichess=ник_Chess.com"
+        )
+
+        st.text_input(
+            "Никнеймы на Chess.com (через запятую, если несколько)",
+            value=st.session_state.real_chesscom,
+            key="chesscom_input"
+        )
+
+input_area()
 
 # JavaScript для отслеживания изменений в полях ввода
 components.html(f"""
@@ -170,51 +165,72 @@ if (inputs.length >= 2 && (inputs[0].value || inputs[1].value)) {{
 </script>
 """, height=0)
 
-# Кнопка для запуска - используем реальные значения из полей
-if st.button("Получить рейтинги"):
-    # Берем значения напрямую из полей ввода
-    current_lichess = lichess_nicks
-    current_chesscom = chesscom_nicks
-
-    # Сохраняем в session_state
-    st.session_state.real_lichess = current_lichess
-    st.session_state.real_chesscom = current_chesscom
-
-    # Разбиваем ники на списки
-    lichess_list = [nick.strip() for nick in current_lichess.split(',') if nick.strip()]
-    chesscom_list = [nick.strip() for nick in current_chesscom.split(',') if nick.strip()]
-
-    # Если списки разной длины — берём минимальную.
-    min_len = min(len(lichess_list), len(chesscom_list))
-    results = []
-
-    for i in range(min_len):
-        lichess_user = lichess_list[i]
-        chesscom_user = chesscom_list[i]
-
-        lichess_ratings = get_lichess_ratings(lichess_user)
-        chesscom_ratings = get_chesscom_ratings(chesscom_user)
-
-        row = {
-            'Игрок (Lichess / Chess.com)': f"{lichess_user} / {chesscom_user}",
-            'Lichess Bullet': lichess_ratings.get('bullet', lichess_ratings.get('error', 'Ошибка')),
-            'Lichess Blitz': lichess_ratings.get('blitz', lichess_ratings.get('error', 'Ошибка')),
-            'Chess.com Bullet': chesscom_ratings.get('bullet', chesscom_ratings.get('error', 'Ошибка')),
-            'Chess.com Blitz': chesscom_ratings.get('blitz', chesscom_ratings.get('error', 'Ошибка'))
-        }
-        results.append(row)
-
-    if results:
-        df = pd.DataFrame(results)
-        df.insert(0, '№', df.index + 1)
-        st.dataframe(df, width='stretch', hide_index=True)
-    else:
-        st.warning("Введите никнеймы для получения данных.")
+# Таблица результатов: кнопка перезапускает только этот фрагмент,
+# ники берутся из состояния полей ввода.
+@st.fragment
+def results_area():
+    with metrics.timer('fragment'):
+        stream_mode = st.checkbox("Показывать результаты по мере получения", value=True)
+        swr_mode = st.checkbox("Сразу показывать последние известные рейтинги и обновлять их", value=False,
+                               help="Сохранённые рейтинги выводятся мгновенно с возрастом данных, свежие подставляются по мере ответов")
+
+        # Кнопка для запуска - используем реальные значения из полей
+        if st.button("Получить рейтинги"):
+            # Берем значения напрямую из полей ввода
+            current_lichess = st.session_state.lichess_input
+            current_chesscom = st.session_state.chesscom_input
+
+            # Сохраняем в session_state
+            st.session_state.real_lichess = current_lichess
+            st.session_state.real_chesscom = current_chesscom
+
+            # Разбиваем ники на игроков; ники без пары не отбрасываются.
+            players = parse_players(current_lichess, current_chesscom)
+
+            if not players:
+                st.warning("Введите никнеймы для получения данных.")
+            elif swr_mode:
+                # Таблица из сохранённых рейтингов сразу, свежие значения — по мере ответов.
+                swr_ratings_table(players)
+            elif stream_mode:
+                # Таблица появляется сразу и заполняется по мере ответов сайтов.
+                stream_ratings_table(players)
+            else:
+                # Запрашиваем всех игроков на обоих сайтах параллельно; порядок строк сохраняется.
+                lichess_results, chesscom_results = fetch_player_ratings(players)
+                rating_history.record_run(players, lichess_results, chesscom_results)
+                show_results(build_table(players, lichess_results, chesscom_results))
+            metrics.export_if_configured()
+        else:
+            # Листание, сортировка и поиск перезапускают фрагмент без нажатия кнопки.
+            show_saved_results()
+
+results_area()
+
+# Импорт участников команды Lichess или клуба Chess.com вместо ввода ников вручную.
+@st.fragment
+def import_area():
+    with st.expander("📥 Импорт из команды Lichess или клуба Chess.com"):
+        source = st.radio("Откуда", ["Команда Lichess", "Клуб Chess.com"], horizontal=True, key="import_source")
+        source_id = st.text_input("Идентификатор команды или клуба (как в адресе страницы)", key="import_id")
+        if st.button("Импортировать и получить рейтинги"):
+            if not source_id.strip():
+                st.warning("Введите идентификатор команды или клуба.")
+            else:
+                site = 'lichess' if source == "Команда Lichess" else 'chesscom'
+                stream_import_table(site, source_id)
+                metrics.export_if_configured()
+        else:
+            show_saved_results('import_results')
+
+import_area()
 
 # Кнопка для очистки
 if st.button("Очистить поля"):
     st.session_state.real_lichess = ""
     st.session_state.real_chesscom = ""
+    st.session_state.pop('results', None)
+    st.session_state.pop('import_results', None)
     components.html("""
     <script>
     setCookie('lichess_nicks', '', 30);
@@ -225,72 +241,18 @@ if st.button("Очистить поля"):
     st.success("Поля очищены!")
     st.rerun()
 
-# Отладочная информация
-st.write("🔧 Отладочная информация:")
-st.write(f"Lichess в session_state: '{st.session_state.real_lichess}'")
-st.write(f"Chess.com в session_state: '{st.session_state.real_chesscom}'")
-st.write(f"Lichess в поле: '{lichess_nicks}'")
-st.write(f"Chess.com в поле: '{chesscom_nicks}'")
-
-# CSS стили
-st.markdown("""
-    <style>
-    .stApp {
-        background-color: #2b2b2b;
-        color: #e0e0e0;
-    }
-
-    label {
-        color: grey !important;
-        font-size: 1rem !important;
-        font-weight: 500 !important;
-    }
-
-    input {
-        background-color: #3a3a3a !important;
-        color: #ffffff !important;
-        border: 1px solid #555555 !important;
-        caret-color: #ffffff !important;
-    }
-
-    input:focus {
-        border-color: #4a7c59 !important;
-        outline: none !important;
-        box-shadow: 0 0 0 2px rgba(74, 124, 89, 0.3) !important;
-    }
-
-    .stButton > button {
-        background-color: #4a7c59 !important;
-        color: #ffffff !important;
-        border: 2px solid #5a8c69 !important;
-        font-weight: 600 !important;
-        padding: 0.5rem 1rem !important;
-        border-radius: 5px !important;
-        transition: all 0.3s ease !important;
-    }
-
-    .stButton > button:hover {
-        background-color: #5a8c69 !important;
-        border-color: #6a9c79 !important;
-        transform: translateY(-2px);
-        box-shadow: 0 4px 8px rgba(0, 0, 0, 0.3) !important;
-    }
-
-    .stButton > button:active {
-        background-color: #3a6c49 !important;
-        transform: translateY(0);
-    }
-
-    .stButton > button:focus {
-        color: #ffffff !important;
-        background-color: #4a7c59 !important;
-        border-color: #6a9c79 !important;
-        box-shadow: 0 0 0 3px rgba(74, 124, 89, 0.3) !important;
-    }
-
-    .dataframe {
-        background-color: #3a3a3a !important;
-        color: #e0e0e0 !important;
-    }
-    </style>
-""", unsafe_allow_html=True)
\ No newline at end of file
+# Отладочная информация. Обновляется своей кнопкой, не трогая остальную страницу.
+@st.fragment
+def diagnostics_area():
+    with st.expander("🔧 Отладочная информация"):
+        st.button("Обновить", key="refresh_diagnostics")
+        st.write(f"Lichess в session_state: '{st.session_state.real_lichess}'")
+        st.write(f"Chess.com в session_state: '{st.session_state.real_chesscom}'")
+        st.write(f"Lichess в поле: '{st.session_state.lichess_input}'")
+        st.write(f"Chess.com в поле: '{st.session_state.chesscom_input}'")
+        show_diagnostics()
+
+diagnostics_area()
+
+metrics.observe('rerun', time.perf_counter() - rerun_started)
+metrics.export_if_configured()
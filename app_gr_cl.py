@@ -1,64 +1,48 @@
+import uuid
+import sqlite3
 import streamlit as st
-import requests
-import pandas as pd  # Для создания таблицы из данных — удобно отображать в Streamlit.
-import json
-import os
-
-# Функция для загрузки никнеймов из файла
-def load_nicknames():
-    return '', '' # debug
+import roster_store
+import rating_history
+import prewarm
+from ratings import fetch_player_ratings, parse_players
+from rating_table import build_table, show_results, show_saved_results, stream_ratings_table, swr_ratings_table
+
+# Сохранённые списки обновляются в кэше фоновым потоком (один на процесс сервера).
+prewarm.start()
+
+# Владелец списков: у каждого пользователя свои списки. Без входа в систему
+# используется id в адресе страницы (?user=...), его можно сохранить в закладках.
+def roster_owner():
+    if 'roster_owner' not in st.session_state:
+        owner = st.query_params.get('user')
+        if not owner:
+            owner = uuid.uuid4().hex[:12]
+            st.query_params['user'] = owner
+        st.session_state['roster_owner'] = owner
+    return st.session_state['roster_owner']
+
+# Функция для загрузки никнеймов из базы списков
+def load_nicknames(owner, roster):
+    if roster_store.store is None:
+        return '', ''
     try:
-        if os.path.exists('nicknames.json'):
-            with open('nicknames.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('lichess', ''), data.get('chesscom', '')
-    except Exception as e:
+        saved = roster_store.store.load(owner, roster)
+        if saved is not None:
+            return saved
+    except sqlite3.Error as e:
         st.error(f"Ошибка загрузки никнеймов: {e}")
     return '', ''
 
-# Функция для сохранения никнеймов в файл
-def save_nicknames(lichess, chesscom):
-    return # debug
+# Функция для сохранения никнеймов: запись откладывается и выполняется одной
+# транзакцией, поэтому частые on_change не переписывают базу на каждое изменение.
+def save_nicknames(owner, roster, lichess, chesscom):
+    if roster_store.store is None:
+        return
     try:
-        with open('nicknames.json', 'w', encoding='utf-8') as f:
-            json.dump({'lichess': lichess, 'chesscom': chesscom}, f, ensure_ascii=False)
-    except Exception as e:
+        roster_store.store.save_later(owner, roster, lichess, chesscom)
+    except sqlite3.Error as e:
         st.error(f"Ошибка сохранения никнеймов: {e}")
 
-# Функция для получения рейтингов с Lichess.
-# Принимает никнейм, возвращает словарь с рейтингами или ошибку.
-def get_lichess_ratings(username):
-    url = f"https://lichess.org/api/user/{username}"  # API-эндпоинт для Lichess.
-    try:
-        response = requests.get(url)  # Отправляем GET-запрос.
-        if response.status_code == 200:  # Если ответ успешный (200 — OK).
-            data = response.json()  # Преобразуем ответ в JSON.
-            perfs = data.get('perfs', {})  # Берём раздел "perfs" (рейтинги).
-            bullet = perfs.get('bullet', {}).get('rating', 'N/A')  # Рейтинг пули.
-            blitz = perfs.get('blitz', {}).get('rating', 'N/A')  # Рейтинг блица.
-            return {'bullet': bullet, 'blitz': blitz}  # Возвращаем словарь.
-        else:
-            return {'error': 'Игрок не найден'}  # Если ошибка — возвращаем сообщение.
-    except Exception as e:  # Если что-то сломалось (например, нет интернета).
-        return {'error': str(e)}  # Возвращаем текст ошибки.
-
-# Функция для получения рейтингов с Chess.com.
-# Аналогично Lichess, но другой эндпоинт и структура JSON.
-def get_chesscom_ratings(username):
-    username = username.lower()
-    url = f"https://api.chess.com/pub/player/{username}/stats"  # URL всегда с lowercase.
-    try:
-        response = requests.get(url, headers={'User-Agent': 'my-app'})
-        if response.status_code == 200:
-            data = response.json()
-            bullet = data.get('chess_bullet', {}).get('last', {}).get('rating', 'N/A')
-            blitz = data.get('chess_blitz', {}).get('last', {}).get('rating', 'N/A')
-            return {'bullet': bullet, 'blitz': blitz}
-        else:
-            return {'error': 'Игрок не найден'}
-    except Exception as e:
-        return {'error': str(e)}
-
 # Основная часть приложения в Streamlit.
 st.title("v1.5 Рейтинги на Lichess и Chess.com")  # Заголовок страницы.
 
@@ -159,83 +143,81 @@ st.markdown("""
 
 # Инициализируем session_state для ников, если их нет.
 # Это обеспечивает сохранение данных между перезагрузками страницы.
-if 'lichess_nicks' not in st.session_state:
-    # Загружаем из файла при первом запуске
-    lichess_saved, chesscom_saved = load_nicknames()
-    st.session_state['lichess_nicks'] = lichess_saved
-    st.session_state['chesscom_nicks'] = chesscom_saved
-if 'chesscom_nicks' not in st.session_state:
-    st.session_state['chesscom_nicks'] = ""
+owner = roster_owner()
+if 'roster_name' not in st.session_state:
+    st.session_state['roster_name'] = roster_store.DEFAULT_ROSTER
+if 'lichess_input' not in st.session_state:
+    # Загружаем из базы при первом запуске
+    lichess_saved, chesscom_saved = load_nicknames(owner, st.session_state['roster_name'])
+    st.session_state['lichess_input'] = lichess_saved
+    st.session_state['chesscom_input'] = chesscom_saved
+
+# Переключение списка: подставляем в поля его ники (новый список — пустой).
+def switch_roster():
+    if not st.session_state['roster_name']:
+        st.session_state['roster_name'] = roster_store.DEFAULT_ROSTER
+    lichess_saved, chesscom_saved = load_nicknames(owner, st.session_state['roster_name'])
+    st.session_state['lichess_input'] = lichess_saved
+    st.session_state['chesscom_input'] = chesscom_saved
 
 # Форма для ввода никнеймов с использованием on_change для автосохранения
-def save_lichess():
-    st.session_state['lichess_nicks'] = st.session_state['lichess_input']
-    # Сохраняем в файл
-    save_nicknames(st.session_state['lichess_nicks'], st.session_state['chesscom_nicks'])
-
-def save_chesscom():
-    st.session_state['chesscom_nicks'] = st.session_state['chesscom_input']
-    # Сохраняем в файл
-    save_nicknames(st.session_state['lichess_nicks'], st.session_state['chesscom_nicks'])
+def save_roster():
+    save_nicknames(owner, st.session_state['roster_name'],
+                   st.session_state['lichess_input'], st.session_state['chesscom_input'])
+
+roster_names = roster_store.store.list_rosters(owner) if roster_store.store is not None else []
+if st.session_state['roster_name'] not in roster_names:
+    roster_names.append(st.session_state['roster_name'])
+st.selectbox(
+    "Список игроков (можно ввести название нового)",
+    roster_names,
+    key='roster_name',
+    accept_new_options=True,
+    on_change=switch_roster
+)
 
 lichess_nicks = st.text_input(
     "Никнеймы на Lichess (через запятую, если несколько)",
-    value=st.session_state['lichess_nicks'],
     key='lichess_input',
-    on_change=save_lichess
+    on_change=save_roster,
+    help="Ники без пары тоже выводятся. Пару можно задать явно: ник_Lichess=ник_Chess.com"
 )
 
 chesscom_nicks = st.text_input(
     "Никнеймы на Chess.com (через запятую, если несколько)",
-    value=st.session_state['chesscom_nicks'],
     key='chesscom_input',
-    on_change=save_chesscom
+    on_change=save_roster
 )
 
+# Потоковый режим: строки таблицы появляются по мере ответов сайтов.
+stream_mode = st.checkbox("Показывать результаты по мере получения", value=True)
+swr_mode = st.checkbox("Сразу показывать последние известные рейтинги и обновлять их", value=False,
+                       help="Сохранённые рейтинги выводятся мгновенно с возрастом данных, свежие подставляются по мере ответов")
+
 # Кнопка для запуска.
 if st.button("Получить рейтинги"):
-    # Сохраняем введённые ники в session_state и файл.
-    st.session_state['lichess_nicks'] = lichess_nicks
-    st.session_state['chesscom_nicks'] = chesscom_nicks
-    save_nicknames(lichess_nicks, chesscom_nicks)
-
-    # Разбиваем ники на списки (удаляем пробелы).
-    lichess_list = [nick.strip() for nick in lichess_nicks.split(',') if nick.strip()]
-    chesscom_list = [nick.strip() for nick in chesscom_nicks.split(',') if nick.strip()]
-
-    # Если списки разной длины — берём минимальную.
-    min_len = min(len(lichess_list), len(chesscom_list))
-    results = []
-
-    # Цикл по игрокам (предполагаем пары: первый Lichess с первым Chess.com и т.д.).
-    for i in range(min_len):
-        lichess_user = lichess_list[i]
-        chesscom_user = chesscom_list[i]
-
-        lichess_ratings = get_lichess_ratings(lichess_user)
-        chesscom_ratings = get_chesscom_ratings(chesscom_user)
-
-        row = {
-            'Игрок (Lichess / Chess.com)': f"{lichess_user} / {chesscom_user}",
-            'Lichess Bullet': lichess_ratings.get('bullet', lichess_ratings.get('error', 'Ошибка')),
-            'Lichess Blitz': lichess_ratings.get('blitz', lichess_ratings.get('error', 'Ошибка')),
-            'Chess.com Bullet': chesscom_ratings.get('bullet', chesscom_ratings.get('error', 'Ошибка')),
-            'Chess.com Blitz': chesscom_ratings.get('blitz', chesscom_ratings.get('error', 'Ошибка'))
-        }
-        results.append(row)
-
-    if results:
-        df = pd.DataFrame(results)
-        # st.dataframe(df, width='stretch')
-
-        # 1. Добавление новой колонки "№" (или "Индекс"), начинающейся с 1
-        # 'df.index' - это стандартный индекс, начинающийся с 0.
-        # 'df.index + 1' - это нумерация, начинающаяся с 1.
-        df.insert(0, '№', df.index + 1)
+    # Сохраняем введённые ники в базу списков.
+    save_nicknames(owner, st.session_state['roster_name'], lichess_nicks, chesscom_nicks)
 
-        # 2. Вывод таблицы
-        # hide_index=True, чтобы скрыть старый индекс Pandas (0, 1, 2...)
-        st.dataframe(df, width='stretch', hide_index=True)
+    # Разбиваем ники на игроков (удаляем пробелы); ники без пары не отбрасываются.
+    players = parse_players(lichess_nicks, chesscom_nicks)
 
-    else:
+    if not players:
         st.warning("Введите никнеймы для получения данных.")
+    elif swr_mode:
+        # Таблица из сохранённых рейтингов сразу, свежие значения — по мере ответов.
+        swr_ratings_table(players)
+    elif stream_mode:
+        # Таблица появляется сразу и заполняется по мере ответов сайтов.
+        stream_ratings_table(players)
+    else:
+        # Запрашиваем всех игроков на обоих сайтах параллельно (пары: первый Lichess с первым Chess.com и т.д.).
+        # Порядок строк в таблице остаётся таким же, как во входных списках.
+        lichess_results, chesscom_results = fetch_player_ratings(players)
+        rating_history.record_run(players, lichess_results, chesscom_results)
+
+        # Таблица с колонкой "№", начинающейся с 1; большая выводится по страницам.
+        show_results(build_table(players, lichess_results, chesscom_results))
+else:
+    # Таблица прошлого запроса остаётся на странице при листании и сортировке.
+    show_saved_results()
@@ -1,38 +1,8 @@
 import streamlit as st
-import requests
-import pandas as pd
 import streamlit.components.v1 as components
-
-def get_lichess_ratings(username):
-    url = f"https://lichess.org/api/user/{username}"
-    try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            perfs = data.get('perfs', {})
-            bullet = perfs.get('bullet', {}).get('rating', 'NA')
-            blitz = perfs.get('blitz', {}).get('rating', 'NA')
-            return bullet, blitz
-        else:
-            return 'error', 'error'
-    except Exception:
-        return 'error', 'error'
-
-def get_chesscom_ratings(username):
-    username = username.lower()
-    url = f"https://api.chess.com/pub/player/{username}/stats"
-    headers = {"User-Agent": "my-app"}
-    try:
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            data = response.json()
-            bullet = data.get('chess_bullet', {}).get('last', {}).get('rating', 'NA')
-            blitz = data.get('chess_blitz', {}).get('last', {}).get('rating', 'NA')
-            return bullet, blitz
-        else:
-            return 'error', 'error'
-    except Exception:
-        return 'error', 'error'
+import rating_history
+from rating_table import build_table, show_results, show_saved_results
+from ratings import fetch_player_ratings, parse_players
 
 st.title("v1.4 Lichess Chess.com — with localStorage")
 
@@ -65,28 +35,16 @@ lichess_input = st.text_input("Lichess (синхр. с localStorage):", key="lic
 chesscom_input = st.text_input("Chess.com (синхр. с localStorage):", key="chesscom_input", value="")
 
 if st.button("Получить рейтинги"):
-    lichess_list = [nick.strip() for nick in lichess_input.split(',') if nick.strip()]
-    chesscom_list = [nick.strip() for nick in chesscom_input.split(',') if nick.strip()]
-    min_len = min(len(lichess_list), len(chesscom_list))
-
-    results = []
-    for i in range(min_len):
-        l_user = lichess_list[i]
-        c_user = chesscom_list[i]
-        l_bullet, l_blitz = get_lichess_ratings(l_user)
-        c_bullet, c_blitz = get_chesscom_ratings(c_user)
-        results.append({
-            "Lichess": l_user,
-            "Chess.com": c_user,
-            "Lichess Bullet": l_bullet,
-            "Lichess Blitz": l_blitz,
-            "Chess.com Bullet": c_bullet,
-            "Chess.com Blitz": c_blitz
-        })
-
-    if results:
-        df = pd.DataFrame(results)
-        df.index = df.index + 1
-        st.dataframe(df, use_container_width=True)
+    # Ники без пары тоже попадают в таблицу; пару можно задать явно: lichess=chesscom.
+    players = parse_players(lichess_input, chesscom_input)
+
+    if players:
+        lichess_results, chesscom_results = fetch_player_ratings(players)
+        rating_history.record_run(players, lichess_results, chesscom_results)
+        # Общая Arrow-таблица: рейтинги числами, ошибки в колонке статуса; большая — по страницам.
+        show_results(build_table(players, lichess_results, chesscom_results))
     else:
-        st.warning("Введите никнеймы в обоих полях через запятую.")
+        st.warning("Введите никнеймы через запятую.")
+else:
+    # Таблица прошлого запроса остаётся на странице при листании и сортировке.
+    show_saved_results()
@@ -0,0 +1,68 @@
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+import decoding
+from bench.stub_servers import chesscom_stats, lichess_user
+
+# Сравнение способов разбора ответов API на телах той же формы, что отдают заглушки.
+#
+#   python -m bench.bench_decoding
+#   python -m bench.bench_decoding --batch 300 --rounds 50
+#
+# Для каждого способа (json, orjson, msgspec — что установлено) меряется время
+# разбора пачки POST /api/users и одиночной статистики Chess.com, а также память,
+# которую держат готовые результаты.
+
+def available_decoders():
+    decoders = ['json']
+    if decoding.orjson is not None:
+        decoders.append('orjson')
+    if decoding.msgspec is not None:
+        decoders.append('msgspec')
+    return decoders
+
+def measure(decoder, users_body, stats_body, rounds):
+    decoding.JSON_DECODER = decoder
+    started = time.perf_counter()
+    for _ in range(rounds):
+        decoding.decode_lichess_users(users_body)
+    users_s = (time.perf_counter() - started) / rounds
+
+    started = time.perf_counter()
+    for _ in range(rounds * 100):
+        decoding.decode_chesscom_stats(stats_body)
+    stats_s = (time.perf_counter() - started) / (rounds * 100)
+
+    tracemalloc.start()
+    results = decoding.decode_lichess_users(users_body)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'decoder': decoder,
+        'batch_ms': round(users_s * 1000, 3),
+        'stats_us': round(stats_s * 1e6, 1),
+        'peak_kb': round(peak / 1024, 1),
+        'retained_bytes_per_result': round(retained / max(1, len(results))),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Сравнение способов разбора JSON-ответов API.')
+    parser.add_argument('--batch', type=int, default=300, help='Игроков в одном ответе POST /api/users')
+    parser.add_argument('--rounds', type=int, default=20, help='Повторов на каждый способ')
+    args = parser.parse_args(argv)
+
+    users_body = json.dumps([lichess_user(f'player{i}') for i in range(args.batch)]).encode('utf-8')
+    stats_body = json.dumps(chesscom_stats('member0')).encode('utf-8')
+    print(f'Ответ /api/users: {len(users_body) / 1024:.0f} КБ, статистика Chess.com: {len(stats_body)} Б')
+    print(f"{'способ':>8} {'пачка, мс':>10} {'stats, мкс':>11} {'пик, КБ':>8} {'Б/результат':>12}")
+    for decoder in available_decoders():
+        result = measure(decoder, users_body, stats_body, args.rounds)
+        print(f"{result['decoder']:>8} {result['batch_ms']:>10} {result['stats_us']:>11} "
+              f"{result['peak_kb']:>8} {result['retained_bytes_per_result']:>12}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from bench.stub_servers import StubConfig, start_stub_servers, stop_stub_servers
+
+# Бенчмарк цикла "Получить рейтинги" без обращения к настоящим API.
+#
+#   python -m bench.bench_fetch
+#   python -m bench.bench_fetch --sizes 10,100 --latency 0.1 --rate-limit-rate 0.05
+#
+# Поднимает локальные заглушки Lichess и Chess.com (bench/stub_servers.py) и для
+# каждого размера списка запускает отдельный процесс, который делает то же, что
+# app.py по кнопке: fetch_player_ratings + build_table. Отдельный процесс нужен,
+# чтобы пиковая память (RSS) и холодные кэши считались для каждого размера честно.
+
+DEFAULT_SIZES = '10,100,1000,10000'
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+# Каждый 50-й игрок не существует, чтобы в прогоне были и ответы 404.
+def make_roster(size):
+    lichess_list = [f'ghost{i}' if i % 50 == 49 else f'player{i}' for i in range(size)]
+    chesscom_list = [f'ghost{i}' if i % 50 == 49 else f'member{i}' for i in range(size)]
+    return lichess_list, chesscom_list
+
+# Один прогон в дочернем процессе; печатает результат одной строкой JSON.
+def run_child(size):
+    import http_client
+    from ratings import fetch_player_ratings
+    from rating_table import build_table
+
+    latencies = []
+    original_request = http_client.request
+
+    def timed_request(method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            return original_request(method, url, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    http_client.request = timed_request
+
+    players = list(zip(*make_roster(size)))
+    started = time.perf_counter()
+    lichess_results, chesscom_results = fetch_player_ratings(players, deadline=0)
+    build_table(players, lichess_results, chesscom_results)
+    wall = time.perf_counter() - started
+
+    errors = sum('error' in result for result in lichess_results + chesscom_results)
+    print(json.dumps({
+        'size': size,
+        'wall_s': round(wall, 3),
+        'requests': len(latencies),
+        'requests_per_s': round(len(latencies) / wall, 1) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        'errors': errors,
+        # ru_maxrss в Linux — в килобайтах.
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Офлайн-бенчмарк получения рейтингов на локальных заглушках API.')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='Размеры списков через запятую')
+    parser.add_argument('--latency', type=float, default=0.02, help='Средняя задержка ответа заглушки, с')
+    parser.add_argument('--jitter', type=float, default=0.01, help='Разброс задержки, с')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Доля ответов 429')
+    parser.add_argument('--real-limits', action='store_true',
+                        help='Оставить лимиты настоящих API (по умолчанию лимиты сняты, меряется сам код)')
+    parser.add_argument('--json', help='Сохранить результаты в JSON-файл')
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child is not None:
+        run_child(args.child)
+        return 0
+
+    config = StubConfig(latency=args.latency, jitter=args.jitter,
+                        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate)
+    servers = start_stub_servers(config)
+    env = dict(os.environ,
+               LICHESS_API=servers[0].url,
+               CHESSCOM_API=servers[1].url,
+               RATING_STORE_PATH='',
+               RATING_HISTORY_PATH='')
+    if not args.real_limits:
+        env.update(LICHESS_RATE='100000', CHESSCOM_RATE='100000',
+                   LICHESS_MAX_PARALLEL='8', CHESSCOM_MAX_PARALLEL='8', CHESSCOM_MAX_WORKERS='8')
+
+    results = []
+    try:
+        print(f"{'игроков':>8} {'время, с':>9} {'запросов':>9} {'запр/с':>8} {'p50, мс':>8} {'p99, мс':>8} {'ошибок':>7} {'RSS, МБ':>8}")
+        for size in [int(value) for value in args.sizes.split(',') if value.strip()]:
+            completed = subprocess.run(
+                [sys.executable, '-m', 'bench.bench_fetch', '--child', str(size)],
+                env=env, capture_output=True, text=True, check=True
+            )
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(f"{result['size']:>8} {result['wall_s']:>9} {result['requests']:>9} {result['requests_per_s']:>8} "
+                  f"{result['p50_ms']:>8} {result['p99_ms']:>8} {result['errors']:>7} {result['peak_rss_mb']:>8}")
+    finally:
+        stop_stub_servers(servers)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from bench.stub_servers import StubConfig, start_stub_servers, stop_stub_servers
+
+# Несколько реплик приложения с общим сервисом рейтингов и без него.
+#
+#   python -m bench.bench_service
+#   python -m bench.bench_service --replicas 4 --size 200 --listen unix:///tmp/ratings.sock
+#
+# Поднимает заглушки API, затем --replicas процессов одновременно запрашивают
+# один и тот же список. Без сервиса каждый процесс ходит к API сам; с сервисом
+# (rating_service.py в отдельном процессе) повторы отдаются из общего кэша.
+# Печатает число запросов, дошедших до заглушек, и время самой медленной реплики.
+
+REPLICA = '''
+import json, sys, time
+from ratings import fetch_player_ratings
+size = int(sys.argv[1])
+players = [(f'player{i}', f'member{i}') for i in range(size)]
+started = time.perf_counter()
+lichess_results, chesscom_results = fetch_player_ratings(players, deadline=0)
+print(json.dumps({
+    'wall_s': time.perf_counter() - started,
+    'errors': sum('error' in result for result in lichess_results + chesscom_results),
+}))
+'''
+
+def run_replicas(env, replicas, size):
+    processes = [subprocess.Popen([sys.executable, '-c', REPLICA, str(size)], env=env,
+                                  stdout=subprocess.PIPE, text=True)
+                 for _ in range(replicas)]
+    return [json.loads(process.communicate()[0]) for process in processes]
+
+def wait_for_service(listen, timeout=10):
+    import rating_client
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = rating_client.connect(listen, 1)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'сервис {listen} не запустился')
+
+def main():
+    parser = argparse.ArgumentParser(description='Реплики с общим сервисом рейтингов и без него')
+    parser.add_argument('--replicas', type=int, default=4)
+    parser.add_argument('--size', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--listen', default='http://127.0.0.1:8765')
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    base_env = dict(os.environ, PYTHONPATH=root, RATING_STORE_PATH='', ROSTER_STORE_PATH='',
+                    RATING_HISTORY_PATH='', RATING_SERVICE_URL='')
+    results = []
+    for mode in ('local', 'service'):
+        servers = start_stub_servers(StubConfig(latency=args.latency))
+        env = dict(base_env, LICHESS_API=servers[0].url, CHESSCOM_API=servers[1].url)
+        service = None
+        if mode == 'service':
+            service = subprocess.Popen([sys.executable, os.path.join(root, 'rating_service.py'),
+                                        '--listen', args.listen], env=env, stderr=subprocess.DEVNULL)
+            wait_for_service(args.listen)
+            env['RATING_SERVICE_URL'] = args.listen
+        try:
+            replicas = run_replicas(env, args.replicas, args.size)
+        finally:
+            if service is not None:
+                service.terminate()
+                service.wait()
+        results.append({
+            'mode': mode,
+            'replicas': args.replicas,
+            'upstream_requests': servers[0].requests + servers[1].requests,
+            'slowest_replica_s': round(max(replica['wall_s'] for replica in replicas), 2),
+            'errors': sum(replica['errors'] for replica in replicas),
+        })
+        stop_stub_servers(servers)
+
+    for result in results:
+        print(json.dumps(result, ensure_ascii=False))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,351 @@
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from bench.stub_servers import StubConfig, start_stub_servers, stop_stub_servers
+
+# Нагрузочный тест приложений Streamlit: как растут время перезапуска скрипта
+# и память сервера с числом одновременных пользователей.
+#
+#   python -m bench.bench_sessions
+#   python -m bench.bench_sessions --scripts app.py --concurrency 1,4,16 --iterations 5 --size 50
+#
+# Для каждого уровня одновременности запускается настоящий сервер `streamlit run`
+# (один процесс, как в работе), и к нему подключаются N сессий так же, как
+# браузер: WebSocket /_stcore/stream, сообщения BackMsg/ForwardMsg. Каждая сессия
+# открывает страницу, вводит ники, нажимает "Получить рейтинги" и очищает поля —
+# против локальных заглушек API. Сессии подключаются заранее и стартуют вместе.
+# Перезапуск — от отправки rerun_script до script_finished (для фрагментов —
+# перезапуск фрагмента, как в браузере). Печатает p50/p95/p99 длительности
+# перезапуска, пропускную способность (перезапусков и нажатий в секунду) и память
+# процесса сервера (RSS): до подключения сессий, пик за уровень и прирост на
+# сессию, пока все сессии ещё подключены. Если сессия упала, скрипт выбросил
+# исключение или сделаны не все перезапуски (1 + 3 × --iterations), код выхода 1.
+
+DEFAULT_SCRIPTS = 'app.py,app_gr_cl.py'
+DEFAULT_CONCURRENCY = '1,2,4,8'
+SERVER_START_TIMEOUT = 60
+RERUN_TIMEOUT = 300
+RSS_SAMPLE_INTERVAL = 0.05
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+# Текущая память процесса pid (RSS) в байтах; без /proc — через ps.
+def process_rss(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        output = subprocess.run(['ps', '-o', 'rss=', '-p', str(pid)], capture_output=True, text=True).stdout
+        return int(output.strip()) * 1024
+    except (OSError, ValueError):
+        return 0
+
+# Пиковая память процесса за время работы (опрос раз в RSS_SAMPLE_INTERVAL).
+class RssSampler:
+    def __init__(self, pid):
+        self.pid = pid
+        self.peak = process_rss(pid)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            self.peak = max(self.peak, process_rss(self.pid))
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.peak
+
+# Ники одного нажатия: случайные из общего набора --pool, так что сессии
+# частично пересекаются, как пользователи с общими клубами.
+def make_nicknames(rng, size, pool):
+    numbers = rng.sample(range(pool), size)
+    return ', '.join(f'player{n}' for n in numbers), ', '.join(f'member{n}' for n in numbers)
+
+def reruns_per_session(iterations):
+    return 1 + 3 * iterations
+
+# Сервер `streamlit run script` на свободном порту; ждёт, пока /_stcore/health
+# ответит ok. Вывод сервера пишется в log_path.
+def start_server(root, env, script, log_path):
+    port = free_port()
+    command = [sys.executable, '-m', 'streamlit', 'run', os.path.join(root, script),
+               '--server.headless', 'true', '--server.address', '127.0.0.1', '--server.port', str(port),
+               '--server.fileWatcherType', 'none', '--browser.gatherUsageStats', 'false']
+    with open(log_path, 'w') as log:
+        process = subprocess.Popen(command, env=env, cwd=root, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1) as response:
+                if response.read() == b'ok':
+                    return process, port
+        except OSError:
+            time.sleep(0.1)
+    stop_server(process)
+    with open(log_path) as log:
+        tail = log.read().strip().splitlines()[-5:]
+    raise RuntimeError(f"сервер {script} не запустился: {' | '.join(tail)}")
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+# Одна вкладка браузера поверх WebSocket: помнит виджеты страницы (id, вид,
+# подпись, фрагмент) и их текущие значения и отправляет их при каждом
+# перезапуске, как это делает фронтенд Streamlit.
+class BrowserSession:
+    def __init__(self, websocket):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        self._BackMsg, self._ForwardMsg, self._WidgetState = BackMsg, ForwardMsg, WidgetState
+        self.websocket = websocket
+        self.page_script_hash = ''
+        self.widgets = {}  # id -> (вид, подпись, id фрагмента)
+        self.values = {}   # id -> WidgetState
+        self.errors = []   # исключения, выведенные скриптом
+
+    # id виджета по ключу (id оканчивается на "-ключ") или по подписи; None — нет такого.
+    def find(self, key=None, label=None):
+        for widget_id, (_, widget_label, _) in self.widgets.items():
+            if (key and widget_id.endswith('-' + key)) or (label and widget_label == label):
+                return widget_id
+        return None
+
+    def fragment_of(self, widget_id):
+        return self.widgets[widget_id][2]
+
+    def set_text(self, widget_id, value):
+        self.values[widget_id] = self._WidgetState(id=widget_id, string_value=value)
+
+    # Перезапуск скрипта (или фрагмента fragment_id) с текущими значениями виджетов;
+    # trigger — id нажатой кнопки. Возвращает длительность в секундах.
+    def rerun(self, fragment_id='', trigger=None):
+        message = self._BackMsg()
+        client_state = message.rerun_script
+        client_state.query_string = ''
+        client_state.page_script_hash = self.page_script_hash
+        if fragment_id:
+            client_state.fragment_id = fragment_id
+        client_state.widget_states.widgets.extend(self.values.values())
+        if trigger is not None:
+            client_state.widget_states.widgets.append(self._WidgetState(id=trigger, trigger_value=True))
+        started = time.perf_counter()
+        self.websocket.send(message.SerializeToString())
+        self._wait_finished()
+        return time.perf_counter() - started
+
+    # Читает ответы сервера до конца перезапуска. st.rerun() завершает прогон
+    # досрочно и сразу начинает новый — ждём и его.
+    def _wait_finished(self):
+        ForwardMsg = self._ForwardMsg
+        while True:
+            message = ForwardMsg()
+            message.ParseFromString(self.websocket.recv(timeout=RERUN_TIMEOUT))
+            kind = message.WhichOneof('type')
+            if kind == 'new_session':
+                self.page_script_hash = message.new_session.page_script_hash
+            elif kind == 'delta' and message.delta.WhichOneof('type') == 'new_element':
+                self._note_element(message.delta.new_element, message.delta.fragment_id)
+            elif kind == 'script_finished':
+                if message.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    self.errors.append('ошибка компиляции скрипта')
+                if message.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    return
+
+    def _note_element(self, element, fragment_id):
+        kind = element.WhichOneof('type')
+        if kind == 'exception':
+            self.errors.append(f'{element.exception.type}: {element.exception.message}')
+            return
+        proto = getattr(element, kind)
+        widget_id = getattr(proto, 'id', '')
+        if widget_id:
+            self.widgets[widget_id] = (kind, getattr(proto, 'label', ''), fragment_id)
+
+# Одна сессия: первый заход на страницу, затем iterations раз ввод -> кнопка -> очистка.
+# Исключение (нет кнопки, нет поля, обрыв соединения) записывается в errors и
+# заканчивает сессию: недоделанные перезапуски покажет проверка их числа.
+def run_session(session, number, iterations, size, pool, reruns, clicks, errors):
+    rng = random.Random(number)
+
+    def rerun(kind, fragment_id='', trigger=None):
+        elapsed = session.rerun(fragment_id, trigger)
+        reruns.append(elapsed)
+        if kind == 'click':
+            clicks.append(elapsed)
+
+    try:
+        rerun('open')
+        lichess_input = session.find(key='lichess_input')
+        chesscom_input = session.find(key='chesscom_input')
+        button = session.find(label='Получить рейтинги')
+        clear = session.find(label='Очистить поля')
+        if not (lichess_input and chesscom_input and button):
+            raise LookupError('на странице нет полей ввода или кнопки "Получить рейтинги"')
+        for _ in range(iterations):
+            lichess, chesscom = make_nicknames(rng, size, pool)
+            session.set_text(lichess_input, lichess)
+            session.set_text(chesscom_input, chesscom)
+            rerun('input', session.fragment_of(lichess_input))
+            rerun('click', session.fragment_of(button), button)
+            if clear:
+                rerun('clear', session.fragment_of(clear), clear)
+            else:
+                session.set_text(lichess_input, '')
+                session.set_text(chesscom_input, '')
+                rerun('clear', session.fragment_of(lichess_input))
+    except Exception as e:
+        errors.append(f'{type(e).__name__}: {e}')
+    errors.extend(session.errors)
+
+# Один уровень одновременности: свой сервер, sessions подключений, общий старт.
+# Память на сессию меряется, пока все сессии ещё подключены (их состояние живо).
+def run_level(root, env, script, sessions, args, log_path):
+    from websockets.sync.client import connect
+
+    process, port = start_server(root, env, script, log_path)
+    url = f'ws://127.0.0.1:{port}/_stcore/stream'
+    reruns, clicks, errors = [], [], []
+    try:
+        # Разминочная сессия с одним нажатием: импорт модулей (streamlit, pyarrow)
+        # и первые прогоны скрипта — разовая цена процесса сервера, а не сессии.
+        # Её перезапуски не учитываются, ошибки — учитываются.
+        with connect(url, subprotocols=['streamlit'], max_size=None) as websocket:
+            run_session(BrowserSession(websocket), -1, 1, args.size, args.pool, [], [], errors)
+        time.sleep(0.5)
+        base_rss = process_rss(process.pid)
+
+        started = threading.Barrier(sessions + 1)
+        finished = threading.Barrier(sessions + 1)
+        release = threading.Event()
+
+        def client(number):
+            stage = 'connect'
+            try:
+                with connect(url, subprotocols=['streamlit'], max_size=None) as websocket:
+                    session = BrowserSession(websocket)
+                    started.wait()
+                    stage = 'run'
+                    run_session(session, number, args.iterations, args.size, args.pool, reruns, clicks, errors)
+                    finished.wait()
+                    stage = 'done'
+                    release.wait()
+            except Exception as e:
+                errors.append(f'{type(e).__name__}: {e}')
+            if stage == 'connect':
+                started.wait()
+            if stage != 'done':
+                finished.wait()
+
+        threads = [threading.Thread(target=client, args=(number,), daemon=True) for number in range(sessions)]
+        for thread in threads:
+            thread.start()
+        started.wait()
+        sampler = RssSampler(process.pid)
+        wall_started = time.perf_counter()
+        finished.wait()
+        wall = time.perf_counter() - wall_started
+        loaded_rss = process_rss(process.pid)
+        peak_rss = max(sampler.stop(), loaded_rss)
+        release.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        stop_server(process)
+
+    expected = sessions * reruns_per_session(args.iterations)
+    return {
+        'script': script,
+        'sessions': sessions,
+        'reruns': len(reruns),
+        'expected_reruns': expected,
+        'rerun_p50_ms': round(percentile(reruns, 0.50) * 1000, 1),
+        'rerun_p95_ms': round(percentile(reruns, 0.95) * 1000, 1),
+        'rerun_p99_ms': round(percentile(reruns, 0.99) * 1000, 1),
+        'click_p95_ms': round(percentile(clicks, 0.95) * 1000, 1),
+        'reruns_per_s': round(len(reruns) / wall, 2),
+        'clicks_per_s': round(len(clicks) / wall, 2),
+        'server_mb': round(base_rss / 2 ** 20, 1),
+        'server_peak_mb': round(peak_rss / 2 ** 20, 1),
+        'mb_per_session': round((loaded_rss - base_rss) / sessions / 2 ** 20, 2),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'wall_s': round(wall, 2),
+        'complete': len(reruns) == expected and not errors,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест сессий Streamlit на заглушках API')
+    parser.add_argument('--scripts', default=DEFAULT_SCRIPTS, help='скрипты через запятую')
+    parser.add_argument('--concurrency', default=DEFAULT_CONCURRENCY, help='числа сессий через запятую')
+    parser.add_argument('--iterations', type=int, default=3, help='нажатий кнопки на сессию')
+    parser.add_argument('--size', type=int, default=20, help='игроков в одном нажатии')
+    parser.add_argument('--pool', type=int, default=2000, help='из скольких ников выбираются игроки')
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--jitter', type=float, default=0.02)
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    servers = start_stub_servers(StubConfig(latency=args.latency, jitter=args.jitter))
+    incomplete = []
+    try:
+        for script in args.scripts.split(','):
+            script = script.strip()
+            for sessions in [int(value) for value in args.concurrency.split(',')]:
+                with tempfile.TemporaryDirectory() as tmp:
+                    # Базы и история — во временной папке, чтобы каждый уровень начинался с нуля.
+                    env = dict(os.environ, PYTHONPATH=root,
+                               LICHESS_API=servers[0].url, CHESSCOM_API=servers[1].url,
+                               RATING_STORE_PATH=os.path.join(tmp, 'ratings.sqlite3'),
+                               ROSTER_STORE_PATH=os.path.join(tmp, 'rosters.sqlite3'),
+                               RATING_HISTORY_PATH='', RATING_SERVICE_URL='', PREWARM_INTERVAL='0')
+                    try:
+                        result = run_level(root, env, script, sessions, args, os.path.join(tmp, 'server.log'))
+                    except RuntimeError as e:
+                        result = {'script': script, 'sessions': sessions, 'errors': 1,
+                                  'first_error': str(e), 'complete': False}
+                print(json.dumps(result, ensure_ascii=False), flush=True)
+                if not result['complete']:
+                    incomplete.append(f'{script}×{sessions}')
+    finally:
+        stop_stub_servers(servers)
+
+    if incomplete:
+        print(f"Не все перезапуски выполнены без ошибок: {', '.join(incomplete)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
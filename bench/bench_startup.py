@@ -0,0 +1,131 @@
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Холодный старт приложений: сколько проходит от запуска нового процесса до
+# первой отрисовки страницы и какие тяжёлые модули при этом импортируются.
+#
+#   python -m bench.bench_startup
+#   python -m bench.bench_startup --scripts app.py --runs 10 --budget 0.6
+#
+# Каждый замер — отдельный процесс, который импортирует streamlit и один раз
+# выполняет скрипт через AppTest (открытие страницы без нажатий). Если медиана
+# первой отрисовки какого-либо скрипта больше его бюджета (--budget секунд, у панели
+# аналитики — DASHBOARD_STARTUP_BUDGET) или скрипт выбросил исключение, код выхода 1 —
+# так бенчмарк можно поставить проверкой перед выкладкой. Панель аналитики получает
+# небольшую временную историю, чтобы замер включал чтение данных и графики.
+
+DEFAULT_SCRIPTS = 'app.py,app_gr_cl.py,app_gr.py,app_perplex.py,dashboard_example.py'
+# Модули, которые не нужны до первой таблицы.
+HEAVY_MODULES = ('pandas', 'numpy', 'pyarrow')
+STARTUP_BUDGET = float(os.environ.get('STARTUP_BUDGET', 0.8))
+# Панель аналитики сразу читает историю через pyarrow и pandas, поэтому её
+# первая отрисовка сравнивается со своим бюджетом, а не с бюджетом страниц ввода.
+SCRIPT_BUDGETS = {'dashboard_example.py': float(os.environ.get('DASHBOARD_STARTUP_BUDGET', 2.5))}
+# Небольшая история для dashboard_example.py: дней × игроков на каждом сайте.
+HISTORY_DAYS = 14
+HISTORY_PLAYERS = 30
+
+def median(values):
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2]
+
+# Пишет в path историю рейтингов за последние HISTORY_DAYS дней, чтобы панель
+# аналитики строила графики, а не останавливалась на «История пуста».
+def write_history(path):
+    import rating_history
+
+    rating_history.RATING_HISTORY_PATH = path
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for day in range(HISTORY_DAYS):
+        rows = {(site, f'{site}_player{i}'): (1500 + i * 10 + day, 1600 + i * 10 - day)
+                for site in ('lichess', 'chesscom') for i in range(HISTORY_PLAYERS)}
+        rating_history.append(rows, ts=now - datetime.timedelta(days=day))
+
+# Один холодный запуск в дочернем процессе; печатает результат строкой JSON.
+def run_child(script):
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    imported = time.perf_counter()
+    at = AppTest.from_file(script, default_timeout=60).run()
+    painted = time.perf_counter()
+    print(json.dumps({
+        'streamlit_import_s': imported - started,
+        'first_paint_s': painted - imported,
+        'heavy_modules': [name for name in HEAVY_MODULES if name in sys.modules],
+        'errors': len(at.exception),
+        'first_error': at.exception[0].message if at.exception else None,
+    }))
+
+# Замеры всех скриптов; возвращает (скрипты сверх бюджета, скрипты с исключениями).
+def run_scripts(root, env, args):
+    over_budget = []
+    failed = []
+    for script in args.scripts.split(','):
+        script = script.strip()
+        runs = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            output = subprocess.run([sys.executable, '-m', 'bench.bench_startup', '--child', os.path.join(root, script)],
+                                    env=env, cwd=root, capture_output=True, text=True, check=True).stdout
+            run = json.loads(output.strip().splitlines()[-1])
+            run['process_s'] = time.perf_counter() - started
+            runs.append(run)
+        first_paint = median([run['first_paint_s'] for run in runs])
+        budget = SCRIPT_BUDGETS.get(script, args.budget)
+        result = {
+            'script': script,
+            'runs': args.runs,
+            'process_s': round(median([run['process_s'] for run in runs]), 3),
+            'streamlit_import_s': round(median([run['streamlit_import_s'] for run in runs]), 3),
+            'first_paint_s': round(first_paint, 3),
+            'heavy_modules': sorted({name for run in runs for name in run['heavy_modules']}),
+            'errors': sum(run['errors'] for run in runs),
+            'first_error': next((run['first_error'] for run in runs if run['first_error']), None),
+            'budget_s': budget,
+            'within_budget': first_paint <= budget,
+        }
+        print(json.dumps(result, ensure_ascii=False))
+        if not result['within_budget']:
+            over_budget.append(script)
+        if result['errors']:
+            failed.append(script)
+    return over_budget, failed
+
+def main():
+    parser = argparse.ArgumentParser(description='Холодный старт и первая отрисовка приложений')
+    parser.add_argument('--scripts', default=DEFAULT_SCRIPTS, help='скрипты через запятую')
+    parser.add_argument('--runs', type=int, default=5, help='холодных запусков на скрипт')
+    parser.add_argument('--budget', type=float, default=STARTUP_BUDGET,
+                        help='допустимая медиана первой отрисовки, секунды (по умолчанию %(default)s)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child)
+        return
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as tmp:
+        history = os.path.join(tmp, 'rating_history')
+        write_history(history)
+        # Без баз: замеряется сам старт, а не открытие файлов с данными. История —
+        # небольшой временный набор, иначе панель аналитики не дошла бы до графиков.
+        env = dict(os.environ, PYTHONPATH=root, RATING_STORE_PATH='', ROSTER_STORE_PATH='',
+                   RATING_HISTORY_PATH=history, PREWARM_INTERVAL='0')
+        over_budget, failed = run_scripts(root, env, args)
+
+    if over_budget:
+        print(f"Первая отрисовка дольше бюджета: {', '.join(over_budget)}", file=sys.stderr)
+    if failed:
+        print(f"Скрипт выбросил исключение: {', '.join(failed)}", file=sys.stderr)
+    if over_budget or failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+# Локальные заглушки API Lichess и Chess.com для бенчмарков и нагрузочных тестов.
+# Отдают ответы по форме близкие к настоящим (все режимы игры, профиль, счётчики),
+# с настраиваемой задержкой, разбросом, долей ошибок 500 и долей ответов 429.
+# Ники, начинающиеся с "ghost", считаются несуществующими (404).
+# Команды Lichess и клубы Chess.com: число участников — цифры в конце
+# идентификатора ("club-5000" — 5000 участников, без цифр — 100).
+
+class StubConfig:
+    def __init__(self, latency=0.05, jitter=0.02, error_rate=0.0, rate_limit_rate=0.0, retry_after=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+
+# Рейтинг зависит только от ника, чтобы повторные прогоны давали одинаковые данные.
+def _rating(username, mode):
+    return 800 + zlib.crc32(f'{username}:{mode}'.encode('utf-8')) % 2000
+
+def _perf(username, mode):
+    return {'games': 1000, 'rating': _rating(username, mode), 'rd': 45, 'prog': 12, 'prov': False}
+
+def lichess_user(username):
+    modes = ['bullet', 'blitz', 'rapid', 'classical', 'correspondence', 'chess960',
+             'kingOfTheHill', 'threeCheck', 'antichess', 'atomic', 'horde', 'racingKings',
+             'crazyhouse', 'ultraBullet', 'puzzle']
+    return {
+        'id': username.lower(),
+        'username': username,
+        'perfs': {mode: _perf(username, mode) for mode in modes},
+        'createdAt': 1500000000000,
+        'profile': {'country': 'RU', 'bio': 'Шахматы — это жизнь. ' * 10, 'fideRating': 2000},
+        'seenAt': 1700000000000,
+        'playTime': {'total': 3000000, 'tv': 1000},
+        'url': f'https://lichess.org/@/{username}',
+        'count': {'all': 12000, 'rated': 11000, 'ai': 10, 'draw': 800, 'loss': 5000, 'win': 6200,
+                  'bookmark': 5, 'playing': 0, 'import': 0, 'me': 0},
+        'followable': True,
+        'following': False,
+        'blocking': False,
+    }
+
+def chesscom_stats(username):
+    def mode(name):
+        return {
+            'last': {'rating': _rating(username, name), 'date': 1700000000, 'rd': 50},
+            'best': {'rating': _rating(username, name) + 100, 'date': 1650000000,
+                     'game': f'https://www.chess.com/game/live/{zlib.crc32(username.encode("utf-8"))}'},
+            'record': {'win': 5000, 'loss': 4000, 'draw': 500},
+        }
+    return {
+        'chess_daily': mode('daily'),
+        'chess_rapid': mode('rapid'),
+        'chess_bullet': mode('bullet'),
+        'chess_blitz': mode('blitz'),
+        'fide': 0,
+        'tactics': {'highest': {'rating': 2500, 'date': 1600000000}, 'lowest': {'rating': 400, 'date': 1500000000}},
+        'puzzle_rush': {'best': {'total_attempts': 40, 'score': 35}},
+    }
+
+def member_count(source_id):
+    digits = ''
+    for char in reversed(source_id):
+        if not char.isdigit():
+            break
+        digits = char + digits
+    return int(digits) if digits else 100
+
+def member_names(source_id):
+    prefix = source_id.rstrip('0123456789').strip('-_') or 'club'
+    return [f'{prefix}_member{i}' for i in range(member_count(source_id))]
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, как у настоящих API
+    # Заголовки и тело уходят одним пакетом, иначе Nagle + отложенный ACK
+    # добавляют к каждому ответу ~40 мс, которых у настоящих API нет.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    # Ответ частями (Transfer-Encoding: chunked), как потоковые эндпоинты Lichess.
+    def _send_chunked(self, content_type, parts):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for part in parts:
+            if part:
+                self.wfile.write(f'{len(part):x}\r\n'.encode('ascii') + part + b'\r\n')
+                self.wfile.flush()
+        self.wfile.write(b'0\r\n\r\n')
+
+    # Общая часть для всех запросов: задержка, инъекция 429 и 500. True — ответ уже отправлен.
+    def _simulate(self):
+        config = self.server.config
+        self.server.count()
+        time.sleep(max(0.0, random.gauss(config.latency, config.jitter)))
+        if random.random() < config.rate_limit_rate:
+            self._send_json(429, {'error': 'Too many requests'}, {'Retry-After': str(config.retry_after)})
+            return True
+        if random.random() < config.error_rate:
+            self._send_json(500, {'error': 'Internal error'})
+            return True
+        return False
+
+class LichessHandler(_Handler):
+    def do_GET(self):
+        if self._simulate():
+            return
+        path = urlsplit(self.path).path
+        if path.startswith('/api/team/'):
+            return self._team(path[len('/api/team/'):].split('/'))
+        if not path.startswith('/api/user/'):
+            return self._send_json(404, {'error': 'Not found'})
+        username = path[len('/api/user/'):]
+        if username.lower().startswith('ghost'):
+            return self._send_json(404, {'error': 'Not found'})
+        self._send_json(200, lichess_user(username))
+
+    # /api/team/{id} — сведения о команде, /api/team/{id}/users — участники в NDJSON.
+    def _team(self, parts):
+        team_id = parts[0]
+        if team_id.startswith('ghost'):
+            return self._send_json(404, {'error': 'Not found'})
+        if len(parts) == 1:
+            return self._send_json(200, {'id': team_id, 'name': team_id, 'nbMembers': member_count(team_id)})
+        names = member_names(team_id)
+        self._send_chunked('application/x-ndjson', (
+            b''.join(json.dumps({'id': name, 'name': name, 'joinedTeamAt': 1600000000000}).encode('utf-8') + b'\n'
+                     for name in names[start:start + 100])
+            for start in range(0, len(names), 100)
+        ))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+        if self._simulate():
+            return
+        if urlsplit(self.path).path != '/api/users':
+            return self._send_json(404, {'error': 'Not found'})
+        names = [name.strip() for name in body.split(',') if name.strip()]
+        self._send_json(200, [lichess_user(name) for name in names[:300] if not name.lower().startswith('ghost')])
+
+class ChesscomHandler(_Handler):
+    def do_GET(self):
+        if self._simulate():
+            return
+        parts = urlsplit(self.path).path.strip('/').split('/')
+        if parts[:2] == ['pub', 'club'] and len(parts) in (3, 4):
+            return self._club(parts[2], len(parts) == 4 and parts[3] == 'members')
+        if len(parts) != 4 or parts[:2] != ['pub', 'player'] or parts[3] != 'stats':
+            return self._send_json(404, {'message': 'Not found'})
+        username = parts[2]
+        if username.startswith('ghost'):
+            return self._send_json(404, {'message': f'User "{username}" not found.'})
+        # Как и PubAPI, отдаём ETag и отвечаем 304 на совпадающий If-None-Match.
+        etag = f'"{zlib.crc32(username.encode("utf-8"))}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self._send_json(200, chesscom_stats(username), {'ETag': etag})
+
+    # /pub/club/{id} — сведения о клубе, /pub/club/{id}/members — участники одним JSON.
+    def _club(self, club_id, members):
+        if club_id.startswith('ghost'):
+            return self._send_json(404, {'message': 'Not found'})
+        if not members:
+            return self._send_json(200, {'@id': club_id, 'name': club_id, 'members_count': member_count(club_id)})
+        names = member_names(club_id)
+        self._send_json(200, {
+            'weekly': [],
+            'monthly': [{'username': name, 'joined': 1600000000} for name in names[:10]],
+            'all_time': [{'username': name, 'joined': 1500000000} for name in names[10:]],
+        })
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, config):
+        super().__init__(('127.0.0.1', 0), handler)
+        self.config = config
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+# Запускает обе заглушки в фоновых потоках и возвращает (lichess, chesscom).
+def start_stub_servers(config=None):
+    config = config or StubConfig()
+    servers = (StubServer(LichessHandler, config), StubServer(ChesscomHandler, config))
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return servers
+
+def stop_stub_servers(servers):
+    for server in servers:
+        server.shutdown()
+        server.server_close()
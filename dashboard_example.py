@@ -1,56 +1,106 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
+
+import rating_history
 
 # --- 1. Конфигурация страницы (Запускается первым) ---
 st.set_page_config(
-    page_title="Минималистичный Дэшборд",
+    page_title="Аналитика рейтингов",
     layout="wide"  # Делаем макет широким для лучшего отображения
 )
 
-# --- 2. Условные данные-константы (Фиктивные данные) ---
-
-DATA = {
-    'Месяц': ['Янв', 'Фев', 'Мар', 'Апр', 'Май', 'Июн'],
-    'Продажи ($)': [1500, 2200, 1800, 3100, 2500, 3800],
-    'Клиенты': [15, 25, 20, 35, 30, 42]
+# Периоды для фильтра: подпись -> число дней (None — вся история).
+PERIODS = {
+    'Последние 7 дней': 7,
+    'Последние 30 дней': 30,
+    'Последние 90 дней': 90,
+    'Вся история': None,
 }
-df = pd.DataFrame(DATA)
+SITES = {'lichess': 'Lichess', 'chesscom': 'Chess.com'}
+MODES = {'blitz': 'Блиц', 'bullet': 'Пуля'}
+
+# --- 2. Данные из истории рейтингов (rating_history) ---
+# Все вычисления кэшируются по (фильтр, версия данных): при переключении фильтра
+# на уже виденное значение ничего не пересчитывается, а новый снимок в истории
+# меняет версию и сбрасывает кэш.
+
+# Сырые снимки за период. cache_resource — без копирования большого DataFrame
+# на каждый вызов, поэтому результат только читаем.
+@st.cache_resource(show_spinner=False, max_entries=8)
+def load_history(version, days, sites):
+    df = rating_history.query(days=days, sites=list(sites))
+    df['player'] = df['username'] + ' (' + df['site'].map(SITES) + ')'
+    return df.sort_values('ts', ignore_index=True)
+
+# Последний рейтинг каждого игрока за период и изменение с первого снимка периода.
+@st.cache_data(show_spinner=False, max_entries=32)
+def player_summary(version, days, sites):
+    df = load_history(version, days, sites)
+    grouped = df.groupby('player', sort=False)
+    # first()/last() берут первое/последнее непустое значение в каждой колонке.
+    first = grouped[list(MODES)].first()
+    last = grouped[list(MODES)].last()
+    summary = last.join(last - first, rsuffix='_change')
+    summary['snapshots'] = grouped.size()
+    summary['last_seen'] = grouped['ts'].max()
+    return summary.reset_index()
+
+# Рейтинг по времени для выбранных игроков: строки — снимки, колонки — игроки.
+@st.cache_data(show_spinner=False, max_entries=32)
+def trend(version, days, sites, mode, players):
+    df = load_history(version, days, sites)
+    df = df[df['player'].isin(players)]
+    return df.pivot_table(index='ts', columns='player', values=mode, aggfunc='last')
+
+# --- 3. Заголовок и фильтры ---
+
+st.title("📊 Аналитика рейтингов Lichess и Chess.com")
+st.subheader("По сохранённым снимкам результатов")
+
+version = rating_history.data_version()
+if not rating_history.enabled() or version[0] == 0:
+    st.info("История пуста: получите рейтинги в основном приложении — каждый запуск сохраняется снимком.")
+    st.stop()
+
+time_frame = st.selectbox("Выберите период:", list(PERIODS), index=2)
+days = PERIODS[time_frame]
 
-# --- 3. Заголовок и ввод (Имитация интерактивности) ---
+st.sidebar.header("Панель настроек")
+sites = tuple(st.sidebar.multiselect("Сайты", list(SITES), default=list(SITES), format_func=SITES.get))
+mode = st.sidebar.radio("Режим", list(MODES), format_func=MODES.get)
+top_n = st.sidebar.slider("Игроков на графике", 1, 30, 10)
 
-st.title("📊 Аналитика Продаж (Прототип)")
-st.subheader("Обзор ключевых показателей")
+if not sites:
+    st.warning("Выберите хотя бы один сайт.")
+    st.stop()
 
-# Имитация простого фильтра (но без реальной фильтрации данных)
-time_frame = st.selectbox(
-    "Выберите период:",
-    ['Последние 6 месяцев', 'Последние 3 месяца', 'Весь год'],
-    index=0
-)
+summary = player_summary(version, days, sites)
+if summary.empty:
+    st.info(f"За период «{time_frame}» снимков нет.")
+    st.stop()
 
-st.info(f"Отображаются данные за: **{time_frame}**")
+st.info(f"Отображаются данные за: **{time_frame}** — игроков: {len(summary)}")
 st.markdown("---")
 
-
 # --- 4. Основные метрики (Карточки KPI) ---
 
-# Вычисление условных метрик
-total_sales = df['Продажи ($)'].sum()
-avg_sales = df['Продажи ($)'].mean()
-total_clients = df['Клиенты'].sum()
-
-# Разделение макета на 3 колонки
-col1, col2, col3 = st.columns(3)
+col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    st.metric(label="Общий доход", value=f"${total_sales:,}", delta="15%")
+    st.metric(label="Средний блиц", value=f"{summary['blitz'].mean():,.0f}" if summary['blitz'].notna().any() else "—")
 
 with col2:
-    st.metric(label="Средний чек", value=f"${avg_sales:,.2f}", delta="-2.5%")
+    st.metric(label="Средняя пуля", value=f"{summary['bullet'].mean():,.0f}" if summary['bullet'].notna().any() else "—")
 
+changes = summary[f'{mode}_change']
 with col3:
-    st.metric(label="Новых клиентов", value=f"{total_clients}", delta="7")
+    if changes.notna().any() and changes.max() > 0:
+        best = summary.loc[changes.idxmax()]
+        st.metric(label=f"Лучший прирост ({MODES[mode].lower()})", value=best['player'], delta=f"{best[f'{mode}_change']:+,.0f}")
+    else:
+        st.metric(label=f"Лучший прирост ({MODES[mode].lower()})", value="—")
+
+with col4:
+    st.metric(label="Выросли / упали", value=f"{int((changes > 0).sum())} / {int((changes < 0).sum())}")
 
 st.markdown("---")
 
@@ -58,13 +108,19 @@ st.markdown("---")
 
 st.header("Динамика и детальные данные")
 
-# 1. График (Динамика продаж)
-st.line_chart(df.set_index('Месяц')['Продажи ($)'])
+# 1. График: по умолчанию — игроки с самым большим изменением за период.
+movers = summary.assign(abs_change=changes.abs()).nlargest(top_n, 'abs_change')['player'].tolist()
+selected = st.multiselect("Игроки на графике", summary['player'].tolist(), default=movers)
+if selected:
+    st.line_chart(trend(version, days, sites, mode, tuple(sorted(selected))))
 
 # 2. Таблица с данными
 st.subheader("Сводная таблица")
-st.dataframe(df, use_container_width=True)
-
-# 3. Дополнительный виджет (Просто для демонстрации)
-st.sidebar.header("Панель настроек")
-st.sidebar.slider("Уровень детализации", 0, 100, 50)
+table = summary.rename(columns={
+    'player': 'Игрок',
+    'blitz': 'Блиц', 'bullet': 'Пуля',
+    'blitz_change': 'Блиц, изменение', 'bullet_change': 'Пуля, изменение',
+    'snapshots': 'Снимков', 'last_seen': 'Последний снимок',
+})
+table = table.loc[changes.abs().fillna(0).sort_values(ascending=False, kind='stable').index]
+st.dataframe(table, width='stretch', hide_index=True)
@@ -0,0 +1,105 @@
+import json
+import os
+from typing import List, Optional
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Разбор ответов API: из документа игрока нужны только два рейтинга, поэтому
+# при наличии msgspec декодируются только эти поля (остальное пропускается без
+# создания объектов). Без msgspec — orjson, без него — стандартный json и разбор
+# словарей, как раньше. JSON_DECODER позволяет выбрать способ явно: auto, msgspec, orjson, json.
+JSON_DECODER = os.environ.get('JSON_DECODER', 'auto')
+
+if JSON_DECODER == 'auto':
+    JSON_DECODER = 'msgspec' if msgspec is not None else 'orjson' if orjson is not None else 'json'
+
+# Достаёт рейтинги из документа пользователя Lichess (разбор словаря — запасной
+# вариант, если msgspec нет или быстрый разбор не справился).
+def parse_lichess_user(data):
+    perfs = data.get('perfs', {})
+    bullet = perfs.get('bullet', {}).get('rating', 'N/A')
+    blitz = perfs.get('blitz', {}).get('rating', 'N/A')
+    return {'bullet': bullet, 'blitz': blitz}
+
+# Достаёт рейтинги из статистики игрока Chess.com.
+def parse_chesscom_stats(data):
+    bullet = data.get('chess_bullet', {}).get('last', {}).get('rating', 'N/A')
+    blitz = data.get('chess_blitz', {}).get('last', {}).get('rating', 'N/A')
+    return {'bullet': bullet, 'blitz': blitz}
+
+def loads(content):
+    if orjson is not None and JSON_DECODER != 'json':
+        return orjson.loads(content)
+    return json.loads(content)
+
+if msgspec is not None:
+    # Схемы только с нужными полями: всё остальное msgspec пропускает при разборе.
+    class _Rating(msgspec.Struct):
+        rating: Optional[int] = None
+
+    class _LichessPerfs(msgspec.Struct):
+        bullet: Optional[_Rating] = None
+        blitz: Optional[_Rating] = None
+
+    class LichessUser(msgspec.Struct):
+        id: str = ''
+        perfs: Optional[_LichessPerfs] = None
+
+    class _ChesscomMode(msgspec.Struct):
+        last: Optional[_Rating] = None
+
+    class ChesscomStats(msgspec.Struct):
+        chess_bullet: Optional[_ChesscomMode] = None
+        chess_blitz: Optional[_ChesscomMode] = None
+
+    _lichess_user_decoder = msgspec.json.Decoder(LichessUser)
+    _lichess_users_decoder = msgspec.json.Decoder(List[LichessUser])
+    _chesscom_stats_decoder = msgspec.json.Decoder(ChesscomStats)
+
+def _rating(value):
+    return value.rating if value is not None and value.rating is not None else 'N/A'
+
+def _lichess_result(user):
+    perfs = user.perfs
+    if perfs is None:
+        return {'bullet': 'N/A', 'blitz': 'N/A'}
+    return {'bullet': _rating(perfs.bullet), 'blitz': _rating(perfs.blitz)}
+
+# Тело ответа /api/user/{name} -> {'bullet': ..., 'blitz': ...}
+def decode_lichess_user(content):
+    if JSON_DECODER == 'msgspec':
+        try:
+            return _lichess_result(_lichess_user_decoder.decode(content))
+        except msgspec.MsgspecError:
+            pass
+    return parse_lichess_user(loads(content))
+
+# Тело ответа POST /api/users -> {id в нижнем регистре: результат}
+def decode_lichess_users(content):
+    if JSON_DECODER == 'msgspec':
+        try:
+            return {user.id.lower(): _lichess_result(user) for user in _lichess_users_decoder.decode(content)}
+        except msgspec.MsgspecError:
+            pass
+    return {user.get('id', '').lower(): parse_lichess_user(user) for user in loads(content)}
+
+# Тело ответа /pub/player/{name}/stats -> {'bullet': ..., 'blitz': ...}
+def decode_chesscom_stats(content):
+    if JSON_DECODER == 'msgspec':
+        try:
+            stats = _chesscom_stats_decoder.decode(content)
+            return {
+                'bullet': _rating(stats.chess_bullet.last if stats.chess_bullet else None),
+                'blitz': _rating(stats.chess_blitz.last if stats.chess_blitz else None),
+            }
+        except msgspec.MsgspecError:
+            pass
+    return parse_chesscom_stats(loads(content))
@@ -0,0 +1,72 @@
+import streamlit as st
+
+import metrics
+
+# Подписи для замеров из metrics (в порядке вывода).
+TIMING_LABELS = {
+    'http_dns': 'HTTP: DNS',
+    'http_connect': 'HTTP: TCP-соединение',
+    'http_tls': 'HTTP: TLS',
+    'http_ttfb': 'HTTP: ожидание ответа (TTFB)',
+    'http_parse': 'HTTP: разбор JSON',
+    'http_total': 'HTTP: запрос целиком',
+    'dataframe_build': 'Построение таблицы',
+    'render': 'Вывод таблицы',
+    'rerun': 'Перезапуск скрипта',
+    'fragment': 'Перезапуск фрагмента',
+}
+
+def _markdown_table(rows):
+    columns = list(rows[0])
+    lines = ['| ' + ' | '.join(columns) + ' |', '|' + ' --- |' * len(columns)]
+    lines.extend('| ' + ' | '.join(str(row[column]) for column in columns) + ' |' for row in rows)
+    return '\n'.join(lines)
+
+# Панель производительности: ключевые числа, таблица замеров и выгрузка.
+def show_diagnostics():
+    data = metrics.snapshot()
+    timings = data['timings']
+    counters = data['counters']
+    cache = data.get('cache', {})
+    scheduler_stats = data.get('scheduler', {})
+    flights = data.get('single_flight', {})
+    prewarm = data.get('prewarm')
+    service = data.get('rating_service')
+
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("Попадания в кэш", f"{cache.get('hit_ratio', 0.0):.0%}")
+    col2.metric("Повторы запросов", scheduler_stats.get('retries', 0))
+    col3.metric("Сэкономлено запросов", flights.get('saved', 0))
+    col4.metric("Скачано", f"{counters.get('http_bytes', 0) / 1024:,.0f} КБ")
+    rerun = timings.get('rerun')
+    col5.metric("Перезапуск (p50)", f"{rerun['p50'] * 1000:.0f} мс" if rerun else "—")
+
+    rows = [
+        {
+            'Участок': TIMING_LABELS.get(name, name),
+            'Замеров': values['count'],
+            'p50, мс': round(values['p50'] * 1000, 1),
+            'p95, мс': round(values['p95'] * 1000, 1),
+            'max, мс': round(values['max'] * 1000, 1),
+            'Всего, с': round(values['sum'], 2),
+        }
+        for name, values in sorted(timings.items(), key=lambda item: list(TIMING_LABELS).index(item[0])
+                                   if item[0] in TIMING_LABELS else len(TIMING_LABELS))
+    ]
+    # Таблица из десятка строк выводится Markdown: панель видна при первом
+    # открытии страницы, и ради неё не стоит импортировать pandas.
+    if rows:
+        st.markdown(_markdown_table(rows))
+    st.write(f"Кэш рейтингов: {cache}")
+    st.write(f"Запросы к API: {scheduler_stats}")
+    st.write(f"Объединение одинаковых запросов: {flights}")
+    if service is not None:
+        st.write(f"Общий сервис рейтингов: {service}")
+    if prewarm is not None:
+        st.write(f"Фоновое обновление списков: {prewarm}")
+
+    col1, col2 = st.columns(2)
+    col1.download_button("Скачать метрики (Prometheus)", metrics.to_prometheus(data),
+                         file_name='chessbox_metrics.prom', mime='text/plain')
+    col2.download_button("Скачать метрики (JSON)", metrics.to_json(data),
+                         file_name='chessbox_metrics.json', mime='application/json')
@@ -0,0 +1,140 @@
+import os
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+import metrics
+
+# Сколько keep-alive соединений держать открытыми к одному хосту.
+# Должно быть не меньше числа потоков, которые ходят на этот хост одновременно.
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 10))
+
+# Таймауты по умолчанию (секунды): на установку соединения и на ожидание ответа.
+# Без них одно зависшее соединение навсегда блокирует поток скрипта Streamlit.
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 3.05))
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 10))
+DEFAULT_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+# Соединения с замером фаз установки: DNS, TCP-соединение и TLS.
+# Нужны только для новых соединений — keep-alive соединения их не проходят.
+# Имя разрешается один раз здесь, а urllib3 соединяется уже с готовым адресом
+# (Host и SNI по-прежнему берутся из self.host). Адреса перебираются по порядку,
+# как в urllib3: если не удалось соединиться с первым, пробуется следующий.
+class _TimedConnectionMixin:
+    def _new_conn(self):
+        started = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(self._dns_host.strip('[]'), self.port,
+                                           allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        resolved = time.perf_counter()
+        metrics.add_phase('dns', resolved - started)
+        dns_host = self._dns_host
+        error = NewConnectionError(self, 'Failed to establish a new connection: getaddrinfo returns an empty list')
+        try:
+            for *_, sockaddr in addresses:
+                self._dns_host = sockaddr[0]
+                try:
+                    conn = super()._new_conn()
+                    break
+                except ConnectTimeoutError as e:
+                    error = e
+            else:
+                raise error
+        finally:
+            self._dns_host = dns_host
+        connected = time.perf_counter()
+        metrics.add_phase('connect', connected - resolved)
+        self._setup_seconds = connected - started
+        return conn
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    def connect(self):
+        self._setup_seconds = 0.0
+        started = time.perf_counter()
+        super().connect()
+        metrics.add_phase('tls', max(0.0, time.perf_counter() - started - self._setup_seconds))
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+# Адаптер requests, который создаёт пулы с замеряемыми соединениями.
+class TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+# Одна сессия на хост на весь процесс: модуль импортируется один раз,
+# поэтому сессии переживают перезапуски скрипта Streamlit и общие для всех пользователей.
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# Возвращает (и при первом обращении создаёт) сессию с пулом соединений для хоста.
+def get_session(host, pool_size=None):
+    session = _sessions.get(host)
+    if session is not None:
+        return session
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            size = pool_size or HTTP_POOL_SIZE
+            session = requests.Session()
+            adapter = TimedHTTPAdapter(pool_connections=1, pool_maxsize=size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[host] = session
+    return session
+
+# Аналог requests.request, но через общую сессию хоста (без нового TCP/TLS на каждый запрос)
+# и с таймаутом по умолчанию. Заодно записывает фазы запроса и объём ответа в metrics:
+# ttfb — от отправки до заголовков ответа без учёта установки соединения.
+def request(method, url, **kwargs):
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    metrics.begin_request()
+    started = time.perf_counter()
+    try:
+        response = get_session(urlsplit(url).netloc).request(method, url, **kwargs)
+    except Exception:
+        metrics.incr('http_errors')
+        metrics.end_request()
+        raise
+    phases = metrics.end_request()
+    setup = sum(phases.get(name, 0.0) for name in ('dns', 'connect', 'tls'))
+    metrics.observe('http_ttfb', max(0.0, response.elapsed.total_seconds() - setup))
+    metrics.observe('http_total', time.perf_counter() - started)
+    metrics.incr('http_requests')
+    # Потоковый ответ (stream=True) читает вызывающий код, здесь тело не трогаем.
+    if not kwargs.get('stream'):
+        metrics.incr('http_bytes', len(response.content))
+    return response
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+# Закрывает все сессии (например, при остановке процесса).
+def close_all():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,151 @@
+import os
+import queue
+import re
+import threading
+
+import decoding
+import scheduler
+from ratings import CHESSCOM_API, LICHESS_API, iter_player_ratings
+
+# Импорт списков игроков из команды Lichess и клуба Chess.com. Ники уходят на
+# запрос рейтингов окнами по IMPORT_WINDOW штук, так что ограничено только число
+# одновременно запрашиваемых ников. Множество уже встреченных ников (для отсеивания
+# повторов) и итоговая таблица растут вместе с размером команды или клуба.
+IMPORT_WINDOW = int(os.environ.get('IMPORT_WINDOW', 300))
+IMPORT_CHUNK_SIZE = 64 * 1024  # По сколько байт читать ответ Chess.com.
+
+# Команда или клуб не найдены, или сайт ответил ошибкой.
+class ImportSourceError(Exception):
+    pass
+
+def _open_stream(url, headers=None):
+    response = scheduler.get(url, headers=headers, stream=True)
+    if response.status_code == 404:
+        response.close()
+        raise ImportSourceError('Команда или клуб не найдены')
+    if response.status_code != 200:
+        response.close()
+        raise ImportSourceError(f'Ошибка сайта: HTTP {response.status_code}')
+    return response
+
+# Участники команды Lichess: /api/team/{id}/users отдаёт NDJSON — по игроку в строке.
+def iter_lichess_team_members(team_id):
+    response = _open_stream(f"{LICHESS_API}/api/team/{team_id.strip()}/users",
+                            headers={'Accept': 'application/x-ndjson'})
+    with response:
+        for line in response.iter_lines():
+            if line:
+                user = decoding.loads(line)
+                name = user.get('id') or user.get('name') or user.get('username')
+                if name:
+                    yield name
+
+# Ники в ответе Chess.com состоят из латиницы, цифр, "_" и "-", поэтому их можно
+# вынимать регулярным выражением прямо из потока байтов, не собирая весь JSON.
+_CHESSCOM_USERNAME = re.compile(rb'"username"\s*:\s*"([A-Za-z0-9_\-]+)"')
+
+# Участники клуба Chess.com: /pub/club/{id}/members — один JSON со списками
+# weekly / monthly / all_time; читается кусками по IMPORT_CHUNK_SIZE.
+def iter_chesscom_club_members(club_id):
+    response = _open_stream(f"{CHESSCOM_API}/pub/club/{club_id.strip().lower()}/members",
+                            headers={'User-Agent': 'my-app'})
+    with response:
+        tail = b''
+        for chunk in response.iter_content(IMPORT_CHUNK_SIZE):
+            data = tail + chunk
+            end = 0
+            for match in _CHESSCOM_USERNAME.finditer(data):
+                yield match.group(1).decode('ascii')
+                end = match.end()
+            # Хвост может содержать начало следующей записи; он не длиннее одной записи.
+            tail = data[max(end, len(data) - 256):]
+
+# Число участников для индикатора прогресса (None, если узнать не удалось).
+def get_member_count(site, source_id):
+    if site == 'lichess':
+        url, field = f"{LICHESS_API}/api/team/{source_id.strip()}", 'nbMembers'
+    else:
+        url, field = f"{CHESSCOM_API}/pub/club/{source_id.strip().lower()}", 'members_count'
+    try:
+        response = scheduler.get(url, headers={'User-Agent': 'my-app'})
+        if response.status_code == 200:
+            return decoding.loads(response.content).get(field)
+    except Exception:
+        pass
+    return None
+
+# Читает генератор в отдельном потоке через очередь ограниченного размера:
+# ответ сайта продолжает скачиваться, пока запрашиваются рейтинги предыдущего окна.
+def _prefetch(iterable, maxsize):
+    items = queue.Queue(maxsize=maxsize)
+    done = object()
+    stop = threading.Event()
+
+    # Кладёт в очередь, пока потребитель не ушёл (иначе поток завис бы на полной очереди).
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(done)
+        except Exception as e:
+            put(e)
+        finally:
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                close()
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+def iter_members(site, source_id):
+    if site == 'lichess':
+        return iter_lichess_team_members(source_id)
+    return iter_chesscom_club_members(source_id)
+
+# Конвейер импорт -> рейтинги: отдаёт (ник, результат) по мере готовности.
+# Ники без повторов, порядок внутри окна — по мере ответов сайта.
+# Ответ Lichess читается параллельно с запросами рейтингов. К Chess.com по умолчанию
+# ходим по одному запросу (max_parallel=1), а открытый поток участников — это ещё
+# одно соединение с сайтом, поэтому список клуба сначала дочитывается до конца.
+def iter_imported_ratings(site, source_id, window=IMPORT_WINDOW):
+    seen = set()
+    batch = []
+    if site == 'lichess':
+        members = _prefetch(iter_members(site, source_id), maxsize=window * 2)
+    else:
+        members = list(iter_members(site, source_id))
+    for name in members:
+        key = name.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        batch.append(name)
+        if len(batch) >= window:
+            yield from _fetch_window(site, batch)
+            batch = []
+    if batch:
+        yield from _fetch_window(site, batch)
+
+def _fetch_window(site, names):
+    players = [(name, None) if site == 'lichess' else (None, name) for name in names]
+    for _, row, result in iter_player_ratings(players):
+        yield names[row], result
@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Замеры горячих участков: фазы HTTP-запросов (DNS, соединение, TLS, ожидание
+# первого байта, разбор JSON), объём скачанного, длительность перезапуска скрипта,
+# построение DataFrame и вывод таблицы. Всё хранится в памяти процесса и общее
+# для всех сессий; наружу отдаётся в виде текста Prometheus или JSON.
+
+WINDOW = 1000  # Сколько последних значений каждой метрики держать для перцентилей.
+
+# Куда выгружать метрики после каждого перезапуска (.prom или журнал JSON); пусто — никуда.
+METRICS_EXPORT_PATH = os.environ.get('METRICS_EXPORT_PATH', '')
+
+_lock = threading.Lock()
+_series = {}      # имя -> последние значения (секунды)
+_totals = {}      # имя -> (число замеров, сумма) за всё время
+_counters = {}    # имя -> число
+_collectors = {}  # имя -> функция, возвращающая словарь чисел (кэш, планировщик)
+_current = threading.local()
+
+def observe(name, value):
+    with _lock:
+        series = _series.get(name)
+        if series is None:
+            series = _series[name] = deque(maxlen=WINDOW)
+        series.append(value)
+        count, total = _totals.get(name, (0, 0.0))
+        _totals[name] = (count + 1, total + value)
+
+def incr(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+@contextmanager
+def timer(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started)
+
+# Другие модули регистрируют здесь свои счётчики, чтобы они попали в общий отчёт.
+def register_collector(name, collect):
+    _collectors[name] = collect
+
+# Фазы одного запроса собираются в потоке, который его выполняет:
+# http_client начинает запрос, соединения дописывают DNS/connect/TLS.
+def begin_request():
+    _current.phases = {}
+
+def add_phase(name, seconds):
+    phases = getattr(_current, 'phases', None)
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+def end_request():
+    phases = getattr(_current, 'phases', None) or {}
+    _current.phases = None
+    for name, seconds in phases.items():
+        observe(f'http_{name}', seconds)
+    return phases
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+# Сводка по всем метрикам: для замеров — число, сумма, p50/p95/max (в секундах).
+def snapshot():
+    with _lock:
+        timings = {}
+        for name, series in _series.items():
+            ordered = sorted(series)
+            count, total = _totals[name]
+            timings[name] = {
+                'count': count,
+                'sum': round(total, 6),
+                'p50': round(_percentile(ordered, 0.50), 6),
+                'p95': round(_percentile(ordered, 0.95), 6),
+                'max': round(ordered[-1], 6),
+            }
+        counters = dict(_counters)
+    collected = {}
+    for name, collect in list(_collectors.items()):
+        try:
+            collected[name] = collect()
+        except Exception:
+            continue
+    return {'time': time.time(), 'timings': timings, 'counters': counters, **collected}
+
+# Текстовый формат Prometheus: замеры как summary, счётчики и собранные числа как gauge/counter.
+def to_prometheus(data=None):
+    data = data or snapshot()
+    lines = []
+    for name, values in sorted(data['timings'].items()):
+        metric = f'chessbox_{name}_seconds'
+        lines.append(f'# TYPE {metric} summary')
+        lines.append(f'{metric}{{quantile="0.5"}} {values["p50"]}')
+        lines.append(f'{metric}{{quantile="0.95"}} {values["p95"]}')
+        lines.append(f'{metric}_sum {values["sum"]}')
+        lines.append(f'{metric}_count {values["count"]}')
+    for name, value in sorted(data['counters'].items()):
+        metric = f'chessbox_{name}_total'
+        lines.append(f'# TYPE {metric} counter')
+        lines.append(f'{metric} {value}')
+    for group, values in sorted(data.items()):
+        if group in ('time', 'timings', 'counters') or not isinstance(values, dict):
+            continue
+        for name, value in sorted(values.items()):
+            if isinstance(value, (int, float)):
+                metric = f'chessbox_{group}_{name}'
+                lines.append(f'# TYPE {metric} gauge')
+                # bool тоже int, но True/False формат Prometheus не принимает.
+                lines.append(f'{metric} {int(value) if isinstance(value, bool) else value}')
+    return '\n'.join(lines) + '\n'
+
+def to_json(data=None):
+    return json.dumps(data or snapshot(), ensure_ascii=False)
+
+# Выгрузка в файл: .prom — текущий срез (перезапись, для node_exporter textfile),
+# иначе — JSON-строка дописывается в конец (журнал).
+def export(path):
+    data = snapshot()
+    if path.endswith('.prom'):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(to_prometheus(data))
+        os.replace(tmp_path, path)
+    else:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(to_json(data) + '\n')
+
+def export_if_configured():
+    if METRICS_EXPORT_PATH:
+        export(METRICS_EXPORT_PATH)
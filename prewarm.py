@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+
+import metrics
+import rating_cache
+import rating_client
+import roster_store
+import scheduler
+from ratings import (LICHESS_BATCH_MODE, LICHESS_BATCH_SIZE, get_chesscom_ratings,
+                     get_lichess_ratings, get_lichess_ratings_batch, parse_players)
+
+# Фоновое обновление сохранённых списков (roster_store): раз в PREWARM_INTERVAL
+# секунд рейтинги игроков из списков, которые открывали или меняли за последние
+# PREWARM_ROSTER_MAX_AGE секунд, обновляются в общем кэше, пока их записи не истекли,
+# и нажатие "Получить рейтинги" находит их уже готовыми. Заброшенные списки не обновляются.
+# Запросы идут по одному с паузой PREWARM_STAGGER и как фоновые (scheduler.background()):
+# интерактивные запросы к тому же сайту ждут не дольше одного уже отправленного
+# фонового запроса. PREWARM_INTERVAL=0 отключает обновление.
+PREWARM_INTERVAL = float(os.environ.get('PREWARM_INTERVAL', 300))
+PREWARM_ROSTER_MAX_AGE = float(os.environ.get('PREWARM_ROSTER_MAX_AGE', 24 * 3600))
+PREWARM_STAGGER = float(os.environ.get('PREWARM_STAGGER', 0.5))
+# Обновляются записи, которых нет в кэше или которые истекут раньше, чем через
+# столько секунд (до следующего прохода и с запасом на сам проход).
+PREWARM_MARGIN = float(os.environ.get('PREWARM_MARGIN', PREWARM_INTERVAL + 60))
+
+# Уникальные ники сохранённых списков по сайтам, в порядке первого появления.
+# used_since — только списки, использованные с этого времени (см. RosterStore.all_rosters).
+def roster_usernames(store, used_since=None):
+    lichess, chesscom = {}, {}
+    for _, _, lichess_text, chesscom_text in store.all_rosters(used_since):
+        for lichess_user, chesscom_user in parse_players(lichess_text, chesscom_text):
+            if lichess_user:
+                lichess.setdefault(rating_cache.normalize(lichess_user), lichess_user)
+            if chesscom_user:
+                chesscom.setdefault(rating_cache.normalize(chesscom_user), chesscom_user)
+    return list(lichess.values()), list(chesscom.values())
+
+def _expiring(site, usernames, margin):
+    result = []
+    for username in usernames:
+        remaining = rating_cache.cache.expires_in(site, username)
+        if remaining is None or remaining < margin:
+            result.append(username)
+    return result
+
+class RosterPrewarmer:
+    def __init__(self, store, interval=PREWARM_INTERVAL, stagger=PREWARM_STAGGER, margin=PREWARM_MARGIN,
+                 max_age=PREWARM_ROSTER_MAX_AGE):
+        self.store = store
+        self.interval = interval
+        self.stagger = stagger
+        self.margin = margin
+        self.max_age = max_age
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.refreshed = 0
+        self.skipped = 0   # записи, которые ещё долго будут свежими
+        self.errors = 0
+        self.last_run = None
+        self.last_duration = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='roster-prewarm', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+            self._stop.wait(self.interval)
+
+    def _note(self, result):
+        with self._lock:
+            self.refreshed += 1
+            if 'error' in result:
+                self.errors += 1
+
+    # Пауза между запросами; False — обновление остановлено.
+    def _pause(self):
+        return not self._stop.wait(self.stagger)
+
+    # Один проход по недавно использованным спискам.
+    def run_once(self):
+        started = time.monotonic()
+        lichess_users, chesscom_users = roster_usernames(self.store, time.time() - self.max_age)
+        lichess_due = _expiring('lichess', lichess_users, self.margin)
+        chesscom_due = _expiring('chesscom', chesscom_users, self.margin)
+        with self._lock:
+            self.skipped += len(lichess_users) + len(chesscom_users) - len(lichess_due) - len(chesscom_due)
+        with scheduler.background():
+            if LICHESS_BATCH_MODE:
+                for start in range(0, len(lichess_due), LICHESS_BATCH_SIZE):
+                    for result in get_lichess_ratings_batch(lichess_due[start:start + LICHESS_BATCH_SIZE],
+                                                            fresh=True):
+                        self._note(result)
+                    if not self._pause():
+                        return
+            else:
+                for username in lichess_due:
+                    self._note(get_lichess_ratings.refresh(username))
+                    if not self._pause():
+                        return
+            for username in chesscom_due:
+                self._note(get_chesscom_ratings.refresh(username))
+                if not self._pause():
+                    return
+        with self._lock:
+            self.runs += 1
+            self.last_run = time.time()
+            self.last_duration = round(time.monotonic() - started, 2)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self._thread is not None,
+                'runs': self.runs,
+                'refreshed': self.refreshed,
+                'skipped': self.skipped,
+                'errors': self.errors,
+                'last_duration': self.last_duration,
+                'seconds_since_run': round(time.time() - self.last_run) if self.last_run else None,
+            }
+
+# Один фоновый поток на процесс сервера: вызывается из приложений при каждом
+# перезапуске скрипта, но запускает обновление только в первый раз.
+# Если приложение работает через общий сервис рейтингов, обновление идёт там.
+def start():
+    if prewarmer is not None and rating_client.client is None:
+        prewarmer.start()
+    return prewarmer
+
+prewarmer = (RosterPrewarmer(roster_store.store)
+             if roster_store.store is not None and PREWARM_INTERVAL > 0 else None)
+if prewarmer is not None:
+    metrics.register_collector('prewarm', prewarmer.stats)
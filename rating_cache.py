@@ -0,0 +1,138 @@
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+import single_flight
+
+# Настройки кэша (секунды и число записей), переопределяются переменными окружения.
+RATING_CACHE_TTL = float(os.environ.get('RATING_CACHE_TTL', 600))
+RATING_CACHE_NOT_FOUND_TTL = float(os.environ.get('RATING_CACHE_NOT_FOUND_TTL', 120))
+RATING_CACHE_ERROR_TTL = float(os.environ.get('RATING_CACHE_ERROR_TTL', 30))
+RATING_CACHE_MAX_ENTRIES = int(os.environ.get('RATING_CACHE_MAX_ENTRIES', 5000))
+
+# Тексты ошибок, которые функции получения рейтингов возвращают для несуществующего
+# игрока, для ответа 429 (сайт ограничил частоту запросов), для хоста, который
+# не отвечает (сработал предохранитель), для таймаута запроса и для запроса,
+# не уложившегося в общий лимит времени.
+NOT_FOUND = 'Игрок не найден'
+RATE_LIMITED = 'Превышен лимит запросов, попробуйте позже'
+UNAVAILABLE = 'Сайт не отвечает, попробуйте позже'
+TIMEOUT = 'Сайт не ответил вовремя'
+DEADLINE = 'Не получено за отведённое время'
+
+# Ник на обоих сайтах не зависит от регистра, поэтому ключ — в нижнем регистре.
+def normalize(username):
+    return username.strip().lower()
+
+# Кэш результатов по ключу (сайт, ник) с временем жизни и вытеснением давно не использованных (LRU).
+# Ошибки и "игрок не найден" живут меньше, чтобы быстрее перепроверяться.
+class RatingCache:
+    def __init__(self, ttl=RATING_CACHE_TTL, not_found_ttl=RATING_CACHE_NOT_FOUND_TTL,
+                 error_ttl=RATING_CACHE_ERROR_TTL, max_entries=RATING_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.not_found_ttl = not_found_ttl
+        self.error_ttl = error_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Ответы "превышен лимит" и "сайт не отвечает" не кэшируем: они говорят
+    # о состоянии API, а не об игроке.
+    def _ttl_for(self, result):
+        error = result.get('error')
+        if error is None:
+            return self.ttl
+        if error in (RATE_LIMITED, UNAVAILABLE, DEADLINE):
+            return 0
+        if error == NOT_FOUND:
+            return self.not_found_ttl
+        return self.error_ttl
+
+    # Возвращает сохранённый результат или None, если его нет или он устарел.
+    def get(self, site, username):
+        key = (site, normalize(username))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    # Сколько секунд осталось жить записи (None, если её нет). Не считается
+    # попаданием или промахом — нужно фоновому обновлению, а не пользователю.
+    def expires_in(self, site, username):
+        with self._lock:
+            entry = self._entries.get((site, normalize(username)))
+        if entry is None:
+            return None
+        return max(0.0, entry[0] - time.monotonic())
+
+    def put(self, site, username, result):
+        ttl = self._ttl_for(result)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        key = (site, normalize(username))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # Счётчики для подбора размера кэша.
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / total, 3) if total else 0.0,
+            }
+
+# Общий кэш на весь процесс (для всех перезапусков и сессий Streamlit).
+cache = RatingCache()
+metrics.register_collector('cache', cache.stats)
+
+# Декоратор: сначала смотрим в кэш, при промахе вызываем функцию и сохраняем результат.
+# Одновременные промахи по одному нику объединяются в один запрос (single_flight).
+# wrapper.refresh(username) запрашивает заново, не заглядывая в кэш, и обновляет запись.
+def cached(site):
+    def decorator(fetch):
+        def fetch_and_store(username):
+            result = fetch(username)
+            cache.put(site, username, result)
+            return result
+
+        @functools.wraps(fetch)
+        def wrapper(username):
+            result = cache.get(site, username)
+            if result is None:
+                result = single_flight.flights.do((site, normalize(username)),
+                                                  lambda: fetch_and_store(username))
+            return result
+
+        def refresh(username):
+            return single_flight.flights.do((site, normalize(username)),
+                                            lambda: fetch_and_store(username))
+
+        wrapper.refresh = refresh
+        return wrapper
+    return decorator
@@ -0,0 +1,117 @@
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import decoding
+import metrics
+
+# Общий сервис рейтингов (rating_service.py) для нескольких реплик приложения:
+# один кэш, один планировщик запросов и один пул соединений на всех.
+# RATING_SERVICE_URL — http://хост:порт или unix:///путь/к/сокету; пусто — сервиса
+# нет, рейтинги запрашиваются прямо из процесса приложения.
+RATING_SERVICE_URL = os.environ.get('RATING_SERVICE_URL', '')
+RATING_SERVICE_CONNECT_TIMEOUT = float(os.environ.get('RATING_SERVICE_CONNECT_TIMEOUT', 1.0))
+# После сбоя сервиса столько секунд запросы выполняются в процессе, без попыток соединиться.
+RATING_SERVICE_RETRY = float(os.environ.get('RATING_SERVICE_RETRY', 30))
+# Запас к лимиту времени запуска на ожидание ответа сервиса.
+READ_TIMEOUT_MARGIN = 10
+
+# Сервис не ответил или оборвал ответ — остаток нужно запросить самим.
+class ServiceUnavailable(Exception):
+    pass
+
+# HTTP поверх Unix-сокета (для сервиса на той же машине).
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+def connect(url, timeout):
+    parts = urlsplit(url)
+    if parts.scheme == 'unix':
+        return UnixHTTPConnection(parts.path, timeout)
+    return http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+
+class RatingServiceClient:
+    def __init__(self, url, connect_timeout=RATING_SERVICE_CONNECT_TIMEOUT, retry=RATING_SERVICE_RETRY):
+        self.url = url
+        self.connect_timeout = connect_timeout
+        self.retry = retry
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+        self.remote_runs = 0
+        self.fallbacks = 0
+
+    def available(self):
+        return time.monotonic() >= self._down_until
+
+    def mark_down(self):
+        with self._lock:
+            self.fallbacks += 1
+            self._down_until = time.monotonic() + self.retry
+
+    # Отдаёт (сайт, индекс, результат) по мере ответов сервиса — так же, как
+    # ratings.iter_ratings. ServiceUnavailable — если сервис не ответил или
+    # оборвал ответ (уже отданные результаты остаются в силе).
+    def iter_ratings(self, lichess_list, chesscom_list, lichess_batch, deadline):
+        conn = connect(self.url, self.connect_timeout)
+        body = json.dumps({
+            'lichess': list(lichess_list),
+            'chesscom': list(chesscom_list),
+            'lichess_batch': lichess_batch,
+            'deadline': deadline,
+        }).encode()
+        try:
+            try:
+                conn.request('POST', '/ratings', body, headers={'Content-Type': 'application/json'})
+                conn.sock.settimeout((deadline or 300) + READ_TIMEOUT_MARGIN)
+                response = conn.getresponse()
+            except (OSError, http.client.HTTPException) as e:
+                self.mark_down()
+                raise ServiceUnavailable(str(e)) from e
+            if response.status != 200:
+                self.mark_down()
+                raise ServiceUnavailable(f'HTTP {response.status}')
+            with self._lock:
+                self.remote_runs += 1
+            expected = len(lichess_list) + len(chesscom_list)
+            received = 0
+            try:
+                for line in response:
+                    if line.strip():
+                        site, index, result = decoding.loads(line)
+                        received += 1
+                        yield site, index, result
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                self.mark_down()
+                raise ServiceUnavailable(str(e)) from e
+            # Ответ кончается закрытием соединения, поэтому упавший сервис
+            # выглядит как конец ответа — проверяем, что пришли все ники.
+            if received < expected:
+                self.mark_down()
+                raise ServiceUnavailable(f'ответ оборван: {received} из {expected}')
+        finally:
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'url': self.url,
+                'available': self.available(),
+                'remote_runs': self.remote_runs,
+                'fallbacks': self.fallbacks,
+            }
+
+# Клиент на весь процесс (None, если сервис не настроен).
+client = RatingServiceClient(RATING_SERVICE_URL) if RATING_SERVICE_URL else None
+if client is not None:
+    metrics.register_collector('rating_service', client.stats)
@@ -0,0 +1,262 @@
+import contextlib
+import datetime
+import importlib.util
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: только блокировка внутри процесса
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+# История рейтингов: каждый завершённый запуск дописывается снимком в набор
+# Parquet-файлов, разбитый по дням (RATING_HISTORY_PATH/date=ГГГГ-ММ-ДД/*.parquet).
+# Запуск — новый файл в папке своего дня, старые файлы не переписываются.
+# Запросы фильтруют по дате (лишние дни даже не открываются) и по site/username
+# (статистика row group внутри файла), поэтому остаются быстрыми на миллионах строк.
+# Пустая строка в RATING_HISTORY_PATH отключает историю.
+RATING_HISTORY_PATH = os.environ.get('RATING_HISTORY_PATH', 'rating_history')
+
+# Когда файлов за день становится больше, они сливаются в один (меньше открытий при чтении).
+HISTORY_COMPACT_FILES = int(os.environ.get('HISTORY_COMPACT_FILES', 64))
+# Небольшие row group: при фильтре по нику читаются только группы, где он может быть.
+HISTORY_ROW_GROUP_SIZE = 4096
+
+MODES = ('bullet', 'blitz')
+
+# pyarrow и pandas импортируются при первой записи или чтении истории (_load_arrow),
+# а не при запуске приложения: их импорт — заметная часть холодного старта.
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+pa = ds = pq = None
+SCHEMA = PARTITIONING = DATASET_SCHEMA = None
+_arrow_lock = threading.Lock()
+
+def _load_arrow():
+    global pa, ds, pq, SCHEMA, PARTITIONING, DATASET_SCHEMA
+    with _arrow_lock:
+        if SCHEMA is not None:
+            return
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+        pa, ds, pq = pyarrow, pyarrow.dataset, pyarrow.parquet
+        SCHEMA = pa.schema([
+            ('ts', pa.timestamp('ms', tz='UTC')),
+            ('site', pa.string()),
+            ('username', pa.string()),
+            ('bullet', pa.int32()),
+            ('blitz', pa.int32()),
+        ])
+        PARTITIONING = ds.partitioning(pa.schema([('date', pa.date32())]), flavor='hive')
+        DATASET_SCHEMA = SCHEMA.append(pa.field('date', pa.date32()))
+
+# Запись идёт в фоне одним потоком, чтобы не задерживать вывод таблицы
+# и не писать один и тот же день из двух потоков сразу.
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rating-history')
+_lock = threading.Lock()
+
+# Историю пишут несколько процессов (реплики приложения, ratings_cli.py, сервис
+# рейтингов), поэтому запись и слияние идут ещё и под flock на файле .lock в папке
+# истории: иначе слияние в одном процессе удаляет файлы, которые другой только что
+# дописал или сам сливает.
+@contextlib.contextmanager
+def _dataset_lock():
+    with _lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(RATING_HISTORY_PATH, exist_ok=True)
+        with open(os.path.join(RATING_HISTORY_PATH, '.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def enabled():
+    return HAS_PYARROW and bool(RATING_HISTORY_PATH)
+
+def _rating(value):
+    return value if isinstance(value, int) else None
+
+# Строки снимка: по одной на (сайт, ник) с хотя бы одним рейтингом.
+# Ошибки и игроки без ника на сайте в историю не попадают.
+def snapshot_rows(players, lichess_results, chesscom_results):
+    rows = {}
+    for (lichess_user, chesscom_user), lichess_ratings, chesscom_ratings in zip(
+            players, lichess_results, chesscom_results):
+        for site, user, ratings in (('lichess', lichess_user, lichess_ratings),
+                                    ('chesscom', chesscom_user, chesscom_ratings)):
+            if not user or not ratings or 'error' in ratings:
+                continue
+            bullet, blitz = _rating(ratings.get('bullet')), _rating(ratings.get('blitz'))
+            if bullet is None and blitz is None:
+                continue
+            rows[(site, user.strip().lower())] = (bullet, blitz)
+    return rows
+
+def _partition_dir(day):
+    return os.path.join(RATING_HISTORY_PATH, f'date={day.isoformat()}')
+
+# Пишет таблицу новым файлом в папку дня. Сначала во временный файл с точкой
+# в начале имени (такие файлы набор данных пропускает), потом переименование —
+# читатели никогда не видят недописанный файл.
+def _write_file(table, day, name=None):
+    directory = _partition_dir(day)
+    os.makedirs(directory, exist_ok=True)
+    name = name or f'part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.parquet'
+    tmp_path = os.path.join(directory, '.' + name)
+    pq.write_table(table, tmp_path, row_group_size=HISTORY_ROW_GROUP_SIZE)
+    os.replace(tmp_path, os.path.join(directory, name))
+
+def _data_entries(directory):
+    try:
+        return [entry for entry in os.scandir(directory)
+                if entry.name.endswith('.parquet') and not entry.name.startswith(('.', '_'))]
+    except FileNotFoundError:
+        return []
+
+def _data_files(directory):
+    return sorted(entry.path for entry in _data_entries(directory))
+
+def append(rows, ts=None):
+    _load_arrow()
+    ts = ts or datetime.datetime.now(datetime.timezone.utc)
+    keys = sorted(rows)  # сортировка по (site, username) делает статистику row group полезной
+    table = pa.table({
+        'ts': pa.array([ts] * len(keys), type=SCHEMA.field('ts').type),
+        'site': [site for site, _ in keys],
+        'username': [username for _, username in keys],
+        'bullet': pa.array([rows[key][0] for key in keys], type=pa.int32()),
+        'blitz': pa.array([rows[key][1] for key in keys], type=pa.int32()),
+    }, schema=SCHEMA)
+    day = ts.astimezone(datetime.timezone.utc).date()
+    with _dataset_lock():
+        _write_file(table, day)
+        if len(_data_files(_partition_dir(day))) > HISTORY_COMPACT_FILES:
+            _compact(day)
+
+# Сливает все файлы дня в один, отсортированный по (site, username, ts).
+def compact(day):
+    _load_arrow()
+    with _dataset_lock():
+        _compact(day)
+
+# Вызывается под _dataset_lock. Слитый файл появляется целиком (_write_file)
+# и только потом удаляются исходные: недописанного файла никто не увидит,
+# а сбой посередине оставит лишь повторы строк, но не потерю.
+def _compact(day):
+    directory = _partition_dir(day)
+    files = _data_files(directory)
+    if len(files) < 2:
+        return
+    table = ds.dataset(files, schema=SCHEMA, format='parquet').to_table()
+    table = table.sort_by([('site', 'ascending'), ('username', 'ascending'), ('ts', 'ascending')])
+    _write_file(table, day, name=f'compacted-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.parquet')
+    for path in files:
+        os.remove(path)
+
+# Сохраняет результаты запуска в историю. По умолчанию в фоне; wait=True — дождаться записи.
+def record_run(players, lichess_results, chesscom_results, wait=False):
+    if not enabled():
+        return
+    rows = snapshot_rows(players, lichess_results, chesscom_results)
+    if not rows:
+        return
+    future = _writer.submit(append, rows)
+    if wait:
+        future.result()
+    else:
+        future.add_done_callback(_report_write_error)
+
+# Ошибка фоновой записи иначе осталась бы в брошенном Future и потерялась.
+def _report_write_error(future):
+    error = future.exception()
+    if error is not None:
+        log.warning('Не удалось записать историю рейтингов в %s: %s', RATING_HISTORY_PATH, error)
+        metrics.incr('history_write_errors')
+
+# Версия данных для кэшей: меняется при каждой записи и слиянии. Обход идёт
+# без блокировки, и слияние в другом процессе может удалить файл между
+# scandir и stat — такой файл просто пропускаем.
+def data_version():
+    if not enabled() or not os.path.isdir(RATING_HISTORY_PATH):
+        return (0, 0.0)
+    count = 0
+    latest = 0.0
+    for day in os.scandir(RATING_HISTORY_PATH):
+        if day.is_dir() and day.name.startswith('date='):
+            for entry in _data_entries(day.path):
+                try:
+                    mtime = entry.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                count += 1
+                latest = max(latest, mtime)
+    return (count, latest)
+
+def dataset():
+    _load_arrow()
+    return ds.dataset(RATING_HISTORY_PATH, schema=DATASET_SCHEMA, format='parquet', partitioning=PARTITIONING)
+
+# Условие на дату: последние days дней (включая сегодня), None — вся история.
+def since_filter(days):
+    if days is None:
+        return None
+    _load_arrow()
+    start = datetime.datetime.now(datetime.timezone.utc).date() - datetime.timedelta(days=days - 1)
+    return ds.field('date') >= pa.scalar(start, type=pa.date32())
+
+def _and(*conditions):
+    result = None
+    for condition in conditions:
+        if condition is not None:
+            result = condition if result is None else result & condition
+    return result
+
+# Чтение истории в DataFrame с фильтром, который выполняется при сканировании файлов.
+# Читаем без блокировки: если слияние удалило файл между обходом папок и чтением,
+# сканируем ещё раз — слитый файл к этому моменту уже на месте.
+def query(days=None, sites=None, usernames=None, columns=None):
+    import pandas as pd
+    columns = columns or ['ts', 'site', 'username', 'bullet', 'blitz']
+    if not enabled() or not os.path.isdir(RATING_HISTORY_PATH):
+        return pd.DataFrame(columns=columns)
+    _load_arrow()
+    condition = _and(
+        since_filter(days),
+        ds.field('site').isin(list(sites)) if sites else None,
+        ds.field('username').isin([name.strip().lower() for name in usernames]) if usernames else None,
+    )
+    try:
+        table = dataset().to_table(columns=columns, filter=condition)
+    except FileNotFoundError:
+        table = dataset().to_table(columns=columns, filter=condition)
+    return table.to_pandas()
+
+# Рейтинг игрока за последние days дней, по времени.
+def player_history(site, username, days=90):
+    return query(days=days, sites=[site], usernames=[username]).sort_values('ts', ignore_index=True)
+
+# Кто сильнее всего изменил рейтинг в режиме mode за последние days дней:
+# разница между последним и первым снимком, по убыванию модуля изменения.
+def top_movers(days=7, mode='blitz', limit=10, sites=None):
+    import pandas as pd
+    df = query(days=days, sites=sites, columns=['ts', 'site', 'username', mode])
+    df = df.dropna(subset=[mode]).sort_values('ts')
+    if df.empty:
+        return pd.DataFrame(columns=['site', 'username', 'first', 'last', 'change'])
+    grouped = df.groupby(['site', 'username'], sort=False)[mode]
+    movers = grouped.agg(first='first', last='last').reset_index()
+    movers['change'] = movers['last'] - movers['first']
+    movers = movers[movers['change'] != 0]
+    order = movers['change'].abs().sort_values(ascending=False).index
+    return movers.loc[order].head(limit).reset_index(drop=True)
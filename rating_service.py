@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import socketserver
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import metrics
+import prewarm
+import rating_client
+import ratings
+
+# Общий сервис рейтингов для нескольких реплик приложения (в том числе на разных
+# машинах): кэш, single flight, планировщик с лимитами хостов и пул соединений
+# живут в одном процессе, поэтому каждый ник запрашивается у сайта один раз,
+# сколько бы реплик его ни спросили, а лимиты API делятся на всех.
+#
+#   python rating_service.py --listen http://0.0.0.0:8765
+#   python rating_service.py --listen unix:///run/chessbox/ratings.sock
+#
+# Приложения подключаются к нему через RATING_SERVICE_URL (см. rating_client.py).
+#
+# POST /ratings — {"lichess": [...], "chesscom": [...], "lichess_batch": true, "deadline": 60};
+#                 ответ — NDJSON, строка [сайт, индекс, результат] на каждый ник по мере готовности.
+# GET /health   — {"ok": true}.
+# GET /metrics  — метрики сервиса в JSON (кэш, планировщик, single flight).
+RATING_SERVICE_LISTEN = os.environ.get('RATING_SERVICE_LISTEN', 'http://127.0.0.1:8765')
+
+class RatingServiceHandler(BaseHTTPRequestHandler):
+    # Ответ без Content-Length заканчивается закрытием соединения — так его можно
+    # отдавать потоком, не зная заранее длины.
+    protocol_version = 'HTTP/1.0'
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/health':
+            self._send_json(200, {'ok': True})
+        elif path == '/metrics':
+            self._send_json(200, metrics.snapshot())
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/ratings':
+            self._send_json(404, {'error': 'not found'})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            lichess_list = [str(name) for name in request.get('lichess', [])]
+            chesscom_list = [str(name) for name in request.get('chesscom', [])]
+            lichess_batch = bool(request.get('lichess_batch', ratings.LICHESS_BATCH_MODE))
+            deadline = request.get('deadline')
+            deadline = None if deadline is None else float(deadline)
+        except (ValueError, TypeError, AttributeError):
+            self._send_json(400, {'error': 'bad request'})
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        results = ratings.iter_ratings(lichess_list, chesscom_list,
+                                       lichess_batch=lichess_batch, deadline=deadline)
+        try:
+            for site, index, result in results:
+                self.wfile.write(json.dumps([site, index, result], ensure_ascii=False).encode() + b'\n')
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Реплика ушла, не дождавшись ответа: незапущенные запросы отменятся.
+        finally:
+            results.close()
+
+    # У Unix-сокета нет адреса клиента.
+    def address_string(self):
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        if os.environ.get('RATING_SERVICE_LOG') == '1':
+            super().log_message(format, *args)
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+# Создаёт сервер для адреса вида http://хост:порт или unix:///путь (не запуская его).
+def make_server(listen=RATING_SERVICE_LISTEN):
+    # Сам сервис всегда запрашивает рейтинги в своём процессе.
+    rating_client.client = None
+    parts = urlsplit(listen)
+    if parts.scheme == 'unix':
+        if os.path.exists(parts.path):
+            os.remove(parts.path)
+        return ThreadingUnixHTTPServer(parts.path, RatingServiceHandler)
+    server = ThreadingHTTPServer((parts.hostname or '127.0.0.1', parts.port or 8765), RatingServiceHandler)
+    server.daemon_threads = True
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Общий сервис рейтингов Lichess и Chess.com.')
+    parser.add_argument('--listen', default=RATING_SERVICE_LISTEN,
+                        help='http://хост:порт или unix:///путь (по умолчанию %(default)s)')
+    args = parser.parse_args(argv)
+    server = make_server(args.listen)
+    # Сохранённые списки обновляются здесь, в общем кэше, а не в каждой реплике.
+    prewarm.start()
+    print(f'Сервис рейтингов слушает {args.listen}', file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        metrics.export_if_configured()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Файл локальной базы с последними полученными рейтингами.
+# Пустая строка в RATING_STORE_PATH отключает базу.
+RATING_STORE_PATH = os.environ.get('RATING_STORE_PATH', 'rating_store.sqlite3')
+
+# Последний ответ по каждому (сайт, ник) вместе с ETag / Last-Modified,
+# чтобы после перезапуска процесса обновлять данные условными запросами (304 без тела).
+class RatingStore:
+    def __init__(self, path=RATING_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            # Первичный ключ (site, username) и есть индекс для поиска.
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS payloads (
+                    site TEXT NOT NULL,
+                    username TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (site, username)
+                ) WITHOUT ROWID
+            ''')
+            self._conn.commit()
+
+    # Возвращает словарь с полями result, etag, last_modified, fetched_at или None.
+    def get(self, site, username):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT payload, etag, last_modified, fetched_at FROM payloads WHERE site = ? AND username = ?',
+                (site, username.strip().lower())
+            ).fetchone()
+        if row is None:
+            return None
+        return {'result': json.loads(row[0]), 'etag': row[1], 'last_modified': row[2], 'fetched_at': row[3]}
+
+    # То же для многих ников сразу: {ник в нижнем регистре: словарь как у get}.
+    # Отсутствующих в базе ников в ответе нет.
+    def get_many(self, site, usernames):
+        keys = list(dict.fromkeys(username.strip().lower() for username in usernames))
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._conn.execute(
+                    'SELECT username, payload, etag, last_modified, fetched_at FROM payloads '
+                    f'WHERE site = ? AND username IN ({", ".join("?" * len(chunk))})',
+                    (site, *chunk)
+                ).fetchall()
+                for row in rows:
+                    found[row[0]] = {'result': json.loads(row[1]), 'etag': row[2],
+                                     'last_modified': row[3], 'fetched_at': row[4]}
+        return found
+
+    def save(self, site, username, result, etag=None, last_modified=None):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO payloads (site, username, payload, etag, last_modified, fetched_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (site, username.strip().lower(), json.dumps(result, ensure_ascii=False),
+                 etag, last_modified, time.time())
+            )
+            self._conn.commit()
+
+    # Сохраняет сразу много результатов одной транзакцией (пакетные ответы Lichess).
+    def save_many(self, site, results):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO payloads (site, username, payload, etag, last_modified, fetched_at) '
+                'VALUES (?, ?, ?, NULL, NULL, ?)',
+                [(site, username.strip().lower(), json.dumps(result, ensure_ascii=False), now)
+                 for username, result in results.items()]
+            )
+            self._conn.commit()
+
+    # Сервер ответил 304: данные не изменились, обновляем только время проверки.
+    def touch(self, site, username):
+        with self._lock:
+            self._conn.execute(
+                'UPDATE payloads SET fetched_at = ? WHERE site = ? AND username = ?',
+                (time.time(), site, username.strip().lower())
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# Открывает общую базу; если она отключена или файл недоступен — работаем без неё.
+def _open_store():
+    if not RATING_STORE_PATH:
+        return None
+    try:
+        return RatingStore()
+    except sqlite3.Error:
+        return None
+
+# Общая база на весь процесс (None, если отключена).
+store = _open_store()
@@ -0,0 +1,294 @@
+import os
+import time
+
+import streamlit as st
+
+import importers
+import metrics
+import rating_history
+import rating_store
+from ratings import iter_player_ratings
+
+# Что показывать в ячейке, пока ответ от сайта ещё не пришёл.
+PENDING = {'error': '…'}
+# Что показывать, если у игрока нет ника на этом сайте.
+NO_ACCOUNT = {'error': '—'}
+# Как часто перерисовывать таблицу (секунды): на больших списках ответы идут
+# быстрее, чем браузер успевает принять новую таблицу.
+RENDER_INTERVAL = 0.3
+# Сколько строк уходит в браузер за раз. Таблица не длиннее страницы выводится
+# целиком (сортирует браузер); длиннее — по страницам, сортировка и фильтр по нику
+# выполняются на сервере.
+TABLE_PAGE_SIZE = int(os.environ.get('TABLE_PAGE_SIZE', 500))
+# Режим "сначала сохранённые": сколько секунд последний известный рейтинг ещё
+# показывается, пока идёт обновление. Более старые ячейки считаются устаревшими.
+SWR_MAX_STALENESS = float(os.environ.get('SWR_MAX_STALENESS', 24 * 3600))
+
+# Колонки таблицы результатов: короткие имена в Arrow-таблице -> подписи в интерфейсе.
+# Рейтинги — целые числа (пусто, если рейтинга нет); ошибка, "…" (ждём ответа)
+# и "—" (нет ника на сайте) — в отдельной колонке статуса.
+COLUMN_LABELS = {
+    'n': '№',
+    'player': 'Игрок (Lichess / Chess.com)',
+    'lichess_bullet': 'Lichess Bullet',
+    'lichess_blitz': 'Lichess Blitz',
+    'lichess_status': 'Lichess: статус',
+    'lichess_age': 'Lichess: обновлено',
+    'chesscom_bullet': 'Chess.com Bullet',
+    'chesscom_blitz': 'Chess.com Blitz',
+    'chesscom_status': 'Chess.com: статус',
+    'chesscom_age': 'Chess.com: обновлено',
+}
+NUMERIC_COLUMNS = {'n', 'lichess_bullet', 'lichess_blitz', 'chesscom_bullet', 'chesscom_blitz'}
+
+def _cell(user, ratings):
+    if not user:
+        return NO_ACCOUNT
+    return ratings or PENDING
+
+# Возраст данных в ячейке: "только что", "5 мин", "3 ч", "2 д".
+def format_age(fetched_at, now, max_staleness=SWR_MAX_STALENESS):
+    if fetched_at is None:
+        return ''
+    age = max(0.0, now - fetched_at)
+    if age > max_staleness:
+        return 'устарело'
+    if age < 60:
+        return 'только что'
+    if age < 3600:
+        return f'{age // 60:.0f} мин'
+    if age < 86400:
+        return f'{age // 3600:.0f} ч'
+    return f'{age // 86400:.0f} д'
+
+def _rating(value):
+    return value if isinstance(value, int) else None
+
+# Строит Arrow-таблицу для вывода по списку игроков из parse_players.
+# numbered добавляет колонку "№", начинающуюся с 1. ages — пара списков времени
+# получения (epoch) для Lichess и Chess.com: тогда для каждого сайта добавляется
+# колонка с возрастом данных.
+# Arrow — и для небольших таблиц тоже: словарь колонок Streamlit перегоняет через
+# pandas, и колонка рейтингов с пропусками уходит в браузер как float, а pyarrow
+# при выводе любой таблицы Streamlit импортирует и сам.
+def build_table(players, lichess_results, chesscom_results, numbered=True, ages=None):
+    import pyarrow as pa
+
+    with metrics.timer('dataframe_build'):
+        now = time.time()
+        columns = {}
+        if numbered:
+            columns['n'] = pa.array(range(1, len(players) + 1), type=pa.int32())
+        columns['player'] = pa.array([f"{lichess_user or '—'} / {chesscom_user or '—'}"
+                                      for lichess_user, chesscom_user in players], type=pa.string())
+        sides = (('lichess', 0, lichess_results), ('chesscom', 1, chesscom_results))
+        for site, side, results in sides:
+            cells = [_cell(player[side], ratings) for player, ratings in zip(players, results)]
+            columns[f'{site}_bullet'] = pa.array([_rating(cell.get('bullet')) for cell in cells], type=pa.int32())
+            columns[f'{site}_blitz'] = pa.array([_rating(cell.get('blitz')) for cell in cells], type=pa.int32())
+            columns[f'{site}_status'] = pa.array([cell.get('error') for cell in cells], type=pa.string())
+            if ages is not None:
+                columns[f'{site}_age'] = pa.array([format_age(fetched_at, now) for fetched_at in ages[side]],
+                                                  type=pa.string())
+        return pa.table(columns)
+
+def _column_config(table):
+    return {
+        name: (st.column_config.NumberColumn(COLUMN_LABELS[name], format='%d')
+               if name in NUMERIC_COLUMNS else st.column_config.TextColumn(COLUMN_LABELS[name]))
+        for name in table.column_names
+    }
+
+def _dataframe(container, table):
+    container.dataframe(table, width='stretch', hide_index=True, column_config=_column_config(table))
+
+# Вывод таблицы (включая её сериализацию для браузера) — отдельная метрика render.
+# Пока ответы ещё идут, большая таблица выводится только первой страницей.
+def _show(placeholder, table):
+    with metrics.timer('render'):
+        if table.num_rows <= TABLE_PAGE_SIZE:
+            _dataframe(placeholder, table)
+            return
+        with placeholder.container():
+            _dataframe(st, table.slice(0, TABLE_PAGE_SIZE))
+            st.caption(f"Показаны первые {TABLE_PAGE_SIZE} из {table.num_rows}; "
+                       "после получения всех ответов можно листать, сортировать и искать по нику.")
+
+# Готовая таблица. Не длиннее страницы — выводится целиком. Длиннее — по страницам:
+# фильтр по нику и сортировка выполняются здесь, по Arrow-таблице, и в браузер
+# уходит только текущая страница. key — префикс для состояния элементов управления.
+def show_table(table, key='results'):
+    if table.num_rows <= TABLE_PAGE_SIZE:
+        with metrics.timer('render'):
+            _dataframe(st, table)
+        return
+    import pyarrow.compute as pc
+
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    query = col1.text_input("Поиск по нику", key=f'{key}_query')
+    sort_by = col2.selectbox("Сортировка", table.column_names, format_func=COLUMN_LABELS.get, key=f'{key}_sort')
+    descending = col3.toggle("По убыванию", key=f'{key}_descending')
+    view = table
+    if query.strip():
+        view = view.filter(pc.match_substring(pc.utf8_lower(view['player']), query.strip().lower()))
+    view = view.sort_by([(sort_by, 'descending' if descending else 'ascending')])
+    pages = max(1, -(-view.num_rows // TABLE_PAGE_SIZE))
+    # После сужения поиска сохранённый номер страницы может оказаться за концом.
+    if st.session_state.get(f'{key}_page', 1) > pages:
+        st.session_state[f'{key}_page'] = pages
+    page = col4.number_input("Страница", min_value=1, max_value=pages, key=f'{key}_page')
+    start = (page - 1) * TABLE_PAGE_SIZE
+    with metrics.timer('render'):
+        _dataframe(st, view.slice(start, TABLE_PAGE_SIZE))
+    shown = f"Строки {start + 1}–{min(start + TABLE_PAGE_SIZE, view.num_rows)} из {view.num_rows}" if view.num_rows else "Ничего не найдено"
+    st.caption(shown + (f" (всего {table.num_rows})" if view.num_rows != table.num_rows else ''))
+
+# Сохраняет готовую таблицу в сессии и выводит её: при следующих перезапусках
+# (листание, сортировка) show_saved_results выводит её снова без запросов к сайтам.
+def show_results(table, key='results', placeholder=None):
+    st.session_state[key] = table
+    if placeholder is None:
+        show_table(table, key)
+    else:
+        with placeholder.container():
+            show_table(table, key)
+
+def show_saved_results(key='results'):
+    table = st.session_state.get(key)
+    if table is not None:
+        show_table(table, key)
+
+# Потоковый режим: таблица появляется сразу, ячейки заполняются по мере ответов сайтов,
+# сверху — индикатор прогресса и счётчик готовых и неудачных запросов.
+# Возвращает итоговую таблицу (pyarrow.Table).
+def stream_ratings_table(players, numbered=True, key='results'):
+    lichess_results = [None] * len(players)
+    chesscom_results = [None] * len(players)
+    total = max(1, sum(bool(lichess_user) + bool(chesscom_user) for lichess_user, chesscom_user in players))
+    done = 0
+    failed = 0
+
+    progress = st.progress(0.0, text=f"Получено 0 из {total}")
+    table = st.empty()
+    _show(table, build_table(players, lichess_results, chesscom_results, numbered))
+    last_render = time.monotonic()
+
+    for site, row, result in iter_player_ratings(players):
+        if site == 'lichess':
+            lichess_results[row] = result
+        else:
+            chesscom_results[row] = result
+        done += 1
+        if 'error' in result:
+            failed += 1
+        progress.progress(done / total, text=f"Получено {done} из {total}, ошибок: {failed}")
+        if time.monotonic() - last_render >= RENDER_INTERVAL:
+            _show(table, build_table(players, lichess_results, chesscom_results, numbered))
+            last_render = time.monotonic()
+
+    df = build_table(players, lichess_results, chesscom_results, numbered)
+    show_results(df, key, table)
+    progress.progress(1.0, text=f"Готово: {done} из {total}, ошибок: {failed}")
+    rating_history.record_run(players, lichess_results, chesscom_results)
+    return df
+
+# Импорт участников команды Lichess или клуба Chess.com: ники приходят потоком
+# и сразу запрашиваются, таблица и счётчик обновляются по мере ответов.
+# Возвращает итоговую таблицу (pyarrow.Table).
+def stream_import_table(site, source_id, numbered=True, key='import_results'):
+    total = importers.get_member_count(site, source_id)
+    players = []
+    lichess_results = []
+    chesscom_results = []
+    failed = 0
+
+    progress = st.progress(0.0, text="Загружаем список участников…")
+    table = st.empty()
+    last_render = time.monotonic()
+    try:
+        for name, result in importers.iter_imported_ratings(site, source_id):
+            players.append((name, None) if site == 'lichess' else (None, name))
+            lichess_results.append(result if site == 'lichess' else None)
+            chesscom_results.append(result if site == 'chesscom' else None)
+            if 'error' in result:
+                failed += 1
+            done = len(players)
+            text = f"Получено {done} из {total}, ошибок: {failed}" if total else f"Получено {done}, ошибок: {failed}"
+            progress.progress(min(1.0, done / total) if total else 0.0, text=text)
+            if time.monotonic() - last_render >= RENDER_INTERVAL:
+                _show(table, build_table(players, lichess_results, chesscom_results, numbered))
+                last_render = time.monotonic()
+    except Exception as e:
+        progress.empty()
+        st.error(f"Импорт не удался: {e}")
+        return None
+
+    df = build_table(players, lichess_results, chesscom_results, numbered)
+    show_results(df, key, table)
+    progress.progress(1.0, text=f"Готово: {len(players)} участников, ошибок: {failed}")
+    rating_history.record_run(players, lichess_results, chesscom_results)
+    return df
+
+# Последние известные результаты из локальной базы для ников одной стороны:
+# (результаты, время получения) по строкам; устаревшие и неизвестные — None.
+def _last_known(site, users, max_staleness):
+    results = [None] * len(users)
+    fetched = [None] * len(users)
+    if rating_store.store is None:
+        return results, fetched
+    known = rating_store.store.get_many(site, [user for user in users if user])
+    now = time.time()
+    for row, user in enumerate(users):
+        stored = known.get(user.strip().lower()) if user else None
+        if stored is None:
+            continue
+        fetched[row] = stored['fetched_at']
+        if now - stored['fetched_at'] <= max_staleness:
+            results[row] = stored['result']
+    return results, fetched
+
+# Режим "сначала сохранённые" (stale-while-revalidate): таблица сразу строится
+# из последних известных рейтингов с возрастом каждой ячейки, затем свежие
+# значения запрашиваются и подменяются по мере ответов. Если обновить ячейку
+# не удалось, остаётся сохранённое значение.
+# Возвращает итоговую таблицу (pyarrow.Table).
+def swr_ratings_table(players, numbered=True, max_staleness=SWR_MAX_STALENESS, key='results'):
+    lichess_results, lichess_ages = _last_known('lichess', [user for user, _ in players], max_staleness)
+    chesscom_results, chesscom_ages = _last_known('chesscom', [user for _, user in players], max_staleness)
+    fresh_lichess = [None] * len(players)
+    fresh_chesscom = [None] * len(players)
+    total = max(1, sum(bool(lichess_user) + bool(chesscom_user) for lichess_user, chesscom_user in players))
+    known = sum(result is not None for result in lichess_results + chesscom_results)
+    done = 0
+    failed = 0
+
+    progress = st.progress(0.0, text=f"Показаны сохранённые рейтинги: {known} из {total}, обновляем…")
+    table = st.empty()
+    ages = (lichess_ages, chesscom_ages)
+    _show(table, build_table(players, lichess_results, chesscom_results, numbered, ages))
+    last_render = time.monotonic()
+
+    for site, row, result in iter_player_ratings(players):
+        results, site_ages, fresh = ((lichess_results, lichess_ages, fresh_lichess) if site == 'lichess'
+                                     else (chesscom_results, chesscom_ages, fresh_chesscom))
+        done += 1
+        if 'error' in result:
+            failed += 1
+            if results[row] is None:
+                results[row] = result
+        else:
+            results[row] = fresh[row] = result
+            # Ответ мог прийти из кэша процесса — точное время получения знает база.
+            user = players[row][0 if site == 'lichess' else 1]
+            stored = rating_store.store.get(site, user) if rating_store.store is not None else None
+            site_ages[row] = stored['fetched_at'] if stored is not None else time.time()
+        progress.progress(done / total, text=f"Обновлено {done} из {total}, ошибок: {failed}")
+        if time.monotonic() - last_render >= RENDER_INTERVAL:
+            _show(table, build_table(players, lichess_results, chesscom_results, numbered, ages))
+            last_render = time.monotonic()
+
+    df = build_table(players, lichess_results, chesscom_results, numbered, ages)
+    show_results(df, key, table)
+    progress.progress(1.0, text=f"Обновлено: {done} из {total}, ошибок: {failed}")
+    rating_history.record_run(players, fresh_lichess, fresh_chesscom)
+    return df
@@ -0,0 +1,312 @@
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+
+import requests
+
+import decoding
+import metrics
+import rating_cache
+import rating_client
+import rating_store
+import scheduler
+import single_flight
+
+# Адреса API; переопределяются, например, для локальных заглушек в бенчмарках.
+LICHESS_API = os.environ.get('LICHESS_API', 'https://lichess.org')
+CHESSCOM_API = os.environ.get('CHESSCOM_API', 'https://api.chess.com')
+
+# Ограничения на число одновременных запросов к каждому сайту.
+# Можно переопределить через переменные окружения без правки кода.
+LICHESS_MAX_WORKERS = int(os.environ.get('LICHESS_MAX_WORKERS', 8))
+CHESSCOM_MAX_WORKERS = int(os.environ.get('CHESSCOM_MAX_WORKERS', 4))
+
+# Пакетный режим Lichess: один POST /api/users на 300 ников вместо запроса на каждого.
+LICHESS_BATCH_MODE = os.environ.get('LICHESS_BATCH_MODE', '1') == '1'
+LICHESS_BATCH_SIZE = 300  # Максимум, который принимает Lichess за один запрос.
+
+# Общий лимит времени на одно нажатие "Получить рейтинги" (секунды, 0 — без лимита).
+# Что не успело прийти, показывается как ошибка, остальное выводится как есть.
+# Лимит растёт с размером списка (run_deadline): к RUN_DEADLINE добавляется по
+# RUN_DEADLINE_PER_REQUEST секунд на каждый запрос, который сайт обрабатывает
+# последовательно, — иначе на Chess.com (запросы по одному) список длиннее
+# нескольких десятков игроков всегда упирался бы в лимит.
+RUN_DEADLINE = float(os.environ.get('RUN_DEADLINE', 60))
+RUN_DEADLINE_PER_REQUEST = float(os.environ.get('RUN_DEADLINE_PER_REQUEST', 1.0))
+
+# Лимит времени для списка: время самого загруженного сайта при его ограничениях
+# (частота и число одновременных запросов в scheduler.HOST_LIMITS) плюс RUN_DEADLINE.
+def run_deadline(lichess_count, chesscom_count, lichess_batch=LICHESS_BATCH_MODE):
+    if not RUN_DEADLINE:
+        return 0
+    lichess_requests = -(-lichess_count // LICHESS_BATCH_SIZE) if lichess_batch else lichess_count
+    slowest = 0.0
+    for host, requests_count in ((scheduler.LICHESS_HOST, lichess_requests),
+                                 (scheduler.CHESSCOM_HOST, chesscom_count)):
+        limits = scheduler.HOST_LIMITS.get(host, scheduler.DEFAULT_LIMITS)
+        per_request = max(1 / limits['rate'], RUN_DEADLINE_PER_REQUEST / max(1, limits['max_parallel']))
+        slowest = max(slowest, requests_count * per_request)
+    return RUN_DEADLINE + slowest
+
+# GET с перепроверкой по локальной базе: если ответ уже сохранён, отправляем
+# If-None-Match / If-Modified-Since и на 304 берём сохранённый результат.
+def get_revalidated(site, username, url, decode, headers=None):
+    store = rating_store.store
+    stored = store.get(site, username) if store is not None else None
+    headers = dict(headers or {})
+    if stored is not None:
+        if stored['etag']:
+            headers['If-None-Match'] = stored['etag']
+        if stored['last_modified']:
+            headers['If-Modified-Since'] = stored['last_modified']
+    response = scheduler.get(url, headers=headers)
+    if response.status_code == 304 and stored is not None:
+        store.touch(site, username)
+        return stored['result']
+    if response.status_code == 200:
+        with metrics.timer('http_parse'):
+            result = decode(response.content)
+        if store is not None:
+            store.save(site, username, result,
+                       response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return result
+    if response.status_code >= 500:
+        return {'error': f'Ошибка сервера: HTTP {response.status_code}'}
+    return {'error': rating_cache.NOT_FOUND}
+
+# Переводит исключение при запросе в текст ошибки для таблицы.
+def error_result(e):
+    if isinstance(e, scheduler.RateLimitedError):
+        return {'error': rating_cache.RATE_LIMITED}
+    if isinstance(e, scheduler.CircuitOpenError):
+        return {'error': rating_cache.UNAVAILABLE}
+    if isinstance(e, requests.Timeout):
+        return {'error': rating_cache.TIMEOUT}
+    return {'error': str(e)}
+
+# Функции для работы с рейтингами (результаты кэшируются в rating_cache)
+@rating_cache.cached('lichess')
+def get_lichess_ratings(username):
+    url = f"{LICHESS_API}/api/user/{username}"
+    try:
+        return get_revalidated('lichess', username, url, decoding.decode_lichess_user)
+    except Exception as e:
+        return error_result(e)
+
+@rating_cache.cached('chesscom')
+def get_chesscom_ratings(username):
+    username = username.lower()
+    url = f"{CHESSCOM_API}/pub/player/{username}/stats"
+    try:
+        return get_revalidated('chesscom', username, url, decoding.decode_chesscom_stats,
+                               headers={'User-Agent': 'my-app'})
+    except Exception as e:
+        return error_result(e)
+
+# Пакетный запрос рейтингов Lichess: ники без повторов режутся на пачки,
+# на каждую пачку — один POST /api/users. Lichess просто не возвращает
+# несуществующих игроков, поэтому им ставим "Игрок не найден".
+# Ники, которые уже есть в кэше, в запрос не попадают; ники, которые прямо сейчас
+# запрашивает кто-то другой, тоже — их результат берётся из того запроса.
+# fresh=True — кэш не проверяется (обновление записей, которые скоро истекут).
+# Возвращает список результатов в том же порядке, что и входной список.
+def get_lichess_ratings_batch(usernames, batch_size=LICHESS_BATCH_SIZE, fresh=False):
+    url = f"{LICHESS_API}/api/users"
+    flights = single_flight.flights
+    found = {}
+    missing = []
+    waiting = {}
+    unique = dict.fromkeys(rating_cache.normalize(username) for username in usernames)
+    flights.note_duplicates(len(usernames) - len(unique))
+    for name in unique:
+        cached = None if fresh else rating_cache.cache.get('lichess', name)
+        if cached is not None:
+            found[name] = cached
+            continue
+        call, leader = flights.begin(('lichess', name))
+        if leader:
+            missing.append((name, call))
+        else:
+            waiting[name] = call
+    for start in range(0, len(missing), batch_size):
+        chunk = missing[start:start + batch_size]
+        fetched = {}
+        chunk_error = {'error': 'Запрос прерван'}
+        try:
+            response = scheduler.post(url, data=','.join(name for name, _ in chunk),
+                                      headers={'Content-Type': 'text/plain'})
+            if response.status_code == 200:
+                with metrics.timer('http_parse'):
+                    fetched = decoding.decode_lichess_users(response.content)
+                if rating_store.store is not None:
+                    rating_store.store.save_many('lichess', fetched)
+                chunk_error = {'error': rating_cache.NOT_FOUND}
+            else:
+                chunk_error = {'error': f'Ошибка Lichess: HTTP {response.status_code}'}
+        except Exception as e:
+            chunk_error = error_result(e)
+        finally:
+            # Ключи освобождаются в любом случае, иначе ожидающие повиснут.
+            for name, call in chunk:
+                found[name] = fetched.get(name, chunk_error)
+                rating_cache.cache.put('lichess', name, found[name])
+                flights.finish(('lichess', name), call, found[name])
+    # Свои пачки уже отправлены, теперь ждём ники, которые запрашивали другие.
+    for name, call in waiting.items():
+        try:
+            found[name] = call.wait()
+        except Exception as e:
+            found[name] = error_result(e)
+    return [found[rating_cache.normalize(username)] for username in usernames]
+
+# Ставит в пул по одному запросу на каждый ник без учёта повторов;
+# результат потом отдаётся во все строки с этим ником.
+def _submit_unique(pool, fetch, site, usernames, futures):
+    positions = {}
+    for index, user in enumerate(usernames):
+        positions.setdefault(rating_cache.normalize(user), []).append(index)
+    single_flight.flights.note_duplicates(len(usernames) - len(positions))
+    for indices in positions.values():
+        futures[pool.submit(fetch, usernames[indices[0]])] = (site, indices, False)
+
+# Запрашивает рейтинги всех игроков сразу на обоих сайтах и отдаёт результаты
+# по мере готовности в виде (сайт, индекс в списке, результат).
+# Для каждого сайта свой пул потоков, поэтому лимит параллельности задаётся отдельно.
+# В пакетном режиме Lichess (lichess_batch) ники Lichess идут пачками через
+# get_lichess_ratings_batch, а lichess_fetch не используется.
+# Если за deadline секунд пришли не все ответы, оставшиеся отдаются с ошибкой DEADLINE,
+# а незапущенные запросы отменяются. deadline=None — лимит по размеру списка (run_deadline).
+# Если настроен общий сервис рейтингов (rating_client), запросы со стандартными
+# функциями получения идут через него; при недоступности сервиса — в этом процессе.
+def iter_ratings(lichess_list, chesscom_list,
+                 lichess_fetch=get_lichess_ratings, chesscom_fetch=get_chesscom_ratings,
+                 lichess_workers=LICHESS_MAX_WORKERS, chesscom_workers=CHESSCOM_MAX_WORKERS,
+                 lichess_batch=LICHESS_BATCH_MODE, deadline=None):
+    if deadline is None:
+        deadline = run_deadline(len(lichess_list), len(chesscom_list), lichess_batch)
+    client = rating_client.client
+    if (client is not None and client.available()
+            and lichess_fetch is get_lichess_ratings and chesscom_fetch is get_chesscom_ratings):
+        return _iter_remote_ratings(client, lichess_list, chesscom_list,
+                                    lichess_workers, chesscom_workers, lichess_batch, deadline)
+    return _iter_local_ratings(lichess_list, chesscom_list, lichess_fetch, chesscom_fetch,
+                               lichess_workers, chesscom_workers, lichess_batch, deadline)
+
+# Через сервис; если он недоступен или оборвал ответ, ники, по которым ещё нет
+# результата, запрашиваются в этом процессе с оставшимся лимитом времени.
+def _iter_remote_ratings(client, lichess_list, chesscom_list,
+                         lichess_workers, chesscom_workers, lichess_batch, deadline):
+    started = time.monotonic()
+    received = {'lichess': set(), 'chesscom': set()}
+    try:
+        for site, index, result in client.iter_ratings(lichess_list, chesscom_list, lichess_batch, deadline):
+            received[site].add(index)
+            yield site, index, result
+        return
+    except rating_client.ServiceUnavailable:
+        pass
+    lichess_rest = [index for index in range(len(lichess_list)) if index not in received['lichess']]
+    chesscom_rest = [index for index in range(len(chesscom_list)) if index not in received['chesscom']]
+    remaining = deadline - (time.monotonic() - started) if deadline else 0
+    if deadline and remaining <= 0:
+        for site, rest in (('lichess', lichess_rest), ('chesscom', chesscom_rest)):
+            for index in rest:
+                yield site, index, {'error': rating_cache.DEADLINE}
+        return
+    for site, index, result in _iter_local_ratings(
+            [lichess_list[index] for index in lichess_rest], [chesscom_list[index] for index in chesscom_rest],
+            get_lichess_ratings, get_chesscom_ratings,
+            lichess_workers, chesscom_workers, lichess_batch, remaining):
+        yield site, (lichess_rest if site == 'lichess' else chesscom_rest)[index], result
+
+def _iter_local_ratings(lichess_list, chesscom_list, lichess_fetch, chesscom_fetch,
+                        lichess_workers, chesscom_workers, lichess_batch, deadline):
+    lichess_pool = ThreadPoolExecutor(max_workers=max(1, lichess_workers))
+    chesscom_pool = ThreadPoolExecutor(max_workers=max(1, chesscom_workers))
+    try:
+        # Для каждой задачи: сайт, индексы строк, которые она закрывает,
+        # и пакетная ли она (пакетная возвращает список результатов по порядку).
+        futures = {}
+        if lichess_batch:
+            for start in range(0, len(lichess_list), LICHESS_BATCH_SIZE):
+                chunk = lichess_list[start:start + LICHESS_BATCH_SIZE]
+                futures[lichess_pool.submit(get_lichess_ratings_batch, chunk)] = (
+                    'lichess', range(start, start + len(chunk)), True)
+        else:
+            _submit_unique(lichess_pool, lichess_fetch, 'lichess', lichess_list, futures)
+        _submit_unique(chesscom_pool, chesscom_fetch, 'chesscom', chesscom_list, futures)
+
+        pending = set(futures)
+        try:
+            for future in as_completed(futures, timeout=deadline or None):
+                pending.discard(future)
+                site, indices, batched = futures[future]
+                results = future.result() if batched else [future.result()] * len(indices)
+                for index, result in zip(indices, results):
+                    yield site, index, result
+        except FuturesTimeout:
+            for future in pending:
+                site, indices, _ = futures[future]
+                for index in indices:
+                    yield site, index, {'error': rating_cache.DEADLINE}
+    finally:
+        # Не ждём зависшие запросы: их ограничивают таймауты http_client.
+        lichess_pool.shutdown(wait=False, cancel_futures=True)
+        chesscom_pool.shutdown(wait=False, cancel_futures=True)
+
+# То же, но дожидается всех ответов.
+# Возвращает два списка результатов в том же порядке, что и входные списки.
+def fetch_all_ratings(lichess_list, chesscom_list, **options):
+    lichess_results = [None] * len(lichess_list)
+    chesscom_results = [None] * len(chesscom_list)
+    for site, index, result in iter_ratings(lichess_list, chesscom_list, **options):
+        if site == 'lichess':
+            lichess_results[index] = result
+        else:
+            chesscom_results[index] = result
+    return lichess_results, chesscom_results
+
+# Разбирает поля ввода в список игроков — пар (ник Lichess, ник Chess.com);
+# стороны, которой у игрока нет, — None. Без явного сопоставления ники идут
+# парами по порядку, а лишние ники более длинного списка остаются строками
+# с одной стороной. Запись "ник_Lichess=ник_Chess.com" в поле Lichess задаёт
+# пару явно; тогда ники Chess.com, не попавшие ни в одну пару, идут отдельными строками.
+def parse_players(lichess_text, chesscom_text):
+    lichess_entries = [nick.strip() for nick in lichess_text.split(',') if nick.strip()]
+    chesscom_entries = [nick.strip() for nick in chesscom_text.split(',') if nick.strip()]
+    if not any('=' in entry for entry in lichess_entries):
+        return list(itertools.zip_longest(lichess_entries, chesscom_entries))
+    players = []
+    paired = set()
+    for entry in lichess_entries:
+        lichess_user, _, chesscom_user = (part.strip() for part in entry.partition('='))
+        if lichess_user or chesscom_user:
+            players.append((lichess_user or None, chesscom_user or None))
+        if chesscom_user:
+            paired.add(rating_cache.normalize(chesscom_user))
+    players.extend((None, user) for user in chesscom_entries if rating_cache.normalize(user) not in paired)
+    return players
+
+# Рейтинги для списка игроков: ники каждого сайта запрашиваются независимо
+# (через iter_ratings, без обрезки до общей длины), результаты отдаются как
+# (сайт, номер игрока в списке, результат).
+def iter_player_ratings(players, **options):
+    lichess_rows = [row for row, (lichess_user, _) in enumerate(players) if lichess_user]
+    chesscom_rows = [row for row, (_, chesscom_user) in enumerate(players) if chesscom_user]
+    lichess_list = [players[row][0] for row in lichess_rows]
+    chesscom_list = [players[row][1] for row in chesscom_rows]
+    for site, index, result in iter_ratings(lichess_list, chesscom_list, **options):
+        yield site, (lichess_rows if site == 'lichess' else chesscom_rows)[index], result
+
+# То же, но дожидается всех ответов. Возвращает два списка по числу игроков;
+# где стороны нет, результат — None.
+def fetch_player_ratings(players, **options):
+    lichess_results = [None] * len(players)
+    chesscom_results = [None] * len(players)
+    for site, row, result in iter_player_ratings(players, **options):
+        if site == 'lichess':
+            lichess_results[row] = result
+        else:
+            chesscom_results[row] = result
+    return lichess_results, chesscom_results
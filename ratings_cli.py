@@ -0,0 +1,240 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+
+import rating_history
+from ratings import iter_player_ratings
+
+# Пакетный режим без Streamlit: рейтинги для больших списков игроков из файла.
+#
+#   python ratings_cli.py roster.csv -o ratings.jsonl
+#   python ratings_cli.py roster.jsonl -o ratings.parquet --window 1000
+#
+# Входной файл читается потоково: CSV с колонками lichess,chesscom или JSONL
+# с такими же ключами. Обрабатывается окнами по --window строк; после каждого
+# окна результаты дописываются в выходной файл, а в <выход>.checkpoint
+# сохраняется число готовых строк и длина файла в байтах. Повторный запуск с той
+# же командой обрезает файл до этой длины (строки, записанные после последнего
+# чекпоинта, не дублируются) и продолжает, не запрашивая готовые строки заново.
+# Выход .parquet — папка: каждое окно в своём файле part-<первая строка>.parquet.
+
+OUTPUT_FIELDS = ['lichess', 'chesscom',
+                 'lichess_bullet', 'lichess_blitz', 'lichess_error',
+                 'chesscom_bullet', 'chesscom_blitz', 'chesscom_error']
+
+# Построчно читает пары ников из CSV или JSONL, не загружая файл целиком.
+def read_pairs(path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    yield (item.get('lichess') or '').strip(), (item.get('chesscom') or '').strip()
+        else:
+            for item in csv.DictReader(f):
+                yield (item.get('lichess') or '').strip(), (item.get('chesscom') or '').strip()
+
+# Рейтинг в выходном файле — число или пусто (ошибка пишется в отдельную колонку).
+def _rating(value):
+    return value if isinstance(value, int) else None
+
+def make_record(lichess_user, chesscom_user, lichess_ratings, chesscom_ratings):
+    return {
+        'lichess': lichess_user,
+        'chesscom': chesscom_user,
+        'lichess_bullet': _rating(lichess_ratings.get('bullet')),
+        'lichess_blitz': _rating(lichess_ratings.get('blitz')),
+        'lichess_error': lichess_ratings.get('error'),
+        'chesscom_bullet': _rating(chesscom_ratings.get('bullet')),
+        'chesscom_blitz': _rating(chesscom_ratings.get('blitz')),
+        'chesscom_error': chesscom_ratings.get('error'),
+    }
+
+# Запись результатов в нужном формате. checkpoint — сохранённый чекпоинт или
+# None для записи с нуля. write() возвращает длину файла в байтах после окна
+# (она попадает в чекпоинт), для Parquet — None.
+
+# Текстовый файл, который при продолжении обрезается до длины из чекпоинта:
+# строки окна, не попавшего в чекпоинт, запишутся заново, а не второй раз.
+# Что выходной файл при продолжении существует, проверяет main (check_resume).
+def _open_text(path, checkpoint):
+    if checkpoint is None:
+        return open(path, 'w', encoding='utf-8', newline=''), True
+    if checkpoint.get('offset') is not None:
+        with open(path, 'r+b') as f:
+            f.truncate(checkpoint['offset'])
+    return open(path, 'a', encoding='utf-8', newline=''), os.path.getsize(path) == 0
+
+class CsvWriter:
+    def __init__(self, path, checkpoint):
+        self._file, new = _open_text(path, checkpoint)
+        self._writer = csv.DictWriter(self._file, fieldnames=OUTPUT_FIELDS)
+        if new:
+            self._writer.writeheader()
+
+    def write(self, records):
+        self._writer.writerows(records)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+class JsonlWriter:
+    def __init__(self, path, checkpoint):
+        self._file, _ = _open_text(path, checkpoint)
+
+    def write(self, records):
+        for record in records:
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+# Первая строка окна по имени файла part-<строка>.parquet.
+def _part_row(name):
+    try:
+        return int(name[len('part-'):-len('.parquet')])
+    except ValueError:
+        return -1
+
+# Parquet нельзя дописывать, поэтому выход — папка, и каждое окно пишется в свой
+# файл part-<первая строка>.parquet: сначала под временным именем с точкой,
+# затем os.replace. Чекпоинт сохраняется уже после переименования, так что
+# оборванный запуск оставляет только целые файлы. Файлы окон после чекпоинта
+# (записанные, но не отмеченные) при продолжении удаляются.
+class ParquetWriter:
+    def __init__(self, path, checkpoint):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa = pa
+        self._pq = pq
+        self._path = path
+        self._schema = pa.schema([
+            ('lichess', pa.string()), ('chesscom', pa.string()),
+            ('lichess_bullet', pa.int32()), ('lichess_blitz', pa.int32()), ('lichess_error', pa.string()),
+            ('chesscom_bullet', pa.int32()), ('chesscom_blitz', pa.int32()), ('chesscom_error', pa.string()),
+        ])
+        self._row = checkpoint['done'] if checkpoint else 0
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name.startswith('.part-') or (name.startswith('part-') and _part_row(name) >= self._row):
+                os.remove(os.path.join(path, name))
+
+    def write(self, records):
+        name = f'part-{self._row:012d}.parquet'
+        tmp_path = os.path.join(self._path, '.' + name)
+        self._pq.write_table(self._pa.Table.from_pylist(records, schema=self._schema), tmp_path)
+        os.replace(tmp_path, os.path.join(self._path, name))
+        self._row += len(records)
+        return None
+
+    def close(self):
+        pass
+
+def open_writer(path, checkpoint):
+    if path.endswith('.parquet'):
+        return ParquetWriter(path, checkpoint)
+    if path.endswith('.jsonl'):
+        return JsonlWriter(path, checkpoint)
+    return CsvWriter(path, checkpoint)
+
+def load_checkpoint(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return checkpoint if checkpoint.get('done') else None
+
+# Чем был входной файл, когда писался чекпоинт: путь и размер.
+def input_signature(path):
+    return {'input': os.path.abspath(path), 'input_size': os.path.getsize(path)}
+
+# Чекпоинт пишется через временный файл, чтобы при сбое не остался обрезанный.
+def save_checkpoint(path, done, offset, signature):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'done': done, 'offset': offset, **signature}, f)
+    os.replace(tmp_path, path)
+
+# Продолжать можно, только если чекпоинт от того же входного файла и выходной
+# файл на месте: иначе пропущенные строки входа не попали бы в результат.
+# Возвращает текст ошибки или None. Чекпоинты без сведений о входе (старый
+# формат) проверяются только на наличие выхода.
+def check_resume(checkpoint, signature, output):
+    if not os.path.exists(output):
+        return f"выходного файла {output} нет, а чекпоинт говорит о {checkpoint['done']} готовых строках"
+    if 'input' in checkpoint and (checkpoint['input'], checkpoint.get('input_size')) != (
+            signature['input'], signature['input_size']):
+        return f"чекпоинт записан для другого входного файла ({checkpoint['input']})"
+    return None
+
+# Обрабатывает одно окно пар и возвращает записи в исходном порядке.
+# Пустой ник на одном из сайтов не запрашивается: в записи эта сторона остаётся пустой.
+def fetch_window(pairs):
+    players = [(lichess_user or None, chesscom_user or None) for lichess_user, chesscom_user in pairs]
+    lichess_results = [{}] * len(players)
+    chesscom_results = [{}] * len(players)
+    for site, row, result in iter_player_ratings(players, deadline=0):
+        if site == 'lichess':
+            lichess_results[row] = result
+        else:
+            chesscom_results[row] = result
+    rating_history.record_run(players, lichess_results, chesscom_results)
+    return [make_record(lichess_user, chesscom_user, lichess_ratings, chesscom_ratings)
+            for (lichess_user, chesscom_user), lichess_ratings, chesscom_ratings
+            in zip(pairs, lichess_results, chesscom_results)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Рейтинги Lichess и Chess.com для списка игроков из файла.')
+    parser.add_argument('input', help='CSV или JSONL с полями lichess, chesscom')
+    parser.add_argument('-o', '--output', required=True, help='Куда писать результат: .csv, .jsonl или .parquet')
+    parser.add_argument('--window', type=int, default=500, help='Сколько строк обрабатывать за раз')
+    parser.add_argument('--restart', action='store_true', help='Игнорировать чекпоинт и начать заново')
+    args = parser.parse_args(argv)
+
+    checkpoint_path = args.output + '.checkpoint'
+    signature = input_signature(args.input)
+    checkpoint = None if args.restart else load_checkpoint(checkpoint_path)
+    if checkpoint is not None:
+        problem = check_resume(checkpoint, signature, args.output)
+        if problem:
+            parser.error(f"{problem}; чтобы начать заново, добавьте --restart")
+    start = checkpoint['done'] if checkpoint else 0
+    if start:
+        print(f"Продолжаем со строки {start + 1}", file=sys.stderr)
+
+    pairs = itertools.islice(read_pairs(args.input), start, None)
+    writer = open_writer(args.output, checkpoint)
+    done = start
+    processed = 0
+    started = time.monotonic()
+    try:
+        while True:
+            window = list(itertools.islice(pairs, args.window))
+            if not window:
+                break
+            offset = writer.write(fetch_window(window))
+            done += len(window)
+            processed += len(window)
+            save_checkpoint(checkpoint_path, done, offset, signature)
+            print(f"Готово строк: {done}", file=sys.stderr)
+    finally:
+        writer.close()
+
+    elapsed = time.monotonic() - started
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"Обработано игроков: {processed} за {elapsed:.1f} с ({rate:.1f} игроков/с)", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+# Файл базы со списками игроков. Пустая строка в ROSTER_STORE_PATH отключает базу.
+ROSTER_STORE_PATH = os.environ.get('ROSTER_STORE_PATH', 'rosters.sqlite3')
+
+# Через сколько секунд после последнего изменения список записывается в базу.
+# Быстрые правки подряд (каждое on_change) сливаются в одну запись.
+ROSTER_SAVE_DELAY = float(os.environ.get('ROSTER_SAVE_DELAY', 1.0))
+
+# Не дольше скольких секунд изменение может ждать записи, даже если правки
+# идут непрерывно и каждая откладывает запись ещё на ROSTER_SAVE_DELAY.
+ROSTER_SAVE_MAX_DELAY = float(os.environ.get('ROSTER_SAVE_MAX_DELAY', 10.0))
+
+DEFAULT_ROSTER = 'основной'
+
+# Именованные списки игроков каждого пользователя: (владелец, название) -> ники
+# Lichess и Chess.com в том виде, в каком они введены в поля, и время последнего
+# использования (загрузки или сохранения). База в режиме WAL,
+# каждая запись — одна транзакция, так что при одновременной работе нескольких
+# сессий файл не бывает записан наполовину, а чтение не ждёт записи.
+class RosterStore:
+    def __init__(self, path=ROSTER_STORE_PATH, save_delay=ROSTER_SAVE_DELAY,
+                 max_delay=ROSTER_SAVE_MAX_DELAY):
+        self.path = path
+        self.save_delay = save_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._pending = {}  # (владелец, название) -> (lichess, chesscom), ещё не записанные
+        self._oldest = None  # time.monotonic() самого старого незаписанного изменения
+        self._timer = None
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            # Первичный ключ (owner, name) и есть индекс для загрузки списка.
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS rosters (
+                    owner TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    lichess TEXT NOT NULL,
+                    chesscom TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    used_at REAL NOT NULL,
+                    PRIMARY KEY (owner, name)
+                ) WITHOUT ROWID
+            ''')
+            # Базы, созданные до появления used_at: использованием считаем последнее сохранение.
+            columns = {row[1] for row in self._conn.execute('PRAGMA table_info(rosters)')}
+            if 'used_at' not in columns:
+                self._conn.execute('ALTER TABLE rosters ADD COLUMN used_at REAL NOT NULL DEFAULT 0')
+                self._conn.execute('UPDATE rosters SET used_at = updated_at')
+            self._conn.commit()
+
+    # Возвращает (lichess, chesscom) или None, если такого списка нет.
+    # Ещё не записанные изменения тоже видны. Загрузка отмечает список как
+    # использованный; если база сейчас занята, отметка просто пропускается.
+    def load(self, owner, name=DEFAULT_ROSTER):
+        with self._lock:
+            pending = self._pending.get((owner, name))
+            if pending is not None:
+                return pending
+            row = self._conn.execute(
+                'SELECT lichess, chesscom FROM rosters WHERE owner = ? AND name = ?',
+                (owner, name)
+            ).fetchone()
+            if row is not None:
+                try:
+                    with self._conn:
+                        self._conn.execute('UPDATE rosters SET used_at = ? WHERE owner = ? AND name = ?',
+                                           (time.time(), owner, name))
+                except sqlite3.OperationalError:
+                    pass
+        return tuple(row) if row is not None else None
+
+    # Названия списков пользователя по алфавиту.
+    def list_rosters(self, owner):
+        with self._lock:
+            names = {row[0] for row in self._conn.execute(
+                'SELECT name FROM rosters WHERE owner = ?', (owner,)
+            )}
+            names.update(name for pending_owner, name in self._pending if pending_owner == owner)
+        return sorted(names)
+
+    # Все списки всех пользователей: (владелец, название, lichess, chesscom).
+    # used_since — только списки, использованные не раньше этого времени (time.time());
+    # ещё не записанные изменения считаются использованием прямо сейчас.
+    def all_rosters(self, used_since=None):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT owner, name, lichess, chesscom FROM rosters WHERE used_at >= ?',
+                (used_since or 0,)
+            )
+            rosters = {(owner, name): (lichess, chesscom) for owner, name, lichess, chesscom in rows}
+            rosters.update(self._pending)
+        return [(owner, name, lichess, chesscom) for (owner, name), (lichess, chesscom) in rosters.items()]
+
+    # Откладывает запись: если за ROSTER_SAVE_DELAY список изменится ещё раз,
+    # в базу попадёт только последнее значение. Но самое старое изменение
+    # ждёт не дольше ROSTER_SAVE_MAX_DELAY, иначе поток правок из разных сессий
+    # откладывал бы запись бесконечно.
+    def save_later(self, owner, name, lichess, chesscom):
+        with self._lock:
+            self._pending[(owner, name)] = (lichess, chesscom)
+            now = time.monotonic()
+            if self._oldest is None:
+                self._oldest = now
+            self._schedule(min(self.save_delay, max(0.0, self._oldest + self.max_delay - now)))
+
+    # Вызывается под self._lock.
+    def _schedule(self, delay):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._flush_later)
+        self._timer.daemon = True
+        self._timer.start()
+
+    # Запись по таймеру: если база занята или недоступна, изменения остаются
+    # в _pending и запись повторяется через ROSTER_SAVE_DELAY.
+    def _flush_later(self):
+        try:
+            self.flush()
+        except sqlite3.OperationalError as error:
+            log.warning('Не удалось записать списки игроков в %s: %s', self.path, error)
+            metrics.incr('roster_save_errors')
+            with self._lock:
+                if self._pending and self._timer is None:
+                    self._schedule(self.save_delay)
+
+    def save(self, owner, name, lichess, chesscom):
+        with self._lock:
+            self._pending[(owner, name)] = (lichess, chesscom)
+        self.flush()
+
+    # Записывает все отложенные изменения одной транзакцией.
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                self._oldest = None
+                return
+            now = time.time()
+            with self._conn:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO rosters (owner, name, lichess, chesscom, updated_at, used_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    [(owner, name, lichess, chesscom, now, now)
+                     for (owner, name), (lichess, chesscom) in self._pending.items()]
+                )
+            self._pending.clear()
+            self._oldest = None
+
+    def delete(self, owner, name):
+        with self._lock:
+            self._pending.pop((owner, name), None)
+            with self._conn:
+                self._conn.execute('DELETE FROM rosters WHERE owner = ? AND name = ?', (owner, name))
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+# Открывает общую базу; если она отключена или файл недоступен — работаем без неё.
+def _open_store():
+    if not ROSTER_STORE_PATH:
+        return None
+    try:
+        roster_store = RosterStore()
+    except sqlite3.Error:
+        return None
+    # Отложенные изменения не должны теряться при остановке сервера.
+    atexit.register(roster_store.flush)
+    return roster_store
+
+# Общая база на весь процесс (None, если отключена).
+store = _open_store()
@@ -0,0 +1,369 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+
+import http_client
+import metrics
+
+# Хосты берутся из тех же переменных окружения, что и адреса API в ratings.py.
+LICHESS_HOST = urlsplit(os.environ.get('LICHESS_API', 'https://lichess.org')).netloc
+CHESSCOM_HOST = urlsplit(os.environ.get('CHESSCOM_API', 'https://api.chess.com')).netloc
+
+# Ограничения по хостам: rate — запросов в секунду, burst — запас токенов,
+# max_parallel — сколько запросов одновременно, cooldown_429 — пауза после 429
+# без заголовка Retry-After (Lichess просит ждать минуту).
+# Chess.com допускает неограниченный последовательный доступ, а параллельные
+# запросы может отклонять с 429, поэтому к нему по умолчанию ходим по одному.
+HOST_LIMITS = {
+    LICHESS_HOST: {
+        'rate': float(os.environ.get('LICHESS_RATE', 5)),
+        'burst': 5,
+        'max_parallel': int(os.environ.get('LICHESS_MAX_PARALLEL', 4)),
+        'cooldown_429': 60,
+    },
+    CHESSCOM_HOST: {
+        'rate': float(os.environ.get('CHESSCOM_RATE', 10)),
+        'burst': 10,
+        'max_parallel': int(os.environ.get('CHESSCOM_MAX_PARALLEL', 1)),
+        'cooldown_429': None,
+    },
+}
+DEFAULT_LIMITS = {'rate': 5, 'burst': 5, 'max_parallel': 4, 'cooldown_429': None}
+
+MAX_RETRIES = int(os.environ.get('SCHEDULER_MAX_RETRIES', 3))
+BACKOFF_BASE = 0.5   # Первая пауза перед повтором, секунды.
+BACKOFF_MAX = 30     # Потолок паузы, секунды.
+MAX_WAIT = float(os.environ.get('SCHEDULER_MAX_WAIT', 10))  # Дольше ждать не будем — сразу ошибка.
+RETRY_STATUSES = {500, 502, 503, 504}
+
+# Хеджирование: если GET висит дольше p95 задержки хоста, отправляем копию
+# и берём тот ответ, что придёт первым. Копия тоже проходит лимиты хоста.
+HEDGE_ENABLED = os.environ.get('HEDGE_ENABLED', '1') == '1'
+HEDGE_MIN_SAMPLES = 20   # Пока замеров меньше, p95 считать рано.
+LATENCY_WINDOW = 200     # Сколько последних замеров держать на хост.
+
+# Предохранитель (circuit breaker): после CIRCUIT_FAILURES таймаутов/обрывов подряд
+# хост считается недоступным CIRCUIT_RESET секунд и запросы к нему сразу завершаются ошибкой.
+CIRCUIT_FAILURES = int(os.environ.get('CIRCUIT_FAILURES', 5))
+CIRCUIT_RESET = float(os.environ.get('CIRCUIT_RESET', 30))
+
+# Фоновые запросы (scheduler.background(), например обновление сохранённых списков)
+# уступают интерактивным: ждут, пока у хоста нет интерактивных запросов, оставляют
+# им BACKGROUND_RESERVE токенов из запаса и один слот параллельности и не хеджируются.
+# Если у хоста всего один слот (Chess.com по умолчанию), фоновый запрос занимает
+# и его, так что нажатие может подождать окончания одного уже отправленного
+# фонового запроса, но не очереди из них.
+BACKGROUND_RESERVE = float(os.environ.get('BACKGROUND_RESERVE', 2))
+
+# Сервер ограничил частоту запросов, и ждать дольше MAX_WAIT нельзя.
+class RateLimitedError(Exception):
+    def __init__(self, host, retry_in):
+        super().__init__(f'{host}: превышен лимит запросов, повтор через {retry_in:.0f} с')
+        self.host = host
+        self.retry_in = retry_in
+
+# Хост много раз подряд не ответил — не ждём очередной таймаут, а сразу сообщаем об ошибке.
+class CircuitOpenError(Exception):
+    def __init__(self, host, retry_in):
+        super().__init__(f'{host}: сайт не отвечает, повтор через {retry_in:.0f} с')
+        self.host = host
+        self.retry_in = retry_in
+
+# Классический token bucket: токены копятся со скоростью rate, но не больше burst.
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    # Берёт токен, только если он есть прямо сейчас (для хеджирующих копий).
+    # reserve — сколько токенов должно остаться после этого (для фоновых запросов).
+    def try_acquire(self, reserve=0):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1 + reserve:
+                self.tokens -= 1
+                return True
+            return False
+
+# Состояние одного хоста: token bucket, ограничение параллельности, пауза после 429,
+# замеры задержки и предохранитель.
+class HostLimiter:
+    def __init__(self, host, limits):
+        self.host = host
+        self.bucket = TokenBucket(limits['rate'], limits['burst'])
+        self.slots = threading.BoundedSemaphore(max(1, limits['max_parallel']))
+        # Фоновые запросы берут ещё и этот семафор: их не больше max_parallel - 1,
+        # и один слот всегда остаётся интерактивным.
+        self.background_slots = threading.BoundedSemaphore(max(1, limits['max_parallel'] - 1))
+        # Потоки для хеджированных запросов этого хоста. Каждая задача отправляется
+        # уже со слотом, поэтому задач не больше max_parallel и в очереди они не стоят,
+        # а медленный хост не занимает потоки других.
+        self.pool = ThreadPoolExecutor(max_workers=max(1, limits['max_parallel']),
+                                       thread_name_prefix=f'hedge-{host}')
+        self.cooldown_429 = limits['cooldown_429']
+        self.cooldown_until = 0.0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.failures = 0
+        self.circuit_open_until = 0.0
+        self.interactive = 0  # интерактивных запросов к хосту сейчас (ждут или выполняются)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    # Ждёт окончания паузы после 429; если ждать слишком долго — RateLimitedError.
+    def wait_cooldown(self):
+        remaining = self.cooldown_until - time.monotonic()
+        if remaining > MAX_WAIT:
+            raise RateLimitedError(self.host, remaining)
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def cool_down(self, delay):
+        with self._lock:
+            self.cooldown_until = max(self.cooldown_until, time.monotonic() + delay)
+
+    # Предохранитель открыт — CircuitOpenError. По истечении паузы пропускаем
+    # один пробный запрос (остальные продолжают получать ошибку, пока он не вернётся).
+    def check_circuit(self):
+        with self._lock:
+            if self.failures < CIRCUIT_FAILURES:
+                return
+            remaining = self.circuit_open_until - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpenError(self.host, remaining)
+            self.circuit_open_until = time.monotonic() + CIRCUIT_RESET
+
+    def record_success(self, latency):
+        with self._lock:
+            self.latencies.append(latency)
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= CIRCUIT_FAILURES:
+                self.circuit_open_until = time.monotonic() + CIRCUIT_RESET
+
+    def begin_interactive(self):
+        with self._lock:
+            self.interactive += 1
+
+    def end_interactive(self):
+        with self._lock:
+            self.interactive -= 1
+            if not self.interactive:
+                self._idle.notify_all()
+
+    # Очередь фонового запроса: ждёт, пока у хоста не останется интерактивных
+    # запросов и в запасе будет токен сверх резерва для них.
+    def acquire_background(self):
+        reserve = min(BACKGROUND_RESERVE, self.bucket.capacity - 1)
+        while True:
+            with self._lock:
+                self._idle.wait_for(lambda: not self.interactive)
+            if self.bucket.try_acquire(reserve):
+                return
+            time.sleep(1 / self.bucket.rate)
+
+    # Порог для хеджирования — p95 последних задержек, или None, если замеров мало.
+    def hedge_after(self):
+        with self._lock:
+            if len(self.latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+# Счётчики для отладки: сколько повторов и сколько раз упёрлись в лимит.
+stats = {'requests': 0, 'retries': 0, 'throttled': 0, 'hedged': 0, 'timeouts': 0, 'circuit_open': 0,
+         'background': 0}
+_stats_lock = threading.Lock()
+
+def _count(name):
+    with _stats_lock:
+        stats[name] += 1
+
+metrics.register_collector('scheduler', lambda: dict(stats))
+
+def get_limiter(host):
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = HostLimiter(host, HOST_LIMITS.get(host, DEFAULT_LIMITS))
+            _limiters[host] = limiter
+        return limiter
+
+_context = threading.local()
+
+# Запросы внутри этого блока (в текущем потоке) считаются фоновыми.
+@contextmanager
+def background():
+    previous = getattr(_context, 'background', False)
+    _context.background = True
+    try:
+        yield
+    finally:
+        _context.background = previous
+
+def is_background():
+    return getattr(_context, 'background', False)
+
+# Один запрос внутри уже занятого слота хоста; ведёт учёт задержек и отказов.
+def _send_in_slot(limiter, method, url, kwargs):
+    try:
+        _count('requests')
+        started = time.monotonic()
+        try:
+            response = http_client.request(method, url, **kwargs)
+        except (requests.Timeout, requests.ConnectionError):
+            _count('timeouts')
+            limiter.record_failure()
+            raise
+        limiter.record_success(time.monotonic() - started)
+        return response
+    finally:
+        limiter.slots.release()
+
+def _send(limiter, method, url, kwargs):
+    if is_background():
+        with limiter.background_slots:
+            limiter.slots.acquire()
+            return _send_in_slot(limiter, method, url, kwargs)
+    limiter.slots.acquire()
+    return _send_in_slot(limiter, method, url, kwargs)
+
+# Отправка с хеджированием: слот хоста занимается в вызывающем потоке, и только
+# потом запускается отсчёт — до p95 считается лишь время в сети, а не ожидание
+# слота. Если основной запрос не успел, а у хоста есть свободный слот и токен,
+# запускаем копию и возвращаем первый успешный ответ. Потоковые GET (stream=True)
+# не хеджируются: их тело читается уже после возврата ответа.
+def _send_hedged(limiter, method, url, kwargs):
+    hedgeable = HEDGE_ENABLED and method == 'GET' and not kwargs.get('stream') and not is_background()
+    threshold = limiter.hedge_after() if hedgeable else None
+    if threshold is None:
+        return _send(limiter, method, url, kwargs)
+    limiter.slots.acquire()
+    primary = limiter.pool.submit(_send_in_slot, limiter, method, url, kwargs)
+    try:
+        return primary.result(timeout=threshold)
+    except FuturesTimeout:
+        pass
+    # Копию шлём только при свободном слоте и токене, иначе ждём основной запрос.
+    if not limiter.slots.acquire(blocking=False):
+        return primary.result()
+    if not limiter.bucket.try_acquire():
+        limiter.slots.release()
+        return primary.result()
+    _count('hedged')
+    hedge = limiter.pool.submit(_send_in_slot, limiter, method, url, kwargs)
+    error = None
+    for future in as_completed([primary, hedge]):
+        try:
+            response = future.result()
+        except Exception as e:
+            error = e
+            continue
+        (hedge if future is primary else primary).add_done_callback(_close_response)
+        return response
+    raise error
+
+# Проигравший ответ хеджированной пары закрывается, когда придёт, — иначе его
+# соединение не вернётся в пул до сборки мусора.
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+# Экспоненциальная пауза со случайным разбросом, чтобы потоки не повторяли запрос хором.
+def backoff_delay(attempt):
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+# Retry-After бывает числом секунд или HTTP-датой.
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+# Все исходящие запросы идут через эту функцию: лимиты хоста, повторы при 5xx
+# и 429 с учётом Retry-After, хеджирование медленных GET и предохранитель.
+# Возвращает requests.Response; если сервер продолжает отвечать 429 — выбрасывает
+# RateLimitedError, если хост не отвечает — CircuitOpenError, чтобы не путать их с 404.
+# Фоновые запросы пропускают интерактивные вперёд (см. BACKGROUND_RESERVE).
+def request(method, url, **kwargs):
+    host = urlsplit(url).netloc
+    limiter = get_limiter(host)
+    if is_background():
+        _count('background')
+        return _request(limiter, host, method, url, kwargs, limiter.acquire_background)
+    limiter.begin_interactive()
+    try:
+        return _request(limiter, host, method, url, kwargs, limiter.bucket.acquire)
+    finally:
+        limiter.end_interactive()
+
+def _request(limiter, host, method, url, kwargs, acquire_token):
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            limiter.check_circuit()
+        except CircuitOpenError:
+            _count('circuit_open')
+            raise
+        limiter.wait_cooldown()
+        acquire_token()
+        response = _send_hedged(limiter, method, url, kwargs)
+        if response.status_code == 429:
+            _count('throttled')
+            delay = parse_retry_after(response.headers.get('Retry-After'))
+            if delay is None:
+                delay = limiter.cooldown_429 or backoff_delay(attempt)
+            limiter.cool_down(delay)
+            if attempt == MAX_RETRIES or delay > MAX_WAIT:
+                raise RateLimitedError(host, delay)
+            _count('retries')
+            response.close()
+            continue
+        if response.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+            _count('retries')
+            response.close()
+            time.sleep(backoff_delay(attempt))
+            continue
+        return response
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
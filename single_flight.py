@@ -0,0 +1,90 @@
+import threading
+
+import metrics
+import scheduler
+
+# Объединение одинаковых запросов: если рейтинг (сайт, ник) уже запрашивается —
+# в этом же нажатии кнопки, в другой сессии Streamlit или пакетным запросом
+# Lichess, — второй запрос не отправляется, а ждёт и получает тот же результат.
+# Исключение — фоновый запрос (scheduler.background()): интерактивный к нему не
+# присоединяется, потому что фоновый пропускает вперёд все интерактивные запросы
+# к сайту и может долго стоять в очереди. Интерактивный выполняется сам и
+# занимает ключ, а фоновый отдаёт свой результат только своим ожидающим.
+
+class _Call:
+    def __init__(self, background=False):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.background = background
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}  # ключ -> _Call, который сейчас выполняется
+        self._lock = threading.Lock()
+        self.leaders = 0       # запросов, отправленных на самом деле
+        self.coalesced = 0     # присоединились к уже идущему запросу
+        self.deduplicated = 0  # повторы ника в одном списке
+        self.overtaken = 0     # интерактивные запросы, не ставшие ждать фоновый
+
+    # Занимает ключ: возвращает (call, True), если запрос должен выполнить вызывающий,
+    # или (call, False), если такой запрос уже идёт и нужно дождаться call.wait().
+    def begin(self, key):
+        background = scheduler.is_background()
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and (background or not call.background):
+                self.coalesced += 1
+                return call, False
+            if call is not None:
+                self.overtaken += 1
+            call = self._calls[key] = _Call(background)
+            self.leaders += 1
+            return call, True
+
+    # Отдаёт результат всем ожидающим и освобождает ключ.
+    def finish(self, key, call, result=None, error=None):
+        call.result = result
+        call.error = error
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.done.set()
+
+    def do(self, key, fn):
+        call, leader = self.begin(key)
+        if not leader:
+            return call.wait()
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result)
+        return result
+
+    def note_duplicates(self, count):
+        if count:
+            with self._lock:
+                self.deduplicated += count
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'deduplicated': self.deduplicated,
+                'overtaken': self.overtaken,
+                'saved': self.coalesced + self.deduplicated,
+            }
+
+# Общий на весь процесс, чтобы объединялись запросы разных сессий.
+flights = SingleFlight()
+metrics.register_collector('single_flight', flights.stats)
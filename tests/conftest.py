@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+# Модули проекта лежат в корне репозитория (как и при запуске приложений).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.stub_servers import StubConfig, start_stub_servers, stop_stub_servers
+
+# Модули проекта читают настройки из переменных окружения при импорте, поэтому
+# заглушки API поднимаются и окружение задаётся до сбора тестов: без баз,
+# истории, сервиса рейтингов и фонового обновления, с лимитами, не
+# замедляющими тесты.
+_servers = None
+
+def pytest_configure(config):
+    global _servers
+    _servers = start_stub_servers(StubConfig(latency=0.001, jitter=0.0))
+    os.environ.update(
+        LICHESS_API=_servers[0].url,
+        CHESSCOM_API=_servers[1].url,
+        RATING_STORE_PATH='',
+        ROSTER_STORE_PATH='',
+        RATING_HISTORY_PATH='',
+        RATING_SERVICE_URL='',
+        PREWARM_INTERVAL='0',
+        LICHESS_RATE='100000',
+        CHESSCOM_RATE='100000',
+        LICHESS_MAX_PARALLEL='8',
+        CHESSCOM_MAX_PARALLEL='8',
+    )
+
+def pytest_unconfigure(config):
+    if _servers is not None:
+        stop_stub_servers(_servers)
+
+@pytest.fixture
+def stub_servers():
+    return _servers
@@ -0,0 +1,90 @@
+import socket
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+import rating_cache
+import ratings
+import scheduler
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def test_deadline_keeps_finished_results():
+    release = threading.Event()
+
+    def fetch(username):
+        if username.startswith('slow'):
+            release.wait(5)
+        return {'blitz': len(username)}
+
+    started = time.monotonic()
+    results = {(site, index): result for site, index, result in ratings.iter_ratings(
+        ['fast1', 'slow1', 'fast22'], ['slow2', 'fast333'],
+        lichess_fetch=fetch, chesscom_fetch=fetch, lichess_batch=False, deadline=0.3)}
+    release.set()
+    assert time.monotonic() - started < 2
+    assert results == {
+        ('lichess', 0): {'blitz': 5},
+        ('lichess', 1): {'error': rating_cache.DEADLINE},
+        ('lichess', 2): {'blitz': 6},
+        ('chesscom', 0): {'error': rating_cache.DEADLINE},
+        ('chesscom', 1): {'blitz': 7},
+    }
+
+def test_deadline_grows_with_roster(monkeypatch):
+    monkeypatch.setattr(ratings, 'RUN_DEADLINE', 60)
+    monkeypatch.setattr(ratings, 'RUN_DEADLINE_PER_REQUEST', 1.0)
+    monkeypatch.setitem(scheduler.HOST_LIMITS, scheduler.CHESSCOM_HOST,
+                        {'rate': 10, 'burst': 10, 'max_parallel': 1, 'cooldown_429': None})
+    assert ratings.run_deadline(0, 0) == 60
+    # Chess.com по одному запросу: 200 игроков не должны упираться в минуту.
+    assert ratings.run_deadline(10, 200) >= 60 + 200
+    assert ratings.run_deadline(10, 200) > ratings.run_deadline(10, 20)
+    monkeypatch.setattr(ratings, 'RUN_DEADLINE', 0)
+    assert ratings.run_deadline(10, 200) == 0
+
+def test_circuit_opens_and_lets_one_probe_through(monkeypatch):
+    monkeypatch.setattr(scheduler, 'CIRCUIT_RESET', 0.2)
+    limiter = scheduler.HostLimiter('circuit.test', scheduler.DEFAULT_LIMITS)
+    for _ in range(scheduler.CIRCUIT_FAILURES):
+        limiter.check_circuit()
+        limiter.record_failure()
+    with pytest.raises(scheduler.CircuitOpenError):
+        limiter.check_circuit()
+    time.sleep(0.25)
+    limiter.check_circuit()  # пробный запрос
+    with pytest.raises(scheduler.CircuitOpenError):
+        limiter.check_circuit()
+    limiter.record_success(0.01)
+    limiter.check_circuit()
+    limiter.check_circuit()
+
+def test_unreachable_host_opens_circuit():
+    url = f'http://127.0.0.1:{_free_port()}/api/user/alice'
+    for _ in range(scheduler.CIRCUIT_FAILURES):
+        with pytest.raises(Exception) as error:
+            scheduler.get(url, timeout=1)
+        assert not isinstance(error.value, scheduler.CircuitOpenError)
+    with pytest.raises(scheduler.CircuitOpenError):
+        scheduler.get(url, timeout=1)
+
+def test_losing_hedged_response_is_closed():
+    class Response:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    future = Future()
+    future.add_done_callback(scheduler._close_response)
+    response = Response()
+    future.set_result(response)
+    assert response.closed
+    failed = Future()
+    failed.add_done_callback(scheduler._close_response)
+    failed.set_exception(OSError('reset'))
@@ -0,0 +1,32 @@
+import importers
+import scheduler
+
+def test_lichess_team_is_imported_without_duplicates(stub_servers):
+    results = list(importers.iter_imported_ratings('lichess', 'team-25', window=10))
+    assert sorted(name for name, _ in results) == sorted(f'team_member{i}' for i in range(25))
+    assert all('blitz' in result for _, result in results)
+
+def test_chesscom_members_are_read_before_lookups(stub_servers, monkeypatch):
+    # Chess.com с одним запросом за раз, как в настройках по умолчанию.
+    limiter = scheduler.HostLimiter(scheduler.CHESSCOM_HOST, {
+        'rate': 1000, 'burst': 1000, 'max_parallel': 1, 'cooldown_429': None})
+    monkeypatch.setitem(scheduler._limiters, scheduler.CHESSCOM_HOST, limiter)
+    members = importers.iter_chesscom_club_members
+    lookups = importers.iter_player_ratings
+    state = {'members_done': False, 'lookups_before_done': 0}
+
+    def tracked_members(club_id):
+        yield from members(club_id)
+        state['members_done'] = True
+
+    def tracked_lookups(players):
+        if not state['members_done']:
+            state['lookups_before_done'] += 1
+        return lookups(players)
+
+    monkeypatch.setattr(importers, 'iter_chesscom_club_members', tracked_members)
+    monkeypatch.setattr(importers, 'iter_player_ratings', tracked_lookups)
+    results = list(importers.iter_imported_ratings('chesscom', 'club-30', window=10))
+    assert len(results) == 30
+    assert all('blitz' in result for _, result in results)
+    assert state['lookups_before_done'] == 0
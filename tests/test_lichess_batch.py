@@ -0,0 +1,28 @@
+import rating_cache
+from bench.stub_servers import _rating
+from ratings import get_lichess_ratings_batch
+
+def _expected(name):
+    return {'bullet': _rating(name.lower(), 'bullet'), 'blitz': _rating(name.lower(), 'blitz')}
+
+def test_results_follow_input_order(stub_servers):
+    names = ['batchA1', 'ghostBatch1', 'BatchA2', 'batcha1', 'batchA3']
+    results = get_lichess_ratings_batch(names)
+    assert results == [_expected('batchA1'), {'error': rating_cache.NOT_FOUND},
+                       _expected('BatchA2'), _expected('batchA1'), _expected('batchA3')]
+
+def test_names_are_split_into_batches(stub_servers):
+    before = stub_servers[0].requests
+    names = [f'batchB{i}' for i in range(5)]
+    assert get_lichess_ratings_batch(names, batch_size=2) == [_expected(name) for name in names]
+    assert stub_servers[0].requests - before == 3
+
+def test_cached_names_are_not_requested_again(stub_servers):
+    names = ['batchC1', 'batchC2']
+    first = get_lichess_ratings_batch(names)
+    before = stub_servers[0].requests
+    assert get_lichess_ratings_batch(['BATCHC2', 'batchC1']) == first[::-1]
+    assert stub_servers[0].requests == before
+    # fresh=True обходит кэш (так обновляет записи фоновое обновление списков).
+    get_lichess_ratings_batch(names, fresh=True)
+    assert stub_servers[0].requests == before + 1
@@ -0,0 +1,20 @@
+import re
+
+import metrics
+
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[^}]*\})? -?[0-9.e+-]+$')
+
+def test_prometheus_lines_are_numeric():
+    data = {
+        'time': 0,
+        'timings': {'render': {'p50': 0.01, 'p95': 0.02, 'sum': 0.5, 'count': 10}},
+        'counters': {'http_requests': 3},
+        'prewarm': {'enabled': False, 'runs': 2, 'last_duration': None},
+        'rating_service': {'available': True, 'url': 'http://127.0.0.1:8765'},
+    }
+    text = metrics.to_prometheus(data)
+    samples = [line for line in text.splitlines() if not line.startswith('#')]
+    assert all(SAMPLE.match(line) for line in samples), samples
+    assert 'chessbox_prewarm_enabled 0' in samples
+    assert 'chessbox_rating_service_available 1' in samples
+    assert not any('url' in line or 'last_duration' in line for line in samples)
@@ -0,0 +1,22 @@
+from ratings import parse_players
+
+def test_lists_are_paired_by_position():
+    assert parse_players('alice, bob', 'carol') == [('alice', 'carol'), ('bob', None)]
+
+def test_chesscom_list_may_be_longer():
+    assert parse_players('alice', 'carol, dave') == [('alice', 'carol'), (None, 'dave')]
+
+def test_blank_entries_are_skipped():
+    assert parse_players(' alice ,, ', ' , carol') == [('alice', 'carol')]
+
+def test_empty_input():
+    assert parse_players('', '') == []
+
+def test_explicit_pairs():
+    players = parse_players('alice=Carol, bob', 'dave')
+    assert players == [('alice', 'Carol'), ('bob', None), (None, 'dave')]
+
+def test_paired_chesscom_names_are_not_repeated():
+    # Ник Chess.com из пары "lichess=chesscom" не добавляется второй раз из второго поля.
+    players = parse_players('alice=carol, =dave', 'CAROL, erin, Dave')
+    assert players == [('alice', 'carol'), (None, 'dave'), (None, 'erin')]
@@ -0,0 +1,85 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import rating_cache
+import scheduler
+from prewarm import RosterPrewarmer
+from rating_cache import RatingCache
+from roster_store import RosterStore
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = RatingCache()
+    monkeypatch.setattr(rating_cache, 'cache', cache)
+    return cache
+
+def test_only_recently_used_rosters_are_refreshed(tmp_path, cache, stub_servers):
+    store = RosterStore(str(tmp_path / 'rosters.sqlite3'))
+    store.save('alice', 'active', 'prewarmActive', 'prewarmactivecc')
+    store.save('bob', 'stale', 'prewarmStale', '')
+    with sqlite3.connect(store.path) as conn:
+        conn.execute("UPDATE rosters SET used_at = 0 WHERE owner = 'bob'")
+    prewarmer = RosterPrewarmer(store, stagger=0, max_age=3600)
+    prewarmer.run_once()
+    assert cache.get('lichess', 'prewarmActive') is not None
+    assert cache.get('chesscom', 'prewarmactivecc') is not None
+    assert cache.get('lichess', 'prewarmStale') is None
+    # Открытый снова список опять обновляется.
+    assert store.load('bob', 'stale') == ('prewarmStale', '')
+    prewarmer.run_once()
+    assert cache.get('lichess', 'prewarmStale') is not None
+    store.close()
+
+def test_old_database_gets_used_at(tmp_path):
+    path = str(tmp_path / 'rosters.sqlite3')
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE rosters (owner TEXT NOT NULL, name TEXT NOT NULL, lichess TEXT NOT NULL, '
+                     'chesscom TEXT NOT NULL, updated_at REAL NOT NULL, PRIMARY KEY (owner, name)) WITHOUT ROWID')
+        conn.execute("INSERT INTO rosters VALUES ('alice', 'old', 'a', '', 100), ('bob', 'new', 'b', '', ?)",
+                     (time.time(),))
+    store = RosterStore(path)
+    assert [roster[:2] for roster in store.all_rosters(time.time() - 3600)] == [('bob', 'new')]
+    assert len(store.all_rosters()) == 2
+    store.close()
+
+class Response:
+    status_code = 200
+    headers = {}
+
+    def close(self):
+        pass
+
+def test_background_requests_leave_a_slot_for_clicks(monkeypatch):
+    host = 'slots.test'
+    monkeypatch.setitem(scheduler._limiters, host, scheduler.HostLimiter(host, {
+        'rate': 1000, 'burst': 1000, 'max_parallel': 2, 'cooldown_429': None}))
+    release = threading.Event()
+    sent = []
+
+    def request(method, url, **kwargs):
+        sent.append(url)
+        if url.endswith('/background'):
+            release.wait(5)
+        return Response()
+
+    def refresh():
+        with scheduler.background():
+            scheduler.get(f'http://{host}/background')
+
+    monkeypatch.setattr(scheduler.http_client, 'request', request)
+    threads = [threading.Thread(target=refresh) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    # Из двух слотов фоновые запросы заняли только один.
+    assert len(sent) == 1
+    started = time.monotonic()
+    scheduler.get(f'http://{host}/click')
+    assert time.monotonic() - started < 1
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert sent.count(f'http://{host}/background') == 2
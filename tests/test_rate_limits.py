@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+import rating_cache
+import ratings
+import scheduler
+from bench.stub_servers import LichessHandler, StubConfig, StubServer
+
+# Отдельная заглушка на каждый тест: ограничитель и пауза после 429 общие
+# для хоста на весь процесс и не должны влиять на другие тесты.
+@pytest.fixture
+def make_server():
+    servers = []
+
+    def make(handler=LichessHandler, **config):
+        server = StubServer(handler, StubConfig(latency=0.0, jitter=0.0, **config))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield make
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+# Первый запрос получает 429 с Retry-After: 0, остальные обычные ответы.
+class ThrottleOnceHandler(LichessHandler):
+    def _simulate(self):
+        if self.server.requests == 0:
+            self.server.count()
+            self._send_json(429, {'error': 'Too many requests'}, {'Retry-After': '0'})
+            return True
+        return super()._simulate()
+
+def test_retry_after_429(make_server):
+    server = make_server(ThrottleOnceHandler)
+    throttled = scheduler.stats['throttled']
+    response = scheduler.get(f'{server.url}/api/user/alice')
+    assert response.status_code == 200
+    assert server.requests == 2
+    assert scheduler.stats['throttled'] == throttled + 1
+
+def test_persistent_429_raises(make_server):
+    server = make_server(rate_limit_rate=1.0, retry_after=0)
+    with pytest.raises(scheduler.RateLimitedError):
+        scheduler.get(f'{server.url}/api/user/alice')
+    assert server.requests == scheduler.MAX_RETRIES + 1
+
+def test_long_retry_after_is_not_waited(make_server):
+    server = make_server(rate_limit_rate=1.0, retry_after=3600)
+    with pytest.raises(scheduler.RateLimitedError) as error:
+        scheduler.get(f'{server.url}/api/user/alice')
+    assert server.requests == 1
+    assert error.value.retry_in > scheduler.MAX_WAIT
+    # Пока длится пауза, к хосту не уходит ни одного запроса.
+    with pytest.raises(scheduler.RateLimitedError):
+        scheduler.get(f'{server.url}/api/user/bob')
+    assert server.requests == 1
+
+def test_rate_limit_becomes_error_result(make_server, monkeypatch):
+    server = make_server(rate_limit_rate=1.0, retry_after=3600)
+    monkeypatch.setattr(ratings, 'LICHESS_API', server.url)
+    assert ratings.get_lichess_ratings('rate_limited_player') == {'error': rating_cache.RATE_LIMITED}
@@ -0,0 +1,83 @@
+import pytest
+
+import rating_cache
+from rating_cache import RatingCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rating_cache.time, 'monotonic', clock)
+    return clock
+
+def test_entry_expires_after_ttl(clock):
+    cache = RatingCache(ttl=10)
+    cache.put('lichess', 'Alice', {'blitz': 1500})
+    assert cache.get('lichess', ' alice ') == {'blitz': 1500}
+    clock.now += 9.9
+    assert cache.expires_in('lichess', 'alice') == pytest.approx(0.1)
+    clock.now += 0.2
+    assert cache.get('lichess', 'alice') is None
+    assert cache.stats()['entries'] == 0
+
+def test_not_found_and_errors_live_shorter(clock):
+    cache = RatingCache(ttl=100, not_found_ttl=20, error_ttl=5)
+    cache.put('lichess', 'ghost', {'error': rating_cache.NOT_FOUND})
+    cache.put('lichess', 'broken', {'error': 'HTTP 500'})
+    clock.now += 6
+    assert cache.get('lichess', 'broken') is None
+    assert cache.get('lichess', 'ghost') == {'error': rating_cache.NOT_FOUND}
+    clock.now += 15
+    assert cache.get('lichess', 'ghost') is None
+
+@pytest.mark.parametrize('error', [rating_cache.RATE_LIMITED, rating_cache.UNAVAILABLE, rating_cache.DEADLINE])
+def test_api_state_errors_are_not_cached(clock, error):
+    cache = RatingCache()
+    cache.put('chesscom', 'alice', {'error': error})
+    assert cache.get('chesscom', 'alice') is None
+    assert cache.stats()['entries'] == 0
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = RatingCache(max_entries=2)
+    cache.put('lichess', 'a', {'blitz': 1})
+    cache.put('lichess', 'b', {'blitz': 2})
+    assert cache.get('lichess', 'a') == {'blitz': 1}
+    cache.put('lichess', 'c', {'blitz': 3})
+    assert cache.get('lichess', 'b') is None
+    assert cache.get('lichess', 'a') == {'blitz': 1}
+    assert cache.get('lichess', 'c') == {'blitz': 3}
+    assert cache.stats()['evictions'] == 1
+
+def test_cached_decorator_fetches_once(monkeypatch):
+    monkeypatch.setattr(rating_cache, 'cache', RatingCache())
+    calls = []
+
+    @rating_cache.cached('lichess')
+    def fetch(username):
+        calls.append(username)
+        return {'blitz': len(calls)}
+
+    assert fetch('Alice') == {'blitz': 1}
+    assert fetch('alice') == {'blitz': 1}
+    assert fetch.refresh('alice') == {'blitz': 2}
+    assert fetch('ALICE') == {'blitz': 2}
+    assert calls == ['Alice', 'alice']
+
+def test_cached_decorator_retries_rate_limited(monkeypatch):
+    monkeypatch.setattr(rating_cache, 'cache', RatingCache())
+    calls = []
+
+    @rating_cache.cached('chesscom')
+    def fetch(username):
+        calls.append(username)
+        return {'error': rating_cache.RATE_LIMITED}
+
+    fetch('alice')
+    fetch('alice')
+    assert len(calls) == 2
@@ -0,0 +1,84 @@
+import datetime
+import os
+
+import pytest
+
+import metrics
+import rating_history
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    path = str(tmp_path / 'history')
+    monkeypatch.setattr(rating_history, 'RATING_HISTORY_PATH', path)
+    return path
+
+# Отсчёт от полудня сегодняшнего дня, чтобы снимки одного дня не попадали в разные папки.
+def _ts(hours_ago):
+    noon = datetime.datetime.now(datetime.timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0)
+    return noon - datetime.timedelta(hours=hours_ago)
+
+def _files(path):
+    return [name for _, _, names in os.walk(path) for name in names if name.endswith('.parquet')]
+
+def test_snapshot_skips_errors_and_empty_ratings():
+    players = [('Alice', 'bob'), ('carol', None), (None, 'dave')]
+    rows = rating_history.snapshot_rows(
+        players,
+        [{'bullet': 1500, 'blitz': 'N/A'}, {'error': 'NOT_FOUND'}, None],
+        [{'bullet': 'N/A', 'blitz': 'N/A'}, None, {'bullet': 1200, 'blitz': 1300}])
+    assert rows == {('lichess', 'alice'): (1500, None), ('chesscom', 'dave'): (1200, 1300)}
+
+def test_appended_runs_are_queried_with_filters(history):
+    rating_history.append({('lichess', 'alice'): (1500, 1600), ('chesscom', 'bob'): (1200, None)}, ts=_ts(2))
+    rating_history.append({('lichess', 'alice'): (1510, 1620)}, ts=_ts(1))
+    rating_history.append({('lichess', 'alice'): (1400, 1400)}, ts=_ts(24 * 10))
+
+    alice = rating_history.player_history('lichess', ' Alice ', days=3)
+    assert list(alice['blitz']) == [1600, 1620]
+    assert len(rating_history.query()) == 4
+    bob = rating_history.query(sites=['chesscom'])
+    assert list(bob['username']) == ['bob'] and bob['blitz'].isna().all()
+    movers = rating_history.top_movers(days=3, mode='blitz')
+    assert movers.to_dict('records') == [
+        {'site': 'lichess', 'username': 'alice', 'first': 1600, 'last': 1620, 'change': 20}]
+
+def test_compaction_merges_day_files(history, monkeypatch):
+    monkeypatch.setattr(rating_history, 'HISTORY_COMPACT_FILES', 3)
+    for i in range(3):
+        rating_history.append({('lichess', f'player{i}'): (1000 + i, None)}, ts=_ts(0) - datetime.timedelta(minutes=i))
+    assert len(_files(history)) == 3
+    version = rating_history.data_version()
+    assert version[0] == 3
+    # Четвёртый файл превышает порог — день сливается в один файл.
+    rating_history.append({('lichess', 'player3'): (1003, None)}, ts=_ts(0))
+    assert len(_files(history)) == 1
+    assert rating_history.data_version() != version
+    assert sorted(rating_history.query()['username']) == [f'player{i}' for i in range(4)]
+
+def test_query_rescans_when_file_is_compacted_away(history, monkeypatch):
+    rating_history.append({('lichess', 'alice'): (1500, 1600)}, ts=_ts(0))
+    rating_history.append({('lichess', 'alice'): (1510, 1610)}, ts=_ts(0))
+    dataset = rating_history.dataset
+    calls = []
+
+    # Первый набор данных видит файлы, которые слияние удаляет до чтения.
+    def racing_dataset():
+        found = dataset()
+        if not calls:
+            rating_history.compact(_ts(0).date())
+        calls.append(1)
+        return found
+
+    monkeypatch.setattr(rating_history, 'dataset', racing_dataset)
+    assert sorted(rating_history.query()['blitz']) == [1600, 1610]
+    assert len(calls) == 2
+
+def test_failed_background_write_is_counted(history, monkeypatch):
+    def failing(rows):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(rating_history, 'append', failing)
+    before = metrics.snapshot()['counters'].get('history_write_errors', 0)
+    rating_history.record_run([('alice', None)], [{'bullet': 1500, 'blitz': 1600}], [None])
+    rating_history._writer.submit(lambda: None).result()
+    assert metrics.snapshot()['counters'].get('history_write_errors', 0) == before + 1
@@ -0,0 +1,83 @@
+import os
+import socket
+import subprocess
+import sys
+
+import pytest
+
+import rating_client
+import ratings
+from bench.bench_service import wait_for_service
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LICHESS = ['player1', 'Player2', 'ghost3', 'player1']
+CHESSCOM = ['member1', 'ghost2', 'member3']
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _collect(results):
+    return {(site, index): result for site, index, result in results}
+
+# Сервис в отдельном процессе, как в работе: внутри одного процесса он
+# обращался бы к самому себе через rating_client.client.
+@pytest.fixture(scope='module')
+def service_url(tmp_path_factory):
+    url = f'http://127.0.0.1:{_free_port()}'
+    service = subprocess.Popen([sys.executable, os.path.join(ROOT, 'rating_service.py'), '--listen', url],
+                               env=dict(os.environ, PYTHONPATH=ROOT), stderr=subprocess.DEVNULL)
+    try:
+        wait_for_service(url)
+        yield url
+    finally:
+        service.terminate()
+        service.wait()
+
+@pytest.mark.parametrize('lichess_batch', [False, True])
+def test_service_matches_local(service_url, lichess_batch):
+    client = rating_client.RatingServiceClient(service_url)
+    remote = _collect(client.iter_ratings(LICHESS, CHESSCOM, lichess_batch, 30))
+    local = _collect(ratings.iter_ratings(LICHESS, CHESSCOM, lichess_batch=lichess_batch, deadline=30))
+    assert len(remote) == len(LICHESS) + len(CHESSCOM)
+    assert remote == local
+    assert client.stats()['remote_runs'] == 1
+    assert client.available()
+
+def test_iter_ratings_goes_through_service(service_url, monkeypatch):
+    client = rating_client.RatingServiceClient(service_url)
+    monkeypatch.setattr(rating_client, 'client', client)
+    remote = _collect(ratings.iter_ratings(LICHESS, CHESSCOM, deadline=30))
+    assert client.stats()['remote_runs'] == 1
+    assert client.stats()['fallbacks'] == 0
+    monkeypatch.setattr(rating_client, 'client', None)
+    assert remote == _collect(ratings.iter_ratings(LICHESS, CHESSCOM, deadline=30))
+
+def test_fallback_when_service_unreachable(monkeypatch):
+    client = rating_client.RatingServiceClient(f'http://127.0.0.1:{_free_port()}', connect_timeout=0.5)
+    monkeypatch.setattr(rating_client, 'client', client)
+    results = _collect(ratings.iter_ratings(LICHESS, CHESSCOM, deadline=30))
+    assert set(results) == ({('lichess', i) for i in range(len(LICHESS))}
+                            | {('chesscom', i) for i in range(len(CHESSCOM))})
+    assert 'error' not in results[('lichess', 0)]
+    assert 'error' in results[('lichess', 2)]
+    assert client.stats()['fallbacks'] == 1
+    # Пока сервис помечен недоступным, к нему даже не пытаются подключиться.
+    assert not client.available()
+    ratings.fetch_player_ratings([('player1', 'member1')], deadline=30)
+    assert client.stats()['fallbacks'] == 1
+
+def test_unix_socket(tmp_path):
+    path = tmp_path / 'ratings.sock'
+    url = f'unix://{path}'
+    service = subprocess.Popen([sys.executable, os.path.join(ROOT, 'rating_service.py'), '--listen', url],
+                               env=dict(os.environ, PYTHONPATH=ROOT), stderr=subprocess.DEVNULL)
+    try:
+        wait_for_service(url)
+        client = rating_client.RatingServiceClient(url)
+        remote = _collect(client.iter_ratings(LICHESS, CHESSCOM, False, 30))
+    finally:
+        service.terminate()
+        service.wait()
+    assert remote == _collect(ratings.iter_ratings(LICHESS, CHESSCOM, lichess_batch=False, deadline=30))
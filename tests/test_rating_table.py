@@ -0,0 +1,86 @@
+import pyarrow as pa
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import rating_cache
+import rating_table
+from rating_table import build_table
+
+def test_build_table_column_types():
+    players = [('alice', 'bob'), ('carol', None), (None, 'dave')]
+    lichess = [{'bullet': 1500, 'blitz': 'N/A'}, {'error': rating_cache.NOT_FOUND}, None]
+    chesscom = [None, None, {'bullet': 1200, 'blitz': 1300}]
+    table = build_table(players, lichess, chesscom)
+    assert table.column_names == ['n', 'player', 'lichess_bullet', 'lichess_blitz', 'lichess_status',
+                                  'chesscom_bullet', 'chesscom_blitz', 'chesscom_status']
+    for name in rating_table.NUMERIC_COLUMNS:
+        assert table.schema.field(name).type == pa.int32()
+    for name in ('player', 'lichess_status', 'chesscom_status'):
+        assert table.schema.field(name).type == pa.string()
+    assert table.to_pydict() == {
+        'n': [1, 2, 3],
+        'player': ['alice / bob', 'carol / —', '— / dave'],
+        'lichess_bullet': [1500, None, None],
+        'lichess_blitz': [None, None, None],
+        'lichess_status': [None, rating_cache.NOT_FOUND, '—'],
+        # Ответа ещё нет — "…", ника нет — "—".
+        'chesscom_bullet': [None, None, 1200],
+        'chesscom_blitz': [None, None, 1300],
+        'chesscom_status': ['…', '—', None],
+    }
+
+def test_build_table_ages():
+    table = build_table([('alice', 'bob')], [{'blitz': 1}], [{'blitz': 2}], numbered=False,
+                        ages=([None], [0.0]))
+    assert 'n' not in table.column_names
+    assert table['lichess_age'].to_pylist() == ['']
+    assert table['chesscom_age'].to_pylist() == ['устарело']
+
+ROWS = 25
+
+# Таблица из ROWS игроков p00..p24: блиц убывает с номером, пуля перемешана.
+def _results_app():
+    import rating_table
+
+    players = [(f'p{i:02d}', None) for i in range(25)]
+    lichess = [{'bullet': 1000 + (i * 7) % 25, 'blitz': 2000 - i} for i in range(25)]
+    rating_table.show_results(rating_table.build_table(players, lichess, [None] * 25))
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(rating_table, 'TABLE_PAGE_SIZE', 10)
+    return AppTest.from_function(_results_app, default_timeout=30).run()
+
+def _players(at):
+    return list(at.dataframe[0].value['player'])
+
+def test_small_table_is_shown_whole(monkeypatch):
+    monkeypatch.setattr(rating_table, 'TABLE_PAGE_SIZE', ROWS)
+    at = AppTest.from_function(_results_app, default_timeout=30).run()
+    assert not at.exception
+    assert len(at.dataframe[0].value) == ROWS
+    assert not at.number_input
+
+def test_large_table_is_paged(app):
+    assert not app.exception
+    assert _players(app) == [f'p{i:02d} / —' for i in range(10)]
+    assert app.caption[0].value == 'Строки 1–10 из 25'
+    app.number_input(key='results_page').set_value(3).run()
+    assert _players(app) == [f'p{i:02d} / —' for i in range(20, 25)]
+    assert app.caption[0].value == 'Строки 21–25 из 25'
+
+def test_large_table_is_sorted_on_server(app):
+    app.selectbox(key='results_sort').set_value('lichess_blitz').run()
+    assert _players(app)[0] == 'p24 / —'
+    app.toggle(key='results_descending').set_value(True).run()
+    assert list(app.dataframe[0].value['lichess_blitz']) == list(range(2000, 1990, -1))
+
+def test_filter_clamps_page(app):
+    app.number_input(key='results_page').set_value(3).run()
+    app.text_input(key='results_query').set_value('P1').run()
+    assert not app.exception
+    assert app.number_input(key='results_page').value == 1
+    assert _players(app) == [f'p{i} / —' for i in range(10, 20)]
+    assert app.caption[0].value == 'Строки 1–10 из 10 (всего 25)'
+    app.text_input(key='results_query').set_value('zzz').run()
+    assert app.caption[0].value == 'Ничего не найдено (всего 25)'
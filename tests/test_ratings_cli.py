@@ -0,0 +1,91 @@
+import csv
+import json
+
+import pytest
+
+import ratings_cli
+
+ROWS = 12
+
+@pytest.fixture
+def roster(tmp_path):
+    path = tmp_path / 'roster.jsonl'
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(ROWS):
+            f.write(json.dumps({'lichess': f'cli{i}', 'chesscom': None if i == 3 else f'climember{i}'}) + '\n')
+    return path
+
+def _read(path):
+    path = str(path)
+    if path.endswith('.csv'):
+        with open(path, encoding='utf-8', newline='') as f:
+            return list(csv.DictReader(f))
+    if path.endswith('.jsonl'):
+        with open(path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+    import pyarrow.parquet as pq
+    return pq.read_table(path).to_pylist()
+
+# Запуск, прерванный после записи второго окна, но до сохранения его чекпоинта.
+def _crash_after_second_window(monkeypatch, argv):
+    save = ratings_cli.save_checkpoint
+    calls = []
+
+    def crashing(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        save(*args)
+
+    monkeypatch.setattr(ratings_cli, 'save_checkpoint', crashing)
+    with pytest.raises(KeyboardInterrupt):
+        ratings_cli.main(argv)
+    monkeypatch.setattr(ratings_cli, 'save_checkpoint', save)
+
+@pytest.mark.parametrize('extension', ['csv', 'jsonl', 'parquet'])
+def test_resume_after_crash_has_no_duplicates(tmp_path, roster, monkeypatch, extension):
+    output = tmp_path / f'out.{extension}'
+    _crash_after_second_window(monkeypatch, [str(roster), '-o', str(output), '--window', '4'])
+    ratings_cli.main([str(roster), '-o', str(output), '--window', '5'])
+    rows = _read(output)
+    assert [row['lichess'] for row in rows] == [f'cli{i}' for i in range(ROWS)]
+    assert not rows[3]['chesscom']
+    assert all(row['lichess_blitz'] not in (None, '') for row in rows)
+
+def test_text_output_is_truncated_to_checkpoint(tmp_path, roster):
+    output = tmp_path / 'out.jsonl'
+    ratings_cli.main([str(roster), '-o', str(output), '--window', '4'])
+    checkpoint = json.loads((tmp_path / 'out.jsonl.checkpoint').read_text())
+    assert checkpoint['done'] == ROWS
+    assert checkpoint['offset'] == output.stat().st_size
+    # Строки, дописанные после чекпоинта, при продолжении отбрасываются.
+    with open(output, 'a', encoding='utf-8') as f:
+        f.write('{"lichess": "orphan"}\n')
+    ratings_cli.main([str(roster), '-o', str(output)])
+    assert output.stat().st_size == checkpoint['offset']
+
+def test_missing_output_requires_restart(tmp_path, roster):
+    output = tmp_path / 'out.csv'
+    ratings_cli.main([str(roster), '-o', str(output), '--window', '4'])
+    output.unlink()
+    with pytest.raises(SystemExit):
+        ratings_cli.main([str(roster), '-o', str(output)])
+    ratings_cli.main([str(roster), '-o', str(output), '--restart'])
+    assert len(_read(output)) == ROWS
+
+def test_other_input_requires_restart(tmp_path, roster):
+    output = tmp_path / 'out.csv'
+    ratings_cli.main([str(roster), '-o', str(output), '--window', '4'])
+    other = tmp_path / 'other.jsonl'
+    other.write_text(roster.read_text(encoding='utf-8'), encoding='utf-8')
+    with pytest.raises(SystemExit):
+        ratings_cli.main([str(other), '-o', str(output)])
+    with open(roster, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'lichess': 'cli_extra', 'chesscom': ''}) + '\n')
+    with pytest.raises(SystemExit):
+        ratings_cli.main([str(roster), '-o', str(output)])
+
+def test_read_pairs_accepts_nulls(tmp_path):
+    path = tmp_path / 'roster.jsonl'
+    path.write_text('{"lichess": null, "chesscom": " bob "}\n\n{"lichess": "amy"}\n', encoding='utf-8')
+    assert list(ratings_cli.read_pairs(str(path))) == [('', 'bob'), ('amy', '')]
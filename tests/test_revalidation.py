@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+import decoding
+import rating_cache
+import rating_store
+import ratings
+from bench.stub_servers import chesscom_stats
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = rating_store.RatingStore(str(tmp_path / 'ratings.sqlite3'))
+    monkeypatch.setattr(rating_store, 'store', store)
+    return store
+
+def _revalidate(username):
+    url = f'{ratings.CHESSCOM_API}/pub/player/{username}/stats'
+    return ratings.get_revalidated('chesscom', username, url, decoding.decode_chesscom_stats)
+
+def test_first_fetch_saves_etag(store):
+    result = _revalidate('revalidate1')
+    assert result == decoding.decode_chesscom_stats(json.dumps(chesscom_stats('revalidate1')).encode())
+    saved = store.get('chesscom', 'revalidate1')
+    assert saved['result'] == result
+    assert saved['etag']
+
+def test_304_returns_stored_result(store, stub_servers):
+    _revalidate('revalidate2')
+    saved = store.get('chesscom', 'revalidate2')
+    # Подменяем сохранённый результат, оставив ETag: если пришёл 304, вернётся именно он.
+    marker = {'bullet': 1, 'blitz': 2}
+    store.save('chesscom', 'revalidate2', marker, saved['etag'])
+    before = stub_servers[1].requests
+    assert _revalidate('revalidate2') == marker
+    assert stub_servers[1].requests == before + 1
+    assert store.get('chesscom', 'revalidate2')['fetched_at'] >= saved['fetched_at']
+
+def test_changed_etag_fetches_full_response(store):
+    fresh = _revalidate('revalidate3')
+    store.save('chesscom', 'revalidate3', {'bullet': 1, 'blitz': 2}, '"stale-etag"')
+    assert _revalidate('revalidate3') == fresh
+    assert store.get('chesscom', 'revalidate3')['etag'] != '"stale-etag"'
+
+def test_missing_player_is_not_found(store):
+    assert _revalidate('ghostrevalidate') == {'error': rating_cache.NOT_FOUND}
+    assert store.get('chesscom', 'ghostrevalidate') is None
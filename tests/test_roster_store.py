@@ -0,0 +1,77 @@
+import sqlite3
+import time
+
+import pytest
+
+import roster_store
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'rosters.sqlite3')
+
+def _saved(path, owner, name=roster_store.DEFAULT_ROSTER):
+    with sqlite3.connect(path) as conn:
+        row = conn.execute('SELECT lichess, chesscom FROM rosters WHERE owner = ? AND name = ?',
+                           (owner, name)).fetchone()
+    return tuple(row) if row is not None else None
+
+def _wait_saved(path, owner, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        saved = _saved(path, owner)
+        if saved is not None:
+            return saved
+        time.sleep(0.02)
+    return None
+
+def test_quick_edits_are_merged_into_one_write(path):
+    store = roster_store.RosterStore(path, save_delay=0.2)
+    for i in range(5):
+        store.save_later('alice', roster_store.DEFAULT_ROSTER, f'lichess{i}', '')
+    # До записи изменение видно через load, но в базе его ещё нет.
+    assert store.load('alice') == ('lichess4', '')
+    assert _saved(path, 'alice') is None
+    assert _wait_saved(path, 'alice') == ('lichess4', '')
+    store.close()
+
+def test_continuous_edits_are_flushed_after_max_delay(path):
+    store = roster_store.RosterStore(path, save_delay=0.3, max_delay=0.5)
+    started = time.monotonic()
+    saved = None
+    # Правки чаще save_delay: без предела запись откладывалась бы, пока они идут.
+    while time.monotonic() - started < 1.5 and saved is None:
+        store.save_later('bob', roster_store.DEFAULT_ROSTER, 'bob_lichess', '')
+        time.sleep(0.1)
+        saved = _saved(path, 'bob')
+    assert saved == ('bob_lichess', '')
+    assert time.monotonic() - started < 1.0
+    store.close()
+
+# Соединение, у которого первая запись падает с «database is locked».
+class LockedOnce:
+    def __init__(self, conn):
+        self.conn = conn
+        self.failures = 1
+
+    def executemany(self, *args):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError('database is locked')
+        return self.conn.executemany(*args)
+
+    def __enter__(self):
+        return self.conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self.conn.__exit__(*exc)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+def test_failed_background_write_is_retried(path):
+    store = roster_store.RosterStore(path, save_delay=0.1)
+    store._conn = LockedOnce(store._conn)
+    store.save_later('carol', roster_store.DEFAULT_ROSTER, '', 'carol_chesscom')
+    assert _wait_saved(path, 'carol') == ('', 'carol_chesscom')
+    assert store._conn.failures == 0
+    store.close()
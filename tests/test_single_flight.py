@@ -0,0 +1,91 @@
+import threading
+import time
+
+import scheduler
+from single_flight import SingleFlight
+
+def _start(target):
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return {'blitz': 1500}
+
+    threads = [_start(lambda: results.append(flights.do(('lichess', 'alice'), fetch))) for _ in range(5)]
+    while flights.stats()['coalesced'] < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == [{'blitz': 1500}] * 5
+    assert flights.stats()['in_flight'] == 0
+
+def test_error_reaches_every_waiter():
+    flights = SingleFlight()
+    call, leader = flights.begin('key')
+    assert leader
+    errors = []
+
+    def wait():
+        try:
+            flights.do('key', lambda: None)
+        except RuntimeError as e:
+            errors.append(e)
+
+    waiter = _start(wait)
+    while flights.stats()['coalesced'] < 1:
+        time.sleep(0.01)
+    flights.finish('key', call, error=RuntimeError('boom'))
+    waiter.join()
+    assert [str(e) for e in errors] == ['boom']
+
+def test_key_is_released_after_finish():
+    flights = SingleFlight()
+    assert flights.do('key', lambda: 1) == 1
+    assert flights.do('key', lambda: 2) == 2
+    assert flights.stats()['leaders'] == 2
+
+def test_interactive_call_does_not_wait_for_background_call():
+    flights = SingleFlight()
+    release = threading.Event()
+    background_result = []
+
+    def refresh():
+        with scheduler.background():
+            background_result.append(flights.do('key', lambda: (release.wait(5), 'background')[1]))
+
+    thread = _start(refresh)
+    while flights.stats()['in_flight'] < 1:
+        time.sleep(0.01)
+    started = time.monotonic()
+    assert flights.do('key', lambda: 'interactive') == 'interactive'
+    assert time.monotonic() - started < 1
+    release.set()
+    thread.join()
+    assert background_result == ['background']
+    assert flights.stats()['overtaken'] == 1
+
+def test_background_call_joins_interactive_call():
+    flights = SingleFlight()
+    call, leader = flights.begin('key')
+    joined = []
+
+    def refresh():
+        with scheduler.background():
+            joined.append(flights.begin('key'))
+
+    _start(refresh).join()
+    assert joined == [(call, False)]
+    flights.finish('key', call, 'value')
+    assert call.wait() == 'value'